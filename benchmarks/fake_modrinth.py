@@ -0,0 +1,254 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, NamedTuple, Optional
+from urllib.parse import parse_qs, urlparse
+
+from .synthetic import LIBRARY_IDS, SyntheticMod, build_jar
+
+DATE_PUBLISHED = "2024-01-01T00:00:00Z"
+
+
+class FakeFile(NamedTuple):
+    seed: int
+    size: int
+    sha1: str
+    sha512: str
+    mod_config: Optional[dict] = None  # 下载时按此生成jar，None为本地已有的jar，不会被下载
+    jar_size: int = 0  # 生成jar时的目标大小
+
+
+def file_bytes(file: FakeFile) -> bytes:
+    # 不在内存中保存文件内容，每次下载时用相同的seed重新生成
+    if file.mod_config is None:
+        return random.Random(file.seed).randbytes(file.size)
+    return build_jar(file.mod_config, file.jar_size, random.Random(file.seed))
+
+
+def jar_config(mod_id: str, version: str, game_version: str, depends: list[str]) -> dict:
+    return {
+        "schemaVersion": 1,
+        "id": mod_id,
+        "version": version,
+        "name": mod_id,
+        "authors": ["bench"],
+        "environment": "*",
+        "depends": {"fabricloader": ">=0.15.0", "minecraft": f"~{game_version}", **{d: "*" for d in depends}},
+    }
+
+
+class FakeModrinth:
+    # 模拟Modrinth中本项目用到的接口：hash查询、版本列表、批量查询和文件下载
+    # latency 为每个请求的延迟(秒)，requests_per_minute 为服务端限速，fail_every 每隔N个请求返回一次429
+    def __init__(self, mods: list[SyntheticMod], game_version_from: str = "1.20.1", game_version_to: str = "1.21",
+                 latency: float = 0.0, requests_per_minute: int = 0, fail_every: int = 0,
+                 retry_after: float = 1.0, compatible_ratio: float = 0.9, seed: int = 0):
+        self.game_version_from = game_version_from
+        self.game_version_to = game_version_to
+        self.latency = latency
+        self.requests_per_minute = requests_per_minute
+        self.fail_every = fail_every
+        self.retry_after = retry_after
+        self.base_url = ""
+        self.stats = {"requests": 0, "rate_limited": 0, "bytes_sent": 0}
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._files: dict[str, FakeFile] = {}
+        self._versions: dict[str, dict] = {}
+        self._by_sha1: dict[str, str] = {}  # 本地jar的sha1 -> 当前版本id
+        self._latest: dict[str, str] = {}  # project_id -> 目标游戏版本下的最新版本id
+        self._projects: dict[str, dict] = {}
+        rng = random.Random(seed)
+        for library_index, library_id in enumerate(LIBRARY_IDS):
+            project_id = f"L{library_index:07d}"
+            self._projects[project_id] = {"id": project_id, "slug": library_id}
+            self._add_version(project_id, f"{library_id}-1.0.0.jar", "1.0.0", game_version_to, FakeModrinth._make_file(
+                seed * 100000 + 90000 + library_index, 64 * 1024, jar_config(library_id, "1.0.0", game_version_to, [])), [])
+        for mod in mods:
+            self._projects[mod.project_id] = {"id": mod.project_id, "slug": mod.mod_id}
+            current_id = self._add_version(
+                mod.project_id, mod.filename, "1.0.0", game_version_from,
+                FakeFile(0, mod.size, mod.sha1, mod.sha512), [])
+            self._by_sha1[mod.sha1] = current_id
+            if rng.random() < compatible_ratio:
+                depends = [f"L{LIBRARY_IDS.index(d):07d}" for d in mod.depends]
+                version = f"2.0.0+{game_version_to}"
+                self._latest[mod.project_id] = self._add_version(
+                    mod.project_id, f"{mod.mod_id}-{version}.jar", "2.0.0", game_version_to,
+                    FakeModrinth._make_file(seed * 100000 + mod.index, mod.size,
+                                            jar_config(mod.mod_id, version, game_version_to, mod.depends)),
+                    depends)
+
+    @staticmethod
+    def _make_file(seed: int, jar_size: int, mod_config: dict) -> FakeFile:
+        # hash按实际生成的jar计算，与下载到的内容一致
+        data = build_jar(mod_config, jar_size, random.Random(seed))
+        return FakeFile(seed, len(data), hashlib.sha1(data).hexdigest(), hashlib.sha512(data).hexdigest(),
+                        mod_config, jar_size)
+
+    def _add_version(self, project_id: str, filename: str, version_number: str, game_version: str,
+                     file: FakeFile, depends: list[str]) -> str:
+        version_id = f"V{len(self._versions):07d}"
+        self._files[version_id] = file
+        self._versions[version_id] = {
+            "id": version_id,
+            "project_id": project_id,
+            "name": version_number,
+            "version_number": version_number,
+            "game_versions": [game_version],
+            "loaders": ["fabric"],
+            "version_type": "release",
+            "author_id": "bench",
+            "date_published": DATE_PUBLISHED,
+            "downloads": 0,
+            "dependencies": [{"project_id": d, "dependency_type": "required"} for d in depends],
+            "files": [{
+                "hashes": {"sha1": file.sha1, "sha512": file.sha512},
+                "url": f"/files/{version_id}.jar",
+                "filename": filename,
+                "primary": True,
+                "size": file.size,
+            }],
+        }
+        if project_id.startswith("L"):
+            self._latest[project_id] = version_id
+        return version_id
+
+    def version_json(self, version_id: str) -> dict:
+        version = dict(self._versions[version_id])
+        version["files"] = [{**f, "url": self.base_url + f["url"]} for f in version["files"]]
+        return version
+
+    def latest_versions(self) -> dict[str, dict]:
+        # 基准测试中下载阶段使用：project_id -> 目标版本
+        return {project_id: self.version_json(version_id) for project_id, version_id in self._latest.items()}
+
+    def _throttle(self) -> Optional[float]:
+        # 返回需要客户端等待的秒数，None表示放行
+        with self._lock:
+            self.stats["requests"] += 1
+            if self.fail_every and self.stats["requests"] % self.fail_every == 0:
+                self.stats["rate_limited"] += 1
+                return self.retry_after
+            if not self.requests_per_minute:
+                return None
+            now = time.monotonic()
+            if now - self._window_start >= 60:
+                self._window_start = now
+                self._window_count = 0
+            self._window_count += 1
+            if self._window_count > self.requests_per_minute:
+                self.stats["rate_limited"] += 1
+                return 60 - (now - self._window_start)
+            return None
+
+    def ratelimit_headers(self) -> dict[str, str]:
+        with self._lock:
+            limit = self.requests_per_minute or 100000
+            remaining = max(0, limit - self._window_count)
+            reset = max(0, int(60 - (time.monotonic() - self._window_start)))
+        return {"X-Ratelimit-Limit": str(limit), "X-Ratelimit-Remaining": str(remaining),
+                "X-Ratelimit-Reset": str(reset)}
+
+    def handle(self, method: str, path: str, query: dict[str, list[str]], body: Any) -> tuple[int, Any]:
+        if method == "POST" and path == "/v2/version_files":
+            return 200, {sha1: self.version_json(self._by_sha1[sha1]) for sha1 in body["hashes"] if sha1 in self._by_sha1}
+        if method == "POST" and path == "/v2/version_files/update":
+            result = {}
+            if self.game_version_to in body.get("game_versions", []):
+                for sha1 in body["hashes"]:
+                    current = self._by_sha1.get(sha1)
+                    latest = current and self._latest.get(self._versions[current]["project_id"])
+                    if latest:
+                        result[sha1] = self.version_json(latest)
+            return 200, result
+        if method == "GET" and path.startswith("/v2/version_file/"):
+            version_id = self._by_sha1.get(path.rsplit("/", 1)[1])
+            return (200, self.version_json(version_id)) if version_id else (404, {"error": "not_found"})
+        if method == "GET" and path.startswith("/v2/project/") and path.endswith("/version"):
+            project_id = path.split("/")[3]
+            game_versions = json.loads(query.get("game_versions", ["[]"])[0])
+            versions = [self.version_json(version_id) for version_id, version in self._versions.items()
+                        if version["project_id"] == project_id
+                        and (not game_versions or set(game_versions) & set(version["game_versions"]))]
+            return 200, list(reversed(versions))
+        if method == "GET" and path == "/v2/versions":
+            ids = json.loads(query.get("ids", ["[]"])[0])
+            return 200, [self.version_json(version_id) for version_id in ids if version_id in self._versions]
+        if method == "GET" and path == "/v2/projects":
+            ids = set(json.loads(query.get("ids", ["[]"])[0]))
+            return 200, [project for project in self._projects.values() if project["id"] in ids or project["slug"] in ids]
+        return 404, {"error": "not_found"}
+
+
+class FakeModrinthHandler(BaseHTTPRequestHandler):
+    fake: FakeModrinth
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: int, data: bytes, content_type: str, headers: dict[str, str]) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+        with self.fake._lock:
+            self.fake.stats["bytes_sent"] += len(data)
+
+    def _dispatch(self, method: str) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if self.fake.latency:
+            time.sleep(self.fake.latency)
+        parsed = urlparse(self.path)
+        if parsed.path.startswith("/files/"):
+            file = self.fake._files.get(parsed.path[len("/files/"):-len(".jar")])
+            if file is None:
+                self._send(404, b"", "text/plain", {})
+            else:
+                self._send(200, file_bytes(file), "application/java-archive", {})
+            return
+        wait = self.fake._throttle()
+        headers = self.fake.ratelimit_headers()
+        if wait is not None:
+            headers.update({"Retry-After": str(max(1, round(wait))), "X-Ratelimit-Remaining": "0",
+                            "X-Ratelimit-Reset": str(max(1, round(wait)))})
+            self._send(429, b'{"error":"ratelimited"}', "application/json", headers)
+            return
+        status, body = self.fake.handle(method, parsed.path, parse_qs(parsed.query),
+                                        json.loads(raw) if raw else None)
+        self._send(status, json.dumps(body).encode(), "application/json", headers)
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class FakeModrinthServer:
+    # 在本机随机端口启动模拟服务，可用作上下文管理器
+    def __init__(self, fake: FakeModrinth, host: str = "127.0.0.1", port: int = 0):
+        handler = type("Handler", (FakeModrinthHandler,), {"fake": fake})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.fake = fake
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        fake.base_url = self.url
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self) -> "FakeModrinthServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,229 @@
+import argparse
+import curses
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from src import get_mod_info, hashing, mod_index, scanner, tools
+from src.mod_record import ModRecord, ModStatus, Resolution
+from src.version_record import VersionRecord
+from src.resolver import ResolutionService
+
+from .fake_modrinth import FakeModrinth, FakeModrinthServer
+from .synthetic import SyntheticMod, generate_pack
+
+DEFAULT_SIZES = (10, 500, 5000)
+BENCHMARKS = ("scan", "hash", "resolve", "download", "render")
+
+
+class HeadlessWindow:
+    # 只记录写入次数的窗口，用于在没有终端时测量列表控件的绘制开销
+    def __init__(self, height: int = 50, width: int = 160):
+        self.height = height
+        self.width = width
+        self.writes = 0
+
+    def getmaxyx(self) -> tuple[int, int]:
+        return self.height, self.width
+
+    def addstr(self, y: int, x: int, text: str, attr: int = 0) -> None:
+        self.writes += 1
+
+    def move(self, y: int, x: int) -> None:
+        pass
+
+    def clrtoeol(self) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def noutrefresh(self) -> None:
+        pass
+
+
+@contextmanager
+def headless_curses() -> Iterator[None]:
+    # 未调用initscr时 color_pair/doupdate 会报错，测量期间替换为空操作
+    saved = curses.color_pair, curses.doupdate
+    curses.color_pair = lambda n: n << 8
+    curses.doupdate = lambda: None
+    try:
+        yield
+    finally:
+        curses.color_pair, curses.doupdate = saved
+
+
+class BenchContext:
+    def __init__(self, root: Path, size: int, mods: list[SyntheticMod], server: FakeModrinthServer, workers: int):
+        self.root = root
+        self.size = size
+        self.mods = mods
+        self.server = server
+        self.workers = workers
+        self.mod_folder = str(root / "mods")
+
+    def fresh_dir(self, name: str) -> str:
+        path = self.root / name
+        shutil.rmtree(path, ignore_errors=True)
+        path.mkdir(parents=True)
+        return str(path)
+
+    def configure(self, cache_folder: str) -> None:
+        # 使用临时缓存目录，并把API地址指向本地模拟服务
+        tools.config.update({
+            "cacheFolder": cache_folder,
+            "storeFolder": os.path.join(cache_folder, "store"),
+            "scanWorkers": self.workers,
+            "maxConcurrentRequests": self.workers,
+            "requestsPerMinute": 100000,
+            "retryBaseDelay": 0.1,
+        })
+        tools.apply_config()
+        get_mod_info.API_ENDPOINT = self.server.url
+
+
+def timed(func: Callable[[], Any]) -> tuple[float, Any]:
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def bench_scan(ctx: BenchContext) -> dict:
+    # 冷启动(空索引)与热启动(索引命中，只需stat)
+    index = mod_index.ModIndex(ctx.fresh_dir("scan-cache"))
+    cold, _ = timed(lambda: scanner.scan_mod_folder(ctx.mod_folder, index, ctx.workers))
+    warm, _ = timed(lambda: scanner.scan_mod_folder(ctx.mod_folder, index, ctx.workers))
+    index.close()
+    return {"cold_s": cold, "warm_s": warm, "mods_per_s": ctx.size / cold if cold else None}
+
+
+def bench_hash(ctx: BenchContext) -> dict:
+    # SHA1+SHA512单次读取，单线程与线程池对比
+    total = sum(mod.size for mod in ctx.mods)
+    paths = [os.path.join(ctx.mod_folder, mod.filename) for mod in ctx.mods]
+    serial, _ = timed(lambda: hashing.hash_files(paths, workers=1))
+    parallel, _ = timed(lambda: hashing.hash_files(paths, workers=ctx.workers))
+    return {"serial_s": serial, "parallel_s": parallel,
+            "mb_per_s": total / 1024 / 1024 / parallel if parallel else None}
+
+
+def resolve_once(ctx: BenchContext) -> dict[str, dict]:
+    service = ResolutionService()
+    results: dict[str, dict] = {}
+    service.subscribe(lambda sha1, result: results.__setitem__(sha1, result))
+    service.resolve([mod.sha1 for mod in ctx.mods], ctx.server.fake.game_version_to)
+    service.done.wait()
+    return results
+
+
+def bench_resolve(ctx: BenchContext) -> dict:
+    # 第一次经过模拟服务，第二次命中本地响应缓存
+    ctx.configure(ctx.fresh_dir("resolve-cache"))
+    before = dict(ctx.server.fake.stats)
+    cold, results = timed(lambda: resolve_once(ctx))
+    requests = ctx.server.fake.stats["requests"] - before["requests"]
+    warm, _ = timed(lambda: resolve_once(ctx))
+    return {"cold_s": cold, "warm_s": warm, "resolved": len(results), "requests": requests,
+            "rate_limited": ctx.server.fake.stats["rate_limited"] - before["rate_limited"]}
+
+
+def bench_download(ctx: BenchContext) -> dict:
+    ctx.configure(ctx.fresh_dir("download-cache"))
+    out = ctx.fresh_dir("download-out")
+    items = [(project_id, get_mod_info.to_version(version), out)
+             for project_id, version in ctx.server.fake.latest_versions().items()]
+    total = sum(item[1].files[0].size for item in items)
+    elapsed, results = timed(lambda: tools.download_to_folders(items, on_tick=lambda tasks: None))
+    return {"elapsed_s": elapsed, "files": len(items), "failed": sum(1 for ok in results.values() if not ok),
+            "mb_per_s": total / 1024 / 1024 / elapsed if elapsed else None}
+
+
+def bench_render(ctx: BenchContext, frames: int = 200) -> dict:
+    from src.tui import VirtualList, check_update_line
+    window = HeadlessWindow()
+    items = [ModRecord(mod.mod_id, mod.name, mod.filename, "1.0.0", mod.sha1, mod.sha512) for mod in ctx.mods]
+    for record, mod in zip(items, ctx.mods):
+        latest = VersionRecord(f"{mod.project_id}-new", mod.project_id, "2.0.0", "release", "", [], [], (), ())
+        record.apply(Resolution(ModStatus.UPDATE_AVAILABLE, "1.0.0", latest))
+    with headless_curses():
+        view = VirtualList(window, items, check_update_line, search_key=lambda record: record.name)
+        first, _ = timed(lambda: view.draw("bench", "footer"))
+        # 逐行滚动，每帧只有滚入的行需要重新绘制
+        start = time.perf_counter()
+        for _ in range(frames):
+            view.handle_key(curses.KEY_DOWN)
+            view.draw("bench", "footer")
+        scroll = (time.perf_counter() - start) / frames
+        filtered, _ = timed(lambda: [view.set_query(q) for q in ("m", "mo", "mod", "mod 1")])
+    return {"first_frame_ms": first * 1000, "scroll_frame_ms": scroll * 1000,
+            "filter_ms": filtered * 1000, "writes": window.writes}
+
+
+BENCH_FUNCS: dict[str, Callable[[BenchContext], dict]] = {
+    "scan": bench_scan,
+    "hash": bench_hash,
+    "resolve": bench_resolve,
+    "download": bench_download,
+    "render": bench_render,
+}
+
+
+def run_size(size: int, args: argparse.Namespace) -> dict[str, dict]:
+    root = Path(tempfile.mkdtemp(prefix=f"modupdater-bench-{size}-"))
+    try:
+        mods = generate_pack(str(root / "mods"), size, seed=args.seed, size_scale=args.size_scale)
+        fake = FakeModrinth(mods, latency=args.latency, requests_per_minute=args.server_rpm,
+                            fail_every=args.fail_every, seed=args.seed)
+        results: dict[str, dict] = {}
+        with FakeModrinthServer(fake) as server:
+            ctx = BenchContext(root, size, mods, server, args.workers)
+            ctx.configure(ctx.fresh_dir("cache"))
+            for name in args.only or BENCHMARKS:
+                results[name] = BENCH_FUNCS[name](ctx)
+                print(format_row(size, name, results[name]), file=sys.stderr)
+        return results
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def format_row(size: int, name: str, result: dict) -> str:
+    fields = "  ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items())
+    return f"[{size:>5} mods] {name:<8} {fields}"
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="ModUpdater 性能基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="mod数量")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="只运行指定的基准")
+    parser.add_argument("--workers", type=int, default=8, help="扫描和请求的并发数")
+    parser.add_argument("--size-scale", type=float, default=0.25, help="jar大小的缩放系数")
+    parser.add_argument("--latency", type=float, default=0.02, help="模拟服务每个请求的延迟(秒)")
+    parser.add_argument("--server-rpm", type=int, default=0, help="模拟服务每分钟请求上限，0为不限")
+    parser.add_argument("--fail-every", type=int, default=0, help="每隔N个请求返回一次429，0为不注入")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="把结果写入JSON文件，便于比较")
+    parser.add_argument("--keep", action="store_true", help="保留生成的临时目录")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    results = {str(size): run_size(size, args) for size in args.sizes}
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
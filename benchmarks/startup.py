@@ -0,0 +1,62 @@
+import argparse
+import os
+import subprocess
+import sys
+from typing import NamedTuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 入口模块 -> (导入耗时预算(毫秒), 导入后不应出现的模块)
+# 较重的库(pydantic、httpx等)只在第一次请求时导入；无界面模式不应导入界面模块和curses
+# (Windows上没有安装windows-curses时无界面模式也要能运行)
+DEFAULT_BUDGETS: dict[str, tuple[float, tuple[str, ...]]] = {
+    "src.cli": (150, ("src.tui", "src.daemon", "src.prefetch", "curses", "modrinth_api_wrapper", "pydantic", "httpx")),
+    "src.tui": (150, ("modrinth_api_wrapper", "pydantic", "httpx")),
+}
+
+
+class ImportResult(NamedTuple):
+    module: str
+    elapsed_ms: float
+    unexpected: list[str]
+
+
+def measure_import(module: str, forbidden: tuple[str, ...]) -> ImportResult:
+    # 在新的解释器中导入，用 -X importtime 取入口模块的累计耗时
+    code = (f"import sys, {module}\n"
+            f"print(' '.join(m for m in {forbidden!r} if m in sys.modules))")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    elapsed_us = 0
+    for line in proc.stderr.splitlines():
+        # 格式: "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            elapsed_us = int(parts[1])
+    return ImportResult(module, elapsed_us / 1000, proc.stdout.split())
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description="检查入口模块的导入耗时是否超出预算")
+    parser.add_argument("--repeat", type=int, default=5, help="每个模块导入的次数，取最小值")
+    parser.add_argument("--scale", type=float, default=1.0, help="预算的缩放系数，较慢的机器上可调大")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    failed = False
+    for module, (budget_ms, forbidden) in DEFAULT_BUDGETS.items():
+        results = [measure_import(module, forbidden) for _ in range(max(1, args.repeat))]
+        best = min(result.elapsed_ms for result in results)
+        unexpected = results[0].unexpected
+        ok = best <= budget_ms * args.scale and not unexpected
+        failed |= not ok
+        line = f"{'OK  ' if ok else 'FAIL'} {module:<10} {best:8.1f}ms (budget {budget_ms * args.scale:.0f}ms)"
+        if unexpected:
+            line += f"  unexpected imports: {', '.join(unexpected)}"
+        print(line)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
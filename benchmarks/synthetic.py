@@ -0,0 +1,92 @@
+import hashlib
+import io
+import json
+import os
+import random
+import zipfile
+from pathlib import Path
+from typing import NamedTuple
+
+# 部分mod名称使用中文，覆盖宽字符的显示宽度计算
+NAME_WORDS = ["Fabric", "Sodium", "Lithium", "Iris", "Cloth", "Config", "Mod", "Menu", "Tweaks", "API",
+              "更多", "村民", "地图", "小地图", "物品", "优化", "附魔", "工具"]
+LIBRARY_IDS = ["fabric-api", "cloth-config", "architectury"]
+JAR_DATE_TIME = (2024, 1, 1, 0, 0, 0)
+
+
+class SyntheticMod(NamedTuple):
+    index: int
+    mod_id: str
+    name: str
+    project_id: str
+    filename: str
+    sha1: str
+    sha512: str
+    size: int
+    depends: list[str]
+
+
+def jar_size(rng: random.Random, scale: float = 1.0) -> int:
+    # 大多数mod在几十KB到几MB之间，少数很大，用对数正态分布近似
+    return max(4 * 1024, int(rng.lognormvariate(12.0, 1.2) * scale))
+
+
+def build_jar(mod_config: dict, size: int, rng: random.Random) -> bytes:
+    # 条目使用固定的修改时间，相同参数生成的jar逐字节一致
+    def entry(name: str) -> zipfile.ZipInfo:
+        return zipfile.ZipInfo(name, JAR_DATE_TIME)
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as jar:
+        jar.writestr(entry("fabric.mod.json"), json.dumps(mod_config, ensure_ascii=False, indent=2))
+        jar.writestr(entry(f"assets/{mod_config['id']}/lang/en_us.json"), json.dumps({"name": mod_config["name"]}))
+        # 填充不可压缩的数据使jar接近目标大小
+        padding = max(0, size - buf.tell() - 512)
+        jar.writestr(entry(f"{mod_config['id']}/classes.bin"), rng.randbytes(padding))
+    return buf.getvalue()
+
+
+def mod_config_for(index: int, rng: random.Random, game_version: str) -> dict:
+    mod_id = f"bench-mod-{index:05d}"
+    name = f"{rng.choice(NAME_WORDS)}{rng.choice(NAME_WORDS)} {index}"
+    depends = {"fabricloader": ">=0.15.0", "minecraft": f"~{game_version}"}
+    for library in rng.sample(LIBRARY_IDS, rng.randint(0, 2)):
+        depends[library] = "*"
+    return {
+        "schemaVersion": 1,
+        "id": mod_id,
+        "version": f"{rng.randint(0, 5)}.{rng.randint(0, 20)}.{rng.randint(0, 9)}+{game_version}",
+        "name": name,
+        "description": "Synthetic mod generated for benchmarks",
+        "authors": ["bench"],
+        "contact": {"sources": f"https://example.invalid/{mod_id}"},
+        "environment": "*",
+        "entrypoints": {"main": [f"bench.mod{index}.Main"]},
+        "depends": depends,
+    }
+
+
+def generate_pack(folder: str, count: int, seed: int = 0, size_scale: float = 1.0,
+                  game_version: str = "1.20.1") -> list[SyntheticMod]:
+    # 在folder中生成count个jar，相同seed生成的内容完全一致
+    rng = random.Random(seed)
+    Path(folder).mkdir(parents=True, exist_ok=True)
+    mods = []
+    for index in range(count):
+        mod_config = mod_config_for(index, rng, game_version)
+        data = build_jar(mod_config, jar_size(rng, size_scale), rng)
+        filename = f"{mod_config['id']}-{mod_config['version']}.jar"
+        with open(os.path.join(folder, filename), "wb") as f:
+            f.write(data)
+        mods.append(SyntheticMod(
+            index=index,
+            mod_id=mod_config["id"],
+            name=mod_config["name"],
+            project_id=f"P{index:07d}",
+            filename=filename,
+            sha1=hashlib.sha1(data).hexdigest(),
+            sha512=hashlib.sha512(data).hexdigest(),
+            size=len(data),
+            depends=[k for k in mod_config["depends"] if k in LIBRARY_IDS],
+        ))
+    return mods
@@ -1,9 +1,15 @@
 if __name__ == "__main__":
     import os
-    from src.generate_config import generate_config
-    if not os.path.isfile("config.toml"):
+    import sys
+    if len(sys.argv) > 1:
+        # 带参数时进入无界面模式: check / plan / apply，不导入界面相关模块
+        from src.cli import main
+        sys.exit(main())
+    from src import tools
+    if not os.path.isfile(tools.CONFIG_PATH):
+        from src.generate_config import generate_config
         generate_config()
-    from src.tui import start_fill_missing_config
-    start_fill_missing_config()
-    from src.tui import start_menu
-    start_menu()
+    tools.setup_logging()
+    # 配置只读取一次，显式传给界面
+    from src.tui import start_tui
+    start_tui(tools.load_config())
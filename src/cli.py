@@ -0,0 +1,340 @@
+import argparse
+import json
+import logging
+import signal
+import sys
+import threading
+from typing import Any
+
+import tomlkit
+
+from . import dependencies, downloader, fleet, get_mod_info, scheduler, tools, tracing, version_index
+from .mod_record import ModRecord, ModStatus
+
+# 退出码
+EXIT_OK = 0  # 全部完成，无可用更新
+EXIT_ERROR = 1  # 配置或目录错误等致命错误
+EXIT_UPDATES_AVAILABLE = 2  # check/plan: 存在可用更新
+EXIT_PARTIAL = 3  # 部分mod解析或下载失败
+
+STATUS_UP_TO_DATE = ModStatus.UP_TO_DATE.value
+STATUS_UPDATE_AVAILABLE = ModStatus.UPDATE_AVAILABLE.value
+STATUS_NOT_FOUND = ModStatus.NOT_FOUND.value
+STATUS_NO_COMPATIBLE_VERSION = ModStatus.NO_COMPATIBLE_VERSION.value
+STATUS_ERROR = "error"
+STATUS_MISSING_DEPENDENCY = "missing_dependency"
+STATUS_UNRESOLVED_DEPENDENCY = "unresolved_dependency"
+
+_output_lock = threading.Lock()
+
+
+def emit(record: dict) -> None:
+    # 每行一个JSON对象，立即刷新，下游可以边读边处理
+    with _output_lock:
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+
+
+def parse_override(text: str) -> tuple[str, Any]:
+    key, sep, value = text.partition("=")
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"Invalid override '{text}', expected key=value")
+    # 按TOML语法解析值，解析失败时当作字符串
+    try:
+        parsed = tomlkit.parse(f"v = {value}")["v"]
+    except Exception:
+        parsed = value
+    return key.strip(), parsed
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="main.py", description="Minecraft Mod 批量更新(无界面模式)")
+    parser.add_argument("--config", default=tools.CONFIG_PATH, help="配置文件路径")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], type=parse_override,
+                        metavar="KEY=VALUE", help="覆盖配置项，可多次使用")
+    parser.add_argument("--from-folder", dest="modFolderFrom", help="源mod目录")
+    parser.add_argument("--to-folder", dest="modFolderTo", help="目标mod目录")
+    parser.add_argument("--game-version-from", dest="updateGameVersionFrom", help="源游戏版本")
+    parser.add_argument("--game-version-to", dest="updateGameVersionTo", help="目标游戏版本")
+    parser.add_argument("--trace", metavar="DIR", help="结束后把各阶段耗时导出为JSON摘要和Chrome trace")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("check", help="检查更新，每个mod输出一行JSON")
+    for name, help_text in (("plan", "输出更新计划"), ("apply", "执行更新")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--only", nargs="+", metavar="MOD",
+                         help="只处理指定的mod(名称或文件名)")
+    matrix = subparsers.add_parser("matrix", help="一次查询多个目标游戏版本下各mod的兼容情况")
+    matrix.add_argument("game_versions", nargs="+", metavar="GAME_VERSION", help="候选目标游戏版本")
+    matrix.add_argument("--loader", default="fabric", help="加载器，默认fabric")
+    matrix.add_argument("--release-only", action="store_true", help="只统计正式版(release)")
+    daemon_parser = subparsers.add_parser("daemon", help="常驻运行，监听mod目录并通过本地接口提供更新状态")
+    daemon_parser.add_argument("--listen", help="监听地址，主机:端口 或 unix:路径，默认使用配置中的daemonListen")
+    export = subparsers.add_parser("export-mirror", help="把mod的版本信息、新版本及前置mod导出到镜像目录")
+    export.add_argument("folder", metavar="DIR", help="镜像目录，已有的镜像会合并更新")
+    export.add_argument("--game-versions", nargs="+", metavar="GAME_VERSION",
+                        help="导出哪些目标游戏版本的新版本，默认updateGameVersionTo")
+    export.add_argument("--loader", default="fabric", help="加载器，默认fabric")
+    return parser
+
+
+def apply_config(args: argparse.Namespace) -> None:
+    # 配置只读取一次，合并命令行覆盖后再交给tools
+    config = tools.load_config(args.config)
+    for key in ("modFolderFrom", "modFolderTo", "updateGameVersionFrom", "updateGameVersionTo"):
+        value = getattr(args, key)
+        if value is not None:
+            config[key] = value
+    for key, value in args.overrides:
+        config[key] = value
+    tools.set_config(config, args.config)
+
+
+def mod_status(record: ModRecord) -> str:
+    # 重试后仍未解析的mod记为error
+    return STATUS_ERROR if record.status is ModStatus.PENDING else record.status.value
+
+
+def mod_record(record: ModRecord) -> dict:
+    return {
+        "name": record.name,
+        "file": record.filename,
+        "sha1": record.sha1,
+        "local_version": record.local_version,
+        "current_version": record.current_version_number,
+        "latest_version": record.latest_version_number,
+        "status": mod_status(record),
+    }
+
+
+def resolve_all(on_resolved: fleet.FleetCallback) -> tuple[list[fleet.Instance], dict[str, dict[str, ModRecord]]]:
+    # 解析所有实例的mod，每解析完一个调用一次 on_resolved(instance, record)
+    instances = fleet.load_instances(tools.config)
+    records = fleet.scan_fleet(instances)
+    fleet.resolve_fleet(instances, records, tools.config.get("maxRetries", 3), on_resolved)
+    return instances, records
+
+
+def with_instance(record: dict, instance: fleet.Instance) -> dict:
+    # 配置了多实例时在每行中注明实例名
+    if tools.config.get("instances"):
+        return {"instance": instance.name, **record}
+    return record
+
+
+def exit_code_for(statuses: list[str]) -> int:
+    if STATUS_ERROR in statuses or STATUS_UNRESOLVED_DEPENDENCY in statuses:
+        return EXIT_PARTIAL
+    if STATUS_UPDATE_AVAILABLE in statuses:
+        return EXIT_UPDATES_AVAILABLE
+    return EXIT_OK
+
+
+def plan_record(mod: ModRecord, cross_version: bool, selected: bool) -> dict:
+    record = mod_record(mod)
+    if mod.has_update and selected:
+        mod_file = mod.latest_version.files[0]
+        record.update(action="update", url=mod_file.url,
+                      filename=mod_file.filename, target_sha1=mod_file.hashes.sha1)
+    elif cross_version:
+        # 跨版本只保留更新后的mod
+        record["action"] = "drop"
+    else:
+        record["action"] = "keep"
+    return record
+
+
+def dependency_records(plan: dependencies.DependencyPlan) -> list[dict]:
+    records = []
+    for project_id, version in plan.versions.items():
+        mod_file = version.files[0]
+        records.append({
+            "name": dependencies.version_label(version),
+            "project_id": project_id,
+            "required_by": plan.required_by[project_id],
+            "latest_version": version.version_number,
+            "status": STATUS_MISSING_DEPENDENCY,
+            "action": "add_dependency",
+            "url": mod_file.url,
+            "filename": mod_file.filename,
+            "target_sha1": mod_file.hashes.sha1,
+        })
+    for dep in plan.missing:
+        records.append({"name": dep.target, "required_by": dep.required_by, "reason": dep.reason,
+                        "status": STATUS_UNRESOLVED_DEPENDENCY})
+    return records
+
+
+def selected_updates(args: argparse.Namespace, instances: list[fleet.Instance],
+                     records: dict[str, dict[str, ModRecord]]) -> dict[str, list[ModRecord]]:
+    return {
+        instance.name: [mod for mod in records[instance.name].values()
+                        if mod.has_update and is_selected(args, mod)]
+        for instance in instances
+    }
+
+
+def emit_dependencies(instances: list[fleet.Instance], plans: dict[str, dependencies.DependencyPlan],
+                      statuses: list[str]) -> None:
+    # 依赖按API声明逐层展开，fabric.mod.json 中的依赖要在apply下载完成后才能检查
+    for instance in instances:
+        for record in dependency_records(plans[instance.name]):
+            statuses.append(record["status"])
+            emit(with_instance(record, instance))
+
+
+def cmd_check(args: argparse.Namespace) -> int:
+    statuses: list[str] = []
+
+    def on_resolved(instance: fleet.Instance, mod: ModRecord) -> None:
+        record = mod_record(mod)
+        statuses.append(record["status"])
+        emit(with_instance(record, instance))
+    resolve_all(on_resolved)
+    return exit_code_for(statuses)
+
+
+def is_selected(args: argparse.Namespace, mod: ModRecord) -> bool:
+    return not args.only or mod.name in args.only or mod.filename in args.only
+
+
+def cmd_plan(args: argparse.Namespace) -> int:
+    statuses: list[str] = []
+
+    def on_resolved(instance: fleet.Instance, mod: ModRecord) -> None:
+        record = plan_record(mod, instance.cross_version, is_selected(args, mod))
+        statuses.append(record["status"])
+        emit(with_instance(record, instance))
+    instances, records = resolve_all(on_resolved)
+    emit_dependencies(instances, fleet.plan_fleet_dependencies(
+        instances, selected_updates(args, instances, records)), statuses)
+    return exit_code_for(statuses)
+
+
+def cmd_apply(args: argparse.Namespace) -> int:
+    # 每个mod解析完成后立即输出计划，全部下载完成后再为要更新的mod各输出一行结果(ok)
+    statuses: list[str] = []
+
+    def on_resolved(instance: fleet.Instance, mod: ModRecord) -> None:
+        record = plan_record(mod, instance.cross_version, is_selected(args, mod))
+        statuses.append(record["status"])
+        emit(with_instance(record, instance))
+    instances, records = resolve_all(on_resolved)
+    selected = selected_updates(args, instances, records)
+    plans = fleet.plan_fleet_dependencies(instances, selected)
+    emit_dependencies(instances, plans, statuses)
+    outcome = fleet.apply_fleet(instances, selected, on_tick=lambda tasks: None, dependency_plans=plans)
+    failed = False
+    for instance in instances:
+        downloaded_mods, failed_mods = outcome[instance.name]
+        failed = failed or bool(failed_mods)
+        for mod in selected[instance.name]:
+            emit(with_instance({**mod_record(mod), "action": "update",
+                 "ok": mod.key in downloaded_mods}, instance))
+    if failed or STATUS_ERROR in statuses:
+        return EXIT_PARTIAL
+    return EXIT_OK
+
+
+def current_versions(hashes: list[str]) -> dict[str, object]:
+    versions: dict[str, object] = {}
+    for chunk in get_mod_info.chunked(hashes):
+        versions.update(scheduler.get_scheduler().run_with_retries(
+            get_mod_info.get_versions_from_hashes, chunk, max_retries=tools.config.get("maxRetries", 3)))
+    return versions
+
+
+def cmd_matrix(args: argparse.Namespace) -> int:
+    # 每个project只取一次完整版本列表并建立索引，所有候选版本在同一遍中得出结果
+    instances = fleet.load_instances(tools.config)
+    records = fleet.scan_fleet(instances)
+    hashes = list({mod.sha1 for instance_records in records.values() for mod in instance_records.values()})
+    current = current_versions(hashes)
+    indexes = version_index.load_version_indexes(
+        {version.project_id for version in current.values()},
+        tools.config.get("maxConcurrentRequests", version_index.DEFAULT_MATRIX_WORKERS),
+        tools.config.get("maxRetries", 3))
+    statuses: list[str] = []
+    for instance in instances:
+        compatible = dict.fromkeys(args.game_versions, 0)
+        for mod in records[instance.name].values():
+            record = {"name": mod.name, "file": mod.filename, "sha1": mod.sha1}
+            version = current.get(mod.sha1)
+            index = indexes.get(version.project_id) if version else None
+            if version is None:
+                record["status"] = STATUS_NOT_FOUND
+            elif index is None:
+                record.update(project_id=version.project_id, status=STATUS_ERROR)
+            else:
+                latest = {game_version: get_mod_info.get_mod_version_number(
+                    index.latest(game_version, args.loader, args.release_only)) for game_version in args.game_versions}
+                for game_version, version_number in latest.items():
+                    if version_number:
+                        compatible[game_version] += 1
+                record.update(project_id=version.project_id, status="ok", versions=latest)
+            statuses.append(record["status"])
+            emit(with_instance(record, instance))
+        for game_version, count in compatible.items():
+            emit(with_instance({"summary": game_version, "compatible": count,
+                 "total": len(records[instance.name])}, instance))
+    return EXIT_PARTIAL if STATUS_ERROR in statuses else EXIT_OK
+
+
+def cmd_export_mirror(args: argparse.Namespace) -> int:
+    # 在能访问外网的机器上执行，生成的目录可直接共享或用任意静态HTTP服务提供
+    from . import mirror
+    instances = fleet.load_instances(tools.config)
+    records = fleet.scan_fleet(instances)
+    hashes = [mod.sha1 for instance_records in records.values() for mod in instance_records.values()]
+    summary = mirror.export_mirror(
+        args.folder, hashes, args.game_versions or [tools.config["updateGameVersionTo"]], args.loader,
+        store=tools.get_jar_store(),
+        max_downloads=tools.config.get("maxDownloads", downloader.DEFAULT_MAX_DOWNLOADS),
+        max_retries=tools.config.get("maxRetries", 3),
+        dependency_workers=tools.config.get("dependencyWorkers", dependencies.DEFAULT_DEPENDENCY_WORKERS),
+        on_tick=lambda tasks: None)
+    emit(summary)
+    return EXIT_PARTIAL if summary["failed"] else EXIT_OK
+
+
+def cmd_daemon(args: argparse.Namespace) -> int:
+    # http.server等只有常驻模式需要
+    from . import daemon
+    update_daemon = daemon.UpdateDaemon(
+        tools.config["modFolderFrom"], tools.config["updateGameVersionTo"], mod_record,
+        max_retries=tools.config.get("maxRetries", 3),
+        refresh_interval=tools.config.get("daemonRefreshInterval", daemon.DEFAULT_REFRESH_INTERVAL))
+    stop = threading.Event()
+    # SIGTERM 与 Ctrl+C 都正常退出并清理监听的socket
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    try:
+        daemon.serve(update_daemon, args.listen or tools.config.get("daemonListen", daemon.DEFAULT_LISTEN), stop)
+    except KeyboardInterrupt:
+        stop.set()
+    return EXIT_OK
+
+
+COMMANDS = {
+    "check": cmd_check,
+    "plan": cmd_plan,
+    "apply": cmd_apply,
+    "matrix": cmd_matrix,
+    "daemon": cmd_daemon,
+    "export-mirror": cmd_export_mirror,
+}
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    tools.setup_logging()
+    try:
+        apply_config(args)
+        return COMMANDS[args.command](args)
+    except (KeyError, ValueError, NotADirectoryError, FileNotFoundError) as e:
+        logging.error("Headless run failed", exc_info=True)
+        sys.stderr.write(f"Error: {e}\n")
+        return EXIT_ERROR
+    finally:
+        if args.trace:
+            summary_path, trace_path = tracing.export(args.trace)
+            sys.stderr.write(f"Trace written to {summary_path} and {trace_path}\n")
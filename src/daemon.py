@@ -0,0 +1,174 @@
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+
+from . import tools, watcher
+from .mod_record import ModRecord, Resolution
+from .resolver import ResolutionService
+
+DEFAULT_LISTEN = "127.0.0.1:8765"
+DEFAULT_DEBOUNCE = 1.0
+DEFAULT_REFRESH_INTERVAL = 3600
+STOP_CHECK_INTERVAL = 1.0
+
+# 把mod记录转换为对外输出的一条记录
+RecordFunc = Callable[[ModRecord], dict]
+
+
+class UpdateDaemon:
+    # 常驻进程：监听modFolderFrom，只重新解析新增或变化的jar，索引、快照和解析结果始终保持在内存中
+    def __init__(self, mod_folder: str, game_version: str, record: RecordFunc, max_retries: int = 3,
+                 debounce: float = DEFAULT_DEBOUNCE, refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+                 poll_interval: float = watcher.DEFAULT_POLL_INTERVAL):
+        self.mod_folder = mod_folder
+        self.game_version = game_version
+        self.record = record
+        self.max_retries = max_retries
+        self.debounce = debounce
+        self.refresh_interval = refresh_interval
+        self.poll_interval = poll_interval
+        self.resolver = ResolutionService()
+        self.records: dict[str, ModRecord] = {}
+        self.errors: dict[str, Exception] = {}
+        self.scanned_at = 0.0
+        self.refreshed_at = 0.0
+        self._owners: dict[str, list[str]] = {}
+        self._lock = threading.Lock()
+        self.resolver.subscribe(self._on_result)
+
+    def _on_result(self, sha1: str, result: Resolution) -> None:
+        with self._lock:
+            for key in self._owners.get(sha1, []):
+                self.records[key].apply(result)
+
+    def rescan(self) -> None:
+        # 目录快照按stat增量刷新，解析服务只为尚无结果的hash发起请求
+        errors: dict[str, Exception] = {}
+        records = tools.get_mod_records(self.mod_folder, errors)
+        owners = tools.sha1_to_keys(records)
+        with self._lock:
+            # 先沿用上一次的解析结果，再用解析服务中已有的结果覆盖
+            previous = {record.sha1: record.resolution() for record in self.records.values()}
+            for record in records.values():
+                old = previous.get(record.sha1)
+                if old is not None:
+                    record.apply(old)
+            self.resolver.apply(records.values())
+            self.records = records
+            self.errors = errors
+            self._owners = owners
+            self.scanned_at = time.time()
+        self.resolver.resolve(owners, self.game_version, self.max_retries)
+
+    def refresh(self) -> None:
+        # 定期丢弃解析结果重新检查，以发现新发布的版本；响应缓存未过期的部分不会真正请求
+        # 新结果到达前继续提供旧的状态
+        logging.info("Refreshing update status")
+        self.resolver.reset()
+        self.refreshed_at = time.time()
+        self.rescan()
+
+    def status(self) -> dict:
+        with self._lock:
+            mods = [self.record(record) for record in self.records.values()]
+            errors = sorted(self.errors)
+            scanned_at = self.scanned_at
+        return {
+            "mod_folder": self.mod_folder,
+            "game_version": self.game_version,
+            "resolving": self.resolver.running,
+            "pending": self.resolver.pending(),
+            "scanned_at": scanned_at,
+            "unreadable": errors,
+            "mods": mods,
+        }
+
+    def run(self, stop: threading.Event) -> None:
+        folder_watcher = watcher.create_watcher(self.mod_folder, self.poll_interval)
+        # inotify等待不消耗资源，每秒检查一次是否需要退出；轮询时每次等待都会扫描目录，按轮询间隔等待
+        wait_interval = (folder_watcher.interval if isinstance(folder_watcher, watcher.PollingWatcher)
+                         else STOP_CHECK_INTERVAL)
+        try:
+            self.refresh()
+            while not stop.is_set():
+                timeout = max(0.0, self.refreshed_at + self.refresh_interval - time.time())
+                if folder_watcher.wait(min(timeout, wait_interval)):
+                    # 等待写入完成，把连续的多个事件合并为一次刷新
+                    stop.wait(self.debounce)
+                    folder_watcher.drain()
+                    logging.info(f"{self.mod_folder} changed, rescanning")
+                    try:
+                        self.rescan()
+                    except OSError:
+                        logging.error(f"Failed to rescan {self.mod_folder}", exc_info=True)
+                elif time.time() >= self.refreshed_at + self.refresh_interval:
+                    self.refresh()
+        finally:
+            folder_watcher.close()
+            self.resolver.cancel()
+
+
+class StatusHTTPHandler(BaseHTTPRequestHandler):
+    daemon: UpdateDaemon
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] == "/health":
+            body: Any = {"ok": True}
+        elif self.path.split("?")[0] == "/status":
+            body = self.daemon.status()
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.debug(f"Status request: {format % args}")
+
+
+class StatusSocketHandler(socketserver.StreamRequestHandler):
+    # 连接后直接返回一行JSON状态
+    daemon: UpdateDaemon
+
+    def handle(self) -> None:
+        self.wfile.write(json.dumps(self.daemon.status(), ensure_ascii=False).encode() + b"\n")
+
+
+def make_server(update_daemon: UpdateDaemon, listen: str) -> socketserver.BaseServer:
+    # listen 为 "主机:端口" 时提供HTTP接口，为 "unix:路径" 时使用Unix socket
+    if listen.startswith("unix:"):
+        path = listen[len("unix:"):]
+        if os.path.exists(path):
+            os.unlink(path)
+        handler = type("Handler", (StatusSocketHandler,), {"daemon": update_daemon})
+        server: socketserver.BaseServer = socketserver.ThreadingUnixStreamServer(path, handler)
+        os.chmod(path, 0o600)
+        return server
+    host, _, port = listen.rpartition(":")
+    handler = type("Handler", (StatusHTTPHandler,), {"daemon": update_daemon})
+    return ThreadingHTTPServer((host or "127.0.0.1", int(port)), handler)
+
+
+def serve(update_daemon: UpdateDaemon, listen: str = DEFAULT_LISTEN,
+          stop: Optional[threading.Event] = None) -> None:
+    stop = stop or threading.Event()
+    server = make_server(update_daemon, listen)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    logging.info(f"Status endpoint listening on {listen}")
+    try:
+        update_daemon.run(stop)
+    finally:
+        server.shutdown()
+        server.server_close()
+        if listen.startswith("unix:"):
+            os.unlink(listen[len("unix:"):])
@@ -0,0 +1,149 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, NamedTuple, Optional
+
+from . import get_mod_info, scheduler
+
+REQUIRED = "required"
+DEFAULT_DEPENDENCY_WORKERS = 8
+# fabric.mod.json 的 depends 中由游戏或加载器本身提供的id
+BUILTIN_MOD_IDS = frozenset({"minecraft", "java", "fabricloader", "fabric-loader"})
+# mod id 与Modrinth slug不一致的常见情况
+MOD_ID_SLUGS = {"fabric": "fabric-api"}
+
+
+class MissingDependency(NamedTuple):
+    required_by: str
+    target: str  # project_id、version_id 或 fabric.mod.json 中的mod id
+    reason: str
+
+
+class DependencyPlan:
+    def __init__(self):
+        # project_id -> 需要额外下载的版本
+        self.versions: dict[str, Any] = {}
+        self.required_by: dict[str, str] = {}
+        self.missing: list[MissingDependency] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.versions or self.missing)
+
+    def items(self) -> list[tuple[str, Any]]:
+        # (下载名称, 版本)，名称使用文件名
+        return [(version_label(version), version) for version in self.versions.values()]
+
+
+def required_dependencies(version: Any) -> list[Any]:
+    return [dep for dep in getattr(version, "dependencies", None) or [] if dep.dependency_type == REQUIRED]
+
+
+def version_label(version: Any) -> str:
+    return version.files[0].filename if version.files else version.project_id
+
+
+def _fetch_level(wanted_versions: dict[str, str], wanted_projects: dict[str, str], game_version: str,
+                 loader: str, workers: int) -> list[tuple[str, str, Optional[Any]]]:
+    # 同一层的依赖并发获取，返回 (依赖方, 目标, 版本或None)
+    run = scheduler.get_scheduler().run_with_retries
+    fetched: list[tuple[str, str, Optional[Any]]] = []
+    if wanted_versions:
+        try:
+            versions = run(get_mod_info.get_versions_by_ids, list(wanted_versions))
+        except Exception:
+            logging.error("Failed to fetch pinned dependency versions", exc_info=True)
+            versions = {}
+        fetched.extend((by, version_id, versions.get(version_id))
+                       for version_id, by in wanted_versions.items())
+    if wanted_projects:
+        def latest(project_id: str) -> Optional[Any]:
+            try:
+                return run(get_mod_info.get_project_latest_version, project_id, game_version, loader)
+            except Exception as e:
+                logging.error(f"Failed to fetch dependency {project_id}: {e}")
+                return None
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            results = pool.map(latest, list(wanted_projects))
+            fetched.extend((by, project_id, version)
+                           for (project_id, by), version in zip(wanted_projects.items(), results))
+    return fetched
+
+
+def resolve_closure(roots: Iterable[tuple[str, Any]], installed_projects: Iterable[str], game_version: str,
+                    loader: str = "fabric", workers: int = DEFAULT_DEPENDENCY_WORKERS,
+                    extra_projects: Optional[dict[str, str]] = None) -> DependencyPlan:
+    # 逐层展开必需依赖：每层收集所有尚未安装或计划中的依赖，并发获取后作为下一层继续展开
+    # roots 为 (名称, 版本)，extra_projects 为额外需要的 {project_id: 依赖方}
+    plan = DependencyPlan()
+    frontier = [(name, version) for name, version in roots if version is not None]
+    known = set(installed_projects) | {version.project_id for _, version in frontier}
+    pending_projects = {project_id: by for project_id, by in (extra_projects or {}).items()
+                        if project_id not in known}
+    level = 0
+    while frontier or pending_projects:
+        level += 1
+        wanted_versions: dict[str, str] = {}
+        wanted_projects: dict[str, str] = pending_projects
+        pending_projects = {}
+        for name, version in frontier:
+            for dep in required_dependencies(version):
+                if dep.project_id:
+                    # 固定的version_id可能不兼容目标游戏版本，有project_id时按目标版本取最新
+                    if dep.project_id not in known:
+                        wanted_projects.setdefault(dep.project_id, name)
+                elif dep.version_id:
+                    wanted_versions.setdefault(dep.version_id, name)
+                else:
+                    plan.missing.append(MissingDependency(
+                        name, dep.file_name or "", "external file"))
+        frontier = []
+        for by, target, version in _fetch_level(wanted_versions, wanted_projects, game_version, loader, workers):
+            if version is None:
+                plan.missing.append(MissingDependency(by, target, "no compatible version"))
+                continue
+            if version.project_id in known:
+                continue
+            known.add(version.project_id)
+            plan.versions[version.project_id] = version
+            plan.required_by[version.project_id] = by
+            frontier.append((version_label(version), version))
+        if frontier:
+            logging.info(f"Dependency level {level}: {len(frontier)} new mods to download")
+    for dep in plan.missing:
+        logging.error(f"Unresolved dependency {dep.target} required by {dep.required_by}: {dep.reason}")
+    return plan
+
+
+def missing_mod_ids(mod_configs: Iterable[Optional[dict]]) -> dict[str, str]:
+    # 按 fabric.mod.json 检查目录中的依赖，返回 {缺失的mod id: 依赖方}
+    mod_configs = [mod_config for mod_config in mod_configs if mod_config]
+    provided = set(BUILTIN_MOD_IDS)
+    for mod_config in mod_configs:
+        provided.add(mod_config.get("id"))
+        provided.update(mod_config.get("provides") or [])
+        provided.update(mod_config.get("nested") or [])
+    missing: dict[str, str] = {}
+    for mod_config in mod_configs:
+        depends = mod_config.get("depends")
+        if not isinstance(depends, dict):
+            continue
+        for mod_id in depends:
+            if mod_id not in provided:
+                missing.setdefault(mod_id, mod_config.get("id", "?"))
+    return missing
+
+
+def resolve_mod_ids(mod_ids: dict[str, str]) -> tuple[dict[str, str], list[MissingDependency]]:
+    # mod id 通常与Modrinth上的slug一致，以此查找对应的project
+    if not mod_ids:
+        return {}, []
+    slugs = {mod_id: MOD_ID_SLUGS.get(mod_id, mod_id) for mod_id in mod_ids}
+    try:
+        found = scheduler.get_scheduler().run_with_retries(
+            get_mod_info.get_project_ids, sorted(set(slugs.values())))
+    except Exception:
+        logging.error("Failed to look up dependency projects", exc_info=True)
+        found = {}
+    projects = {found[slugs[mod_id]]: by for mod_id, by in mod_ids.items() if slugs[mod_id] in found}
+    missing = [MissingDependency(by, mod_id, "no matching project")
+               for mod_id, by in mod_ids.items() if slugs[mod_id] not in found]
+    return projects, missing
@@ -0,0 +1,159 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional
+
+from . import tracing
+from .hashing import MultiHasher, check_digests
+
+if TYPE_CHECKING:
+    import httpx
+
+DEFAULT_MAX_DOWNLOADS = 4
+CHUNK_SIZE = 64 * 1024
+DOWNLOAD_TIMEOUT = 30
+
+PENDING = "pending"
+DOWNLOADING = "downloading"
+DONE = "done"
+FAILED = "failed"
+
+
+class DownloadCancelled(Exception):
+    pass
+
+
+class BandwidthLimiter:
+    # 令牌桶限制总下载速度(字节/秒)，多个下载线程共享；rate为0表示不限速，可随时调整
+    def __init__(self, rate: float = 0):
+        self.rate = rate
+        self._allowance = 0.0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self.rate = rate
+
+    def consume(self, size: int, cancel: Optional[threading.Event] = None) -> None:
+        with self._lock:
+            if self.rate <= 0:
+                return
+            now = time.monotonic()
+            # 最多累积1秒的额度，允许短时突发
+            self._allowance = min(self.rate, self._allowance + (now - self._last) * self.rate) - size
+            self._last = now
+            delay = -self._allowance / self.rate if self._allowance < 0 else 0
+        if delay:
+            if cancel is None:
+                time.sleep(delay)
+            elif cancel.wait(delay):
+                raise DownloadCancelled()
+
+
+class DownloadTask:
+    def __init__(self, url: str, filename: str, dest: Path, sha1: str, sha512: Optional[str] = None,
+                 size: int = 0, label: Optional[str] = None):
+        self.url = url
+        self.filename = filename
+        self.dest = dest
+        self.sha1 = sha1
+        self.sha512 = sha512
+        self.label = label or filename
+        self.total = size
+        self.downloaded = 0
+        self.status = PENDING
+        self.error: Optional[Exception] = None
+
+    @property
+    def percent(self) -> int:
+        if self.status == DONE:
+            return 100
+        if self.total <= 0:
+            return 0
+        return min(100, self.downloaded * 100 // self.total)
+
+
+def download_file(client: "httpx.Client", task: DownloadTask, limiter: Optional[BandwidthLimiter] = None,
+                  cancel: Optional[threading.Event] = None) -> None:
+    # 边下载边计算SHA1/SHA512，下载完成即完成校验，无需再次读取文件
+    # cancel 被设置时在下一个分块处中止并删除未完成的文件
+    part_path = task.dest.with_name(task.dest.name + ".part")
+    hasher = MultiHasher()
+    task.downloaded = 0
+    task.status = DOWNLOADING
+    try:
+        with tracing.span("download", tracing.NETWORK, file=task.filename) as span_args:
+            with client.stream("GET", task.url, timeout=DOWNLOAD_TIMEOUT, follow_redirects=True) as res:
+                res.raise_for_status()
+                task.total = int(res.headers.get("Content-Length") or task.total or 0)
+                with open(part_path, 'wb') as f:
+                    for chunk in res.iter_bytes(CHUNK_SIZE):
+                        if cancel is not None and cancel.is_set():
+                            raise DownloadCancelled(task.filename)
+                        if limiter is not None:
+                            limiter.consume(len(chunk), cancel)
+                        f.write(chunk)
+                        hasher.update(chunk)
+                        task.downloaded += len(chunk)
+            span_args["bytes"] = task.downloaded
+        tracing.count("bytes_downloaded", task.downloaded)
+        with tracing.span("verify", tracing.DISK, file=task.filename):
+            check_digests(task.filename, hasher.digests(), task.sha1, task.sha512)
+            os.replace(part_path, task.dest)
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
+
+
+class DownloadEngine:
+    def __init__(self, max_downloads: int = DEFAULT_MAX_DOWNLOADS, max_retries: int = 3):
+        self.max_downloads = max(1, max_downloads)
+        self.max_retries = max(1, max_retries)
+        import httpx
+        self.client = httpx.Client()
+        self._cancel = threading.Event()
+
+    def close(self) -> None:
+        self.client.close()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def _run_task(self, task: DownloadTask) -> DownloadTask:
+        task.dest.parent.mkdir(parents=True, exist_ok=True)
+        for attempt in range(1, self.max_retries + 1):
+            if self._cancel.is_set():
+                task.status = FAILED
+                return task
+            try:
+                logging.info(
+                    f"Downloading {task.filename} from {task.url} to {task.dest.parent}")
+                download_file(self.client, task, cancel=self._cancel)
+                task.status = DONE
+                task.error = None
+                logging.info(f"Downloaded {task.filename} to {task.dest}")
+                return task
+            except DownloadCancelled as e:
+                task.error = e
+                break
+            except Exception as e:
+                task.error = e
+                logging.error(
+                    f"Error downloading {task.filename} (attempt {attempt}): {e}")
+        task.status = FAILED
+        return task
+
+    def download_all(self, tasks: list[DownloadTask], on_tick: Optional[Callable[[list[DownloadTask]], None]] = None,
+                     tick_interval: float = 0.1) -> list[DownloadTask]:
+        # 同时进行多个下载，on_tick 在调用线程中定期执行，用于刷新进度
+        with ThreadPoolExecutor(max_workers=self.max_downloads) as pool:
+            pending = {pool.submit(self._run_task, task) for task in tasks}
+            while pending:
+                _, pending = wait(pending, timeout=tick_interval)
+                if on_tick:
+                    on_tick(tasks)
+        return tasks
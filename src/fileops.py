@@ -0,0 +1,69 @@
+import errno
+import os
+import shutil
+import threading
+from pathlib import Path
+
+# Linux 下 FICLONE ioctl，用于在支持的文件系统(btrfs/xfs)上创建reflink
+FICLONE = 0x40049409
+# 这些错误说明当前文件系统不支持对应方式，可以退回到下一种方式
+_UNSUPPORTED_ERRNOS = (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP,
+                       errno.EACCES, errno.EINVAL, errno.ENOSYS, errno.ENOTTY, errno.EOPNOTSUPP)
+
+
+def reflink(src: Path, dst: Path) -> None:
+    import fcntl
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    shutil.copystat(src, dst)
+
+
+def copy_file(src: Path, dst: Path) -> None:
+    # 优先使用 copy_file_range，数据在内核内(或NFS服务端)复制，不经过用户态
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(
+                        fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining == 0:
+                shutil.copystat(src, dst)
+                return
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+    shutil.copy2(src, dst)
+
+
+def link_or_copy(src: Path, dst: Path, allow_hardlink: bool = True) -> str:
+    # 依次尝试硬链接、reflink、普通复制，先写临时文件再替换，保证目标文件完整
+    src = Path(src)
+    dst = Path(dst)
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        method = None
+        if allow_hardlink:
+            try:
+                os.link(src, tmp)
+                method = "hardlink"
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED_ERRNOS:
+                    raise
+        if method is None:
+            try:
+                reflink(src, tmp)
+                method = "reflink"
+            except (OSError, ImportError):
+                tmp.unlink(missing_ok=True)
+                copy_file(src, tmp)
+                method = "copy"
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return method
@@ -0,0 +1,121 @@
+import logging
+from typing import Any, Callable, NamedTuple, Optional
+
+from . import dependencies, tools
+from .mod_record import ModRecord, Resolution
+from .resolver import ResolutionService
+
+
+class Instance(NamedTuple):
+    name: str
+    mod_folder_from: str
+    mod_folder_to: str
+    backup_folder: str
+    game_version_from: str
+    game_version_to: str
+
+    @property
+    def cross_version(self) -> bool:
+        return self.game_version_from != self.game_version_to
+
+
+def load_instances(config: dict) -> list[Instance]:
+    # 配置中的 [[instances]] 每项一个实例，未填写的字段继承顶层配置；没有instances时只有一个默认实例
+    tables = config.get("instances") or [{"name": "default"}]
+    instances = []
+    for idx, table in enumerate(tables):
+        instances.append(Instance(
+            name=str(table.get("name", f"instance{idx + 1}")),
+            mod_folder_from=table.get("modFolderFrom", config.get("modFolderFrom")),
+            mod_folder_to=table.get("modFolderTo", config.get("modFolderTo")),
+            backup_folder=table.get("backupFolder", config.get("backupFolder")),
+            game_version_from=table.get("updateGameVersionFrom", config.get("updateGameVersionFrom")),
+            game_version_to=table.get("updateGameVersionTo", config.get("updateGameVersionTo")),
+        ))
+    names = [instance.name for instance in instances]
+    if len(set(names)) != len(names):
+        raise KeyError("Duplicate instance names in config")
+    return instances
+
+
+# 回调参数为 (实例, mod记录)
+FleetCallback = Callable[[Instance, ModRecord], None]
+
+
+def scan_fleet(instances: list[Instance], errors: Optional[dict[str, dict]] = None) -> dict[str, dict[str, ModRecord]]:
+    records: dict[str, dict[str, ModRecord]] = {}
+    for instance in instances:
+        instance_errors: dict[str, Exception] = {}
+        records[instance.name] = tools.get_mod_records(instance.mod_folder_from, instance_errors)
+        if errors is not None:
+            errors[instance.name] = instance_errors
+    return records
+
+
+def resolve_fleet(instances: list[Instance], records: dict[str, dict[str, ModRecord]], max_retries: int = 3,
+                  on_resolved: Optional[FleetCallback] = None) -> None:
+    # 按目标游戏版本分组，每组只对去重后的SHA1发起批量请求；当前版本查询与目标版本无关，在各组之间共享
+    current_cache: dict[str, Any] = {}
+    groups: dict[str, list[Instance]] = {}
+    for instance in instances:
+        groups.setdefault(instance.game_version_to, []).append(instance)
+    for game_version, group in groups.items():
+        owners: dict[str, list[tuple[Instance, ModRecord]]] = {}
+        for instance in group:
+            for record in records[instance.name].values():
+                owners.setdefault(record.sha1, []).append((instance, record))
+        logging.info(
+            f"Resolving {len(owners)} unique mods for {len(group)} instances targeting {game_version}")
+
+        def on_result(sha1: str, result: Resolution, owners=owners) -> None:
+            for instance, record in owners.get(sha1, []):
+                record.apply(result)
+                if on_resolved:
+                    on_resolved(instance, record)
+        service = ResolutionService(current_cache)
+        service.subscribe(on_result)
+        service.resolve(owners, game_version, max_retries)
+        service.done.wait()
+    # 重试后仍失败的mod也回调一次
+    if on_resolved:
+        for instance in instances:
+            for record in records[instance.name].values():
+                if not record.resolved:
+                    on_resolved(instance, record)
+
+
+def plan_fleet_dependencies(instances: list[Instance], selected: dict[str, list[ModRecord]]) -> dict[str, dependencies.DependencyPlan]:
+    # 每个实例按各自的目标目录和游戏版本检查缺少的依赖
+    if not tools.config.get("resolveDependencies", True):
+        return {instance.name: dependencies.DependencyPlan() for instance in instances}
+    return {
+        instance.name: tools.plan_dependencies(
+            selected.get(instance.name, []), instance.mod_folder_from, instance.mod_folder_to,
+            instance.game_version_to, instance.cross_version)
+        for instance in instances
+    }
+
+
+def apply_fleet(instances: list[Instance], selected: dict[str, list[ModRecord]],
+                on_tick: Optional[Callable[[list], None]] = None,
+                dependency_plans: Optional[dict[str, dependencies.DependencyPlan]] = None) -> dict[str, tuple[set[str], list[str]]]:
+    # 所有实例的下载合并为一批，相同文件只下载一次；之后逐个实例完成备份与迁移
+    if dependency_plans is None:
+        dependency_plans = plan_fleet_dependencies(instances, selected)
+    items = []
+    for instance in instances:
+        for record in selected.get(instance.name, []):
+            items.append((f"{instance.name}/{record.key}", record.latest_version, instance.mod_folder_to))
+        for label, version in dependency_plans[instance.name].items():
+            items.append((f"{instance.name}/{label}", version, instance.mod_folder_to))
+    results = tools.download_to_folders(items, on_tick=on_tick)
+    outcome: dict[str, tuple[set[str], list[str]]] = {}
+    for instance in instances:
+        selected_mods = selected.get(instance.name, [])
+        plan = dependency_plans[instance.name]
+        keys = [record.key for record in selected_mods] + [label for label, _ in plan.items()]
+        instance_results = {key: results.get(f"{instance.name}/{key}", False) for key in keys}
+        outcome[instance.name] = tools.complete_update(
+            selected_mods, instance_results, plan, instance.mod_folder_from, instance.mod_folder_to,
+            instance.backup_folder, instance.game_version_to, instance.cross_version, on_tick=on_tick)
+    return outcome
@@ -0,0 +1,68 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+from . import tracing
+from .fileops import link_or_copy
+from .mod_index import ModIndex
+
+DEFAULT_SYNC_WORKERS = 8
+
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class SyncReport(NamedTuple):
+    # {文件名: 处理方式}，处理方式为 skipped/hardlink/reflink/copy/failed
+    results: dict[str, str]
+
+    def count(self, method: str) -> int:
+        return sum(1 for m in self.results.values() if m == method)
+
+
+def is_up_to_date(src: Path, dst: Path, index: Optional[ModIndex] = None) -> bool:
+    # 同一inode(已硬链接)直接视为一致；否则大小、修改时间、hash都一致才跳过
+    try:
+        src_st = os.stat(src)
+        dst_st = os.stat(dst)
+    except FileNotFoundError:
+        return False
+    if (src_st.st_dev, src_st.st_ino) == (dst_st.st_dev, dst_st.st_ino):
+        return True
+    if src_st.st_size != dst_st.st_size or src_st.st_mtime_ns != dst_st.st_mtime_ns:
+        return False
+    if index is None:
+        return True
+    return index.entry(str(src), src_st).sha1 == index.entry(str(dst), dst_st).sha1
+
+
+def _sync_one(src: Path, dst: Path, index: Optional[ModIndex], allow_hardlink: bool) -> str:
+    try:
+        with tracing.span("move", tracing.DISK, file=src.name) as span_args:
+            if is_up_to_date(src, dst, index):
+                span_args["method"] = SKIPPED
+                return SKIPPED
+            span_args["method"] = method = link_or_copy(src, dst, allow_hardlink)
+            return method
+    except Exception as e:
+        logging.error(f"Failed to sync {src} to {dst}: {e}")
+        return FAILED
+
+
+def sync_files(src_folder: str, dst_folder: str, filenames: Iterable[str], index: Optional[ModIndex] = None,
+               workers: int = DEFAULT_SYNC_WORKERS, allow_hardlink: bool = True) -> SyncReport:
+    # 把src_folder中的指定文件同步到dst_folder，已一致的文件直接跳过，其余并行链接或复制
+    src_folder = Path(src_folder)
+    dst_folder = Path(dst_folder)
+    dst_folder.mkdir(parents=True, exist_ok=True)
+    filenames = list(filenames)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        methods = pool.map(lambda name: _sync_one(
+            src_folder / name, dst_folder / name, index, allow_hardlink), filenames)
+        results = dict(zip(filenames, methods))
+    for name, method in results.items():
+        if method not in (SKIPPED, FAILED):
+            logging.info(f"Synced {name} to {dst_folder} via {method}")
+    return SyncReport(results)
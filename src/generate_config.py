@@ -9,7 +9,29 @@ def generate_config():
     config["modFolderTo"]=tomlkit.item("").comment("目标mod目录")
     config["backupFolder"]=tomlkit.item("").comment("备份目录")
     config["cacheFolder"]=tomlkit.item("./.cache").comment("缓存目录")
-    config["updateSource"]=tomlkit.item("Modrinth").comment("更新来源")
+    config["updateSource"]=tomlkit.item("Modrinth").comment('更新来源：Modrinth、Mirror，或按顺序串联如 ["Mirror", "Modrinth"](镜像优先：镜像中已有新版本的mod不再查询Modrinth)')
+    config["mirrorLocation"]=tomlkit.item("").comment("由 export-mirror 生成的镜像，本地目录或 http(s):// 地址，updateSource包含Mirror时需要")
+    config["storeFolder"]=tomlkit.item("./.cache/store").comment("jar仓库目录，可由多个实例共享")
+    config["storeMaxSize"]=tomlkit.item(2048).comment("jar仓库容量上限(MB)")
     config["maxRetries"]=tomlkit.item(5).comment("最大重试次数")
+    config["maxConcurrentRequests"]=tomlkit.item(8).comment("API最大并发请求数")
+    config["requestsPerMinute"]=tomlkit.item(300).comment("API每分钟请求上限")
+    config["retryBaseDelay"]=tomlkit.item(1.0).comment("重试退避基础时间(秒)")
+    config["scanWorkers"]=tomlkit.item(8).comment("扫描线程数")
+    config["hashWorkers"]=tomlkit.item(8).comment("并行校验文件hash的线程数")
+    config["maxDownloads"]=tomlkit.item(4).comment("同时下载数")
+    config["prefetchUpdates"]=tomlkit.item(True).comment("检查更新时在后台预下载可更新的mod")
+    config["prefetchDownloads"]=tomlkit.item(2).comment("预下载同时下载数")
+    config["prefetchBandwidth"]=tomlkit.item(2048).comment("预下载带宽上限(KB/s)，0为不限")
+    config["syncWorkers"]=tomlkit.item(8).comment("同版本迁移时的复制线程数")
+    config["syncHardlink"]=tomlkit.item(True).comment("同版本迁移时是否使用硬链接")
+    config["resolveDependencies"]=tomlkit.item(True).comment("更新时自动补齐缺少的前置mod")
+    config["dependencyWorkers"]=tomlkit.item(8).comment("并发查询前置mod的线程数")
+    config["daemonListen"]=tomlkit.item("127.0.0.1:8765").comment("常驻模式的状态接口地址，主机:端口 或 unix:路径")
+    config["daemonRefreshInterval"]=tomlkit.item(3600).comment("常驻模式重新检查全部mod的间隔(秒)")
+    config["traceEnabled"]=tomlkit.item(True).comment("记录各阶段耗时，可在运行统计中查看")
+    config["traceFolder"]=tomlkit.item("./.cache/trace").comment("耗时报告(JSON摘要与Chrome trace)导出目录")
+    config["httpCacheMaxSize"]=tomlkit.item(256).comment("API响应缓存上限(MB)")
+    config["offlineMode"]=tomlkit.item(False).comment("离线模式，只使用已缓存的API响应")
     with open("config.toml", "w") as f:
         tomlkit.dump(config,f)
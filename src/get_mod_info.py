@@ -1,34 +1,28 @@
-from modrinth_api_wrapper import Client
-import os
-import hashlib
-from typing import Any, List
+from typing import Any, Iterator
 
+from . import http_cache, scheduler, tracing, update_source
+from .version_record import VersionRecord, decode_versions
 
-def get_file_sha1(filepath: str) -> str:
-    sha1 = hashlib.sha1()
-    with open(filepath, 'rb') as f:
-        while chunk := f.read(8192):
-            sha1.update(chunk)
-    return sha1.hexdigest()
+API_ENDPOINT = "https://api.modrinth.com"
+# 批量接口单次请求携带的hash数量
+BULK_CHUNK_SIZE = 100
 
 
-def get_mod_current_version(mod_folder: str, mod_file: str) -> Any | None:
-    client = Client()
-    mod_path = os.path.join(mod_folder, mod_file)
-    if not os.path.exists(mod_path):
-        print(f"Mod file '{mod_file}' does not exist.")
-        return None
-    version_info = client.get_version_from_hash(sha1=get_file_sha1(mod_path))
-    if not version_info:
-        print(f"No version found for mod file '{mod_file}'.")
-        return None
-    return version_info
+def request_json(endpoint: str, path: str, method: str = "GET", params: dict | None = None,
+                 json_body: Any = None, timeout: float = http_cache.DEFAULT_TIMEOUT) -> Any:
+    # 配置了响应缓存时经由缓存请求，否则直接请求
+    url = f"{API_ENDPOINT}{path}"
+    cache = http_cache.get_cache()
+    if cache is None:
+        from modrinth_api_wrapper.network import request
+        with scheduler.get_scheduler().slot(), tracing.span("http", tracing.NETWORK, endpoint=endpoint):
+            return request(url, method=method, params=params, json=json_body, timeout=timeout)
+    return cache.request_json(endpoint, url, method=method, params=params, json_body=json_body, timeout=timeout)
 
 
-def get_mod_project_id(version_info: Any) -> str | None:
-    if not version_info:
-        return None
-    return getattr(version_info, "project_id", None)
+def to_version(item: dict) -> VersionRecord:
+    # 直接从原始JSON取出需要的字段，不构造包装库的pydantic模型
+    return VersionRecord.from_json(item)
 
 
 def get_mod_version_number(version_info: Any) -> str | None:
@@ -37,23 +31,58 @@ def get_mod_version_number(version_info: Any) -> str | None:
     return getattr(version_info, "version_number", None)
 
 
-def get_mod_versions_by_id(project_id: str) -> list[Any]:
-    client = Client()
-    versions: List[Any] = []
-    version_list: List[Any] = client.list_project_versions(project_id)
-    for version in version_list:
-        loaders = getattr(version, "loaders", [])
-        if 'fabric' not in loaders:
-            continue
-        versions.append(version)
+def get_project_versions(project_id: str, loader: str | None = None) -> list[VersionRecord]:
+    # 一个project的全部版本；指定loader时在解码前筛选
+    with tracing.span("version_list", tracing.API, project=project_id):
+        return decode_versions(update_source.get_source().project_versions(project_id), loader)
+
+
+def chunked(items: list, size: int = BULK_CHUNK_SIZE) -> Iterator[list]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def get_versions_from_hashes(hashes: list[str]) -> dict[str, VersionRecord]:
+    # 一次查询多个文件对应的版本
+    if not hashes:
+        return {}
+    with tracing.span("hash_lookup", tracing.API, hashes=len(hashes)):
+        res = update_source.get_source().versions_from_hashes(hashes)
+    return {sha1: to_version(item) for sha1, item in res.items()}
+
+
+def get_latest_versions_from_hashes(hashes: list[str], game_version: str, loader: str = "fabric") -> dict[str, VersionRecord]:
+    # 由更新来源按加载器和游戏版本筛选最新版本
+    if not hashes:
+        return {}
+    with tracing.span("version_lookup", tracing.API, hashes=len(hashes), game_version=game_version):
+        res = update_source.get_source().latest_versions_from_hashes(hashes, game_version, loader)
+    return {sha1: to_version(item) for sha1, item in res.items()}
+
+
+def get_versions_by_ids(version_ids: list[str]) -> dict[str, VersionRecord]:
+    # 一次请求查询多个版本
+    versions: dict[str, VersionRecord] = {}
+    for chunk in chunked(version_ids):
+        res = update_source.get_source().versions_by_ids(chunk)
+        versions.update((item["id"], to_version(item)) for item in res)
     return versions
 
 
-def get_mod_latest_version(project_id: str, game_version: str) -> Any | None:
-    versions = get_mod_versions_by_id(project_id)
-    if not versions:
-        return None
-    for version in versions:
-        if game_version in getattr(version, "game_versions", []):
-            return version
-    return None
+def get_project_latest_version(project_id: str, game_version: str, loader: str = "fabric") -> VersionRecord | None:
+    # 由更新来源筛选加载器和游戏版本，返回结果按发布时间从新到旧排列
+    with tracing.span("version_list", tracing.API, project=project_id, game_version=game_version):
+        res = update_source.get_source().project_versions(project_id, loader, game_version)
+    return to_version(res[0]) if res else None
+
+
+def get_project_ids(ids_or_slugs: list[str]) -> dict[str, str]:
+    # 同时接受id和slug，返回 {传入的id或slug: project_id}
+    found: dict[str, str] = {}
+    for chunk in chunked(ids_or_slugs):
+        res = update_source.get_source().projects(chunk)
+        for item in res:
+            for key in (item["id"], item.get("slug")):
+                if key in chunk:
+                    found[key] = item["id"]
+    return found
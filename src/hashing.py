@@ -0,0 +1,80 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, NamedTuple, Optional
+
+from . import tracing
+
+# 每次读取1MB，hashlib在处理大块数据时会释放GIL，多个文件可在线程池中并行计算
+BUFFER_SIZE = 1024 * 1024
+DEFAULT_HASH_WORKERS = min(8, os.cpu_count() or 1)
+
+
+class FileDigests(NamedTuple):
+    sha1: str
+    sha512: str
+    size: int
+
+
+class HashMismatchError(Exception):
+    def __init__(self, filename: str, algorithm: str, expected: str, actual: str):
+        super().__init__(
+            f"Hash mismatch for {filename} ({algorithm}): {actual} != {expected}")
+        self.filename = filename
+        self.algorithm = algorithm
+
+
+class MultiHasher:
+    # 同一份数据同时计算SHA1和SHA512，数据只需读取一次
+    def __init__(self):
+        self._sha1 = hashlib.sha1()
+        self._sha512 = hashlib.sha512()
+        self.size = 0
+
+    def update(self, data) -> None:
+        self._sha1.update(data)
+        self._sha512.update(data)
+        self.size += len(data)
+
+    def digests(self) -> FileDigests:
+        return FileDigests(self._sha1.hexdigest(), self._sha512.hexdigest(), self.size)
+
+
+def hash_bytes(data: bytes) -> FileDigests:
+    hasher = MultiHasher()
+    hasher.update(data)
+    return hasher.digests()
+
+
+def hash_file(path: str | os.PathLike, buffer_size: int = BUFFER_SIZE) -> FileDigests:
+    # 复用同一块缓冲区读取，避免为每个分块分配新的bytes
+    hasher = MultiHasher()
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while n := f.readinto(buffer):
+            hasher.update(view[:n])
+    tracing.count("bytes_hashed", hasher.size)
+    return hasher.digests()
+
+
+def hash_files(paths: Iterable[str | os.PathLike], workers: int = DEFAULT_HASH_WORKERS) -> dict[str, FileDigests | OSError]:
+    # 返回 {路径: 摘要}，读取失败的文件对应异常
+    def hash_one(path: str) -> FileDigests | OSError:
+        try:
+            return hash_file(path)
+        except OSError as e:
+            return e
+    paths = [os.fspath(path) for path in paths]
+    if len(paths) <= 1 or workers <= 1:
+        return {path: hash_one(path) for path in paths}
+    with ThreadPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        return dict(zip(paths, pool.map(hash_one, paths)))
+
+
+def check_digests(filename: str, digests: FileDigests, sha1: str, sha512: Optional[str] = None) -> None:
+    # 同时校验Modrinth提供的SHA1和SHA512，未提供SHA512时只校验SHA1
+    if digests.sha1 != sha1:
+        raise HashMismatchError(filename, "sha1", sha1, digests.sha1)
+    if sha512 and digests.sha512 != sha512:
+        raise HashMismatchError(filename, "sha512", sha512, digests.sha512)
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+from . import scheduler, tracing
+
+if TYPE_CHECKING:
+    import httpx
+
+CACHE_FILE_NAME = "http_cache.sqlite3"
+DEFAULT_MAX_SIZE_MB = 256
+DEFAULT_TIMEOUT = 10
+# 各接口的缓存有效期(秒)，文件hash对应的版本基本不会变化，版本列表变化较频繁
+DEFAULT_TTLS: dict[str, int] = {
+    "version_file": 7 * 24 * 3600,
+    "version_files": 7 * 24 * 3600,
+    "version_files_update": 10 * 60,
+    "project_versions": 10 * 60,
+    "versions": 7 * 24 * 3600,
+    "projects": 24 * 3600,
+}
+
+
+class OfflineCacheMiss(Exception):
+    def __init__(self, url: str):
+        super().__init__(f"No cached response for {url} in offline mode")
+        self.url = url
+
+
+def raise_for_status(res: "httpx.Response", method: str, url: str, params: Optional[dict], data: Optional[dict]) -> None:
+    # 与 modrinth_api_wrapper.network.request 抛出相同的异常类型
+    if res.status_code in (200, 304):
+        return
+    # 包装库导入较慢(pydantic/httpx)，只在出错时才需要它的异常类型
+    from modrinth_api_wrapper.expections import (
+        InvalidRequestException,
+        ResponseCodeException,
+        TooManyRequestsException,
+    )
+    if res.status_code == 429:
+        e = TooManyRequestsException(
+            method=method, url=url, data=data, params=params)
+        # 记录服务端要求的等待时间，供调度器退避使用
+        retry_after = res.headers.get("Retry-After") or res.headers.get("X-Ratelimit-Reset")
+        try:
+            e.retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            e.retry_after = None
+        raise e
+    if res.status_code == 400:
+        try:
+            error = res.json()["error"]
+            description = res.json()["description"]
+        except Exception:
+            error = "Unknown"
+            description = "Unknown"
+        raise InvalidRequestException(
+            method=method, url=url, data=data, params=params, error=error, description=description)
+    raise ResponseCodeException(
+        status_code=res.status_code, method=method, url=url, data=data, params=params, msg=res.text)
+
+
+class HttpCache:
+    def __init__(self, cache_folder: str, max_size_mb: int = DEFAULT_MAX_SIZE_MB, offline: bool = False,
+                 ttls: Optional[dict[str, int]] = None):
+        Path(cache_folder).mkdir(parents=True, exist_ok=True)
+        self.db_path = os.path.join(cache_folder, CACHE_FILE_NAME)
+        self.max_size = max_size_mb * 1024 * 1024
+        self.offline = offline
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self._client: Optional["httpx.Client"] = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, url TEXT NOT NULL, etag TEXT, last_modified TEXT, "
+            "fetched_at REAL NOT NULL, last_used REAL NOT NULL, size INTEGER NOT NULL, body BLOB NOT NULL)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._conn.commit()
+
+    @property
+    def client(self) -> "httpx.Client":
+        # 第一次真正发起请求时才导入httpx并建立连接池，命中缓存时不需要
+        if self._client is None:
+            import httpx
+            self._client = httpx.Client()
+        return self._client
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+        if self._client is not None:
+            self._client.close()
+
+    @staticmethod
+    def make_key(method: str, url: str, params: Optional[dict], json_body: Any) -> str:
+        raw = json.dumps([method, url, params or {}, json_body],
+                         sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _get(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, fetched_at, body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+        return row
+
+    def _put(self, key: str, url: str, res: "httpx.Response") -> None:
+        body = res.content
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, res.headers.get("ETag"), res.headers.get("Last-Modified"), now, now, len(body), body))
+            self._conn.commit()
+        self.evict()
+
+    def _touch(self, key: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET fetched_at = ?, last_used = ? WHERE key = ?", (now, now, key))
+            self._conn.commit()
+
+    def evict(self) -> int:
+        # 超过大小上限时按最近使用时间淘汰
+        with self._lock:
+            total = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_size:
+                return 0
+            removed = 0
+            for key, size in self._conn.execute(
+                    "SELECT key, size FROM responses ORDER BY last_used").fetchall():
+                if total <= self.max_size:
+                    break
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                removed += 1
+            self._conn.commit()
+        logging.info(f"Evicted {removed} cached responses")
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+
+    def request_json(self, endpoint: str, url: str, method: str = "GET", params: Optional[dict] = None,
+                     json_body: Any = None, timeout: float = DEFAULT_TIMEOUT) -> Any:
+        key = self.make_key(method, url, params, json_body)
+        cached = self._get(key)
+        if cached is not None:
+            etag, last_modified, fetched_at, body = cached
+            if self.offline or time.time() - fetched_at < self.ttls.get(endpoint, 0):
+                logging.debug(f"HTTP cache hit: {method} {url}")
+                tracing.count("http_cache_hit")
+                return json.loads(body)
+        elif self.offline:
+            tracing.count("http_cache_offline_miss")
+            raise OfflineCacheMiss(url)
+        tracing.count("http_cache_miss")
+        headers = {}
+        if cached is not None:
+            # 过期后带上ETag/Last-Modified重新验证，未变化时服务端只返回304
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        import httpx
+        try:
+            # 只有真正发往网络的请求才经过调度器
+            request_scheduler = scheduler.get_scheduler()
+            with request_scheduler.slot(), tracing.span("http", tracing.NETWORK, endpoint=endpoint) as span_args:
+                res = self.client.request(
+                    method, url, params=params, json=json_body, headers=headers, timeout=timeout)
+                span_args.update(status=res.status_code, bytes=len(res.content))
+            tracing.count("bytes_api", len(res.content))
+            request_scheduler.observe(res.headers, res.status_code)
+        except httpx.TransportError as e:
+            if cached is None:
+                raise
+            logging.warning(
+                f"Network error for {method} {url} ({e}), serving stale cache")
+            tracing.count("http_cache_stale")
+            return json.loads(cached[3])
+        raise_for_status(res, method, url, params, json_body)
+        if res.status_code == 304 and cached is not None:
+            logging.debug(f"HTTP cache revalidated: {method} {url}")
+            tracing.count("http_cache_revalidated")
+            self._touch(key)
+            return json.loads(cached[3])
+        self._put(key, url, res)
+        return res.json()
+
+
+_cache: Optional[HttpCache] = None
+
+
+def configure(cache_folder: str, max_size_mb: int = DEFAULT_MAX_SIZE_MB, offline: bool = False,
+              ttls: Optional[dict[str, int]] = None) -> HttpCache:
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = HttpCache(os.path.join(cache_folder, "http"),
+                       max_size_mb, offline, ttls)
+    return _cache
+
+
+def get_cache() -> Optional[HttpCache]:
+    return _cache
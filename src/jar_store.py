@@ -0,0 +1,107 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from . import tracing
+from .fileops import link_or_copy
+
+STORE_DB_NAME = "store.sqlite3"
+DEFAULT_MAX_SIZE_MB = 2048
+
+
+class JarStore:
+    # 以SHA1为键的内容寻址jar仓库，多个实例目录可共享同一个仓库
+    def __init__(self, store_folder: str, max_size_mb: int = DEFAULT_MAX_SIZE_MB):
+        self.root = Path(store_folder)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.root / STORE_DB_NAME), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs (sha1 TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def path_for(self, sha1: str) -> Path:
+        return self.root / sha1[:2] / f"{sha1}.jar"
+
+    def has(self, sha1: str) -> bool:
+        return self.path_for(sha1).is_file()
+
+    def _touch(self, sha1: str, size: Optional[int] = None) -> None:
+        # 使用记录表而不是文件mtime，避免硬链接后修改到实例目录中文件的时间戳
+        if size is None:
+            size = self.path_for(sha1).stat().st_size
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?)", (sha1, size, time.time()))
+            self._conn.commit()
+
+    def add(self, sha1: str) -> None:
+        # 文件已由下载器校验后写入 path_for(sha1)，这里只登记
+        self._touch(sha1)
+
+    def import_file(self, src: Path, sha1: str) -> Path:
+        dst = self.path_for(sha1)
+        if not dst.exists():
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            link_or_copy(Path(src), dst)
+        self._touch(sha1)
+        return dst
+
+    def place(self, sha1: str, dest: Path) -> str:
+        src = self.path_for(sha1)
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        with tracing.span("place", tracing.DISK, file=dest.name) as span_args:
+            span_args["method"] = method = link_or_copy(src, dest)
+        self._touch(sha1)
+        logging.info(f"Placed {sha1} at {dest} via {method}")
+        return method
+
+    def gc(self) -> int:
+        # 超过大小上限时按最近使用时间淘汰，已链接到实例目录的文件不受影响
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT sha1, size FROM blobs ORDER BY last_used").fetchall()
+        total = sum(size for _, size in rows)
+        removed: set[str] = set()
+        for sha1, size in rows:
+            if total <= self.max_size:
+                break
+            self.path_for(sha1).unlink(missing_ok=True)
+            removed.add(sha1)
+            total -= size
+        # 清理已被外部删除的记录
+        removed.update(sha1 for sha1, _ in rows if sha1 not in removed and not self.has(sha1))
+        if removed:
+            with self._lock:
+                self._conn.executemany(
+                    "DELETE FROM blobs WHERE sha1 = ?", [(sha1,) for sha1 in removed])
+                self._conn.commit()
+            logging.info(f"Jar store GC removed {len(removed)} entries")
+        return len(removed)
+
+
+_stores: dict[str, JarStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_jar_store(store_folder: str, max_size_mb: int = DEFAULT_MAX_SIZE_MB) -> JarStore:
+    key = os.path.abspath(store_folder)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = JarStore(store_folder, max_size_mb)
+            _stores[key] = store
+        store.max_size = max_size_mb * 1024 * 1024
+    return store
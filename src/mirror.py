@@ -0,0 +1,257 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+from . import dependencies, downloader, get_mod_info, scheduler, tracing
+from .fileops import link_or_copy
+from .jar_store import JarStore
+from .update_source import MIRROR, UpdateSource, get_source
+
+# 镜像目录结构(可直接用任意静态HTTP服务在局域网中共享)：
+#   index.json                 版本、hash、project元数据
+#   files/<sha1前2位>/<sha1>.jar  新版本及前置mod的jar
+INDEX_NAME = "index.json"
+FILES_FOLDER = "files"
+MIRROR_FORMAT = 1
+DEFAULT_MIRROR_TIMEOUT = 30
+
+
+def file_path(sha1: str) -> str:
+    return f"{FILES_FOLDER}/{sha1[:2]}/{sha1}.jar"
+
+
+def empty_index() -> dict:
+    return {"format": MIRROR_FORMAT, "versions": {}, "hashes": {}, "projects": {}, "files": []}
+
+
+def read_index(folder: str) -> dict:
+    path = Path(folder) / INDEX_NAME
+    if not path.is_file():
+        return empty_index()
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") != MIRROR_FORMAT:
+        raise ValueError(f"Unsupported mirror format {data.get('format')!r} in {path}")
+    return data
+
+
+def write_index(folder: str, data: dict) -> None:
+    # 先写临时文件再替换，读取方不会看到写了一半的索引
+    path = Path(folder) / INDEX_NAME
+    tmp = path.with_name(f".{INDEX_NAME}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def add_version(data: dict, version: dict) -> None:
+    data["versions"][version["id"]] = version
+    for version_file in version.get("files") or ():
+        sha1 = (version_file.get("hashes") or {}).get("sha1")
+        if sha1:
+            data["hashes"][sha1] = version["id"]
+
+
+class MirrorIndex:
+    # 镜像索引在内存中的查询结构，同一project的版本按发布时间从新到旧排列
+    def __init__(self, data: dict, base_url: Optional[str] = None):
+        self.versions: dict[str, dict] = data.get("versions") or {}
+        self.hashes: dict[str, str] = data.get("hashes") or {}
+        self.projects: dict[str, dict] = data.get("projects") or {}
+        self.files: set[str] = set(data.get("files") or ())
+        self.slugs = {project.get("slug"): project_id for project_id, project in self.projects.items()
+                      if project.get("slug")}
+        self.project_versions: dict[str, list[dict]] = {}
+        for version in sorted(self.versions.values(), key=lambda v: v.get("date_published") or "", reverse=True):
+            self.project_versions.setdefault(version["project_id"], []).append(version)
+        if base_url:
+            # HTTP镜像中的文件改为从镜像下载，镜像中没有的文件保留原地址
+            for version in self.versions.values():
+                for version_file in version.get("files") or ():
+                    sha1 = (version_file.get("hashes") or {}).get("sha1")
+                    if sha1 in self.files:
+                        version_file["url"] = f"{base_url}/{file_path(sha1)}"
+
+    def matching(self, project_id: str, loader: Optional[str], game_version: Optional[str]) -> list[dict]:
+        return [version for version in self.project_versions.get(project_id, ())
+                if (not loader or loader in (version.get("loaders") or ()))
+                and (not game_version or game_version in (version.get("game_versions") or ()))]
+
+
+class MirrorSource(UpdateSource):
+    # 由 export-mirror 生成的镜像，location 为本地目录或 http(s):// 地址
+    name = MIRROR
+
+    def __init__(self, location: str, timeout: float = DEFAULT_MIRROR_TIMEOUT):
+        self.location = location.rstrip("/")
+        self.remote = self.location.startswith(("http://", "https://"))
+        self.timeout = timeout
+        self._index: Optional[MirrorIndex] = None
+        self._mtime: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def index(self) -> MirrorIndex:
+        # 本地目录在index.json更新后重新读取，常驻模式可直接用上新导出的内容
+        # HTTP镜像在本次配置内只下载一次索引
+        with self._lock:
+            if self.remote:
+                if self._index is None:
+                    self._index = MirrorIndex(self._fetch_index(), self.location)
+                return self._index
+            try:
+                mtime = (Path(self.location) / INDEX_NAME).stat().st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if self._index is None or mtime != self._mtime:
+                with tracing.span("mirror_index", tracing.DISK):
+                    self._index = MirrorIndex(read_index(self.location))
+                self._mtime = mtime
+            return self._index
+
+    def _fetch_index(self) -> dict:
+        import httpx
+        url = f"{self.location}/{INDEX_NAME}"
+        with tracing.span("mirror_index", tracing.NETWORK):
+            res = httpx.get(url, timeout=self.timeout)
+        if res.status_code == 404:
+            logging.warning(f"Mirror {url} has no index, treating it as empty")
+            return empty_index()
+        res.raise_for_status()
+        data = res.json()
+        if data.get("format") != MIRROR_FORMAT:
+            raise ValueError(f"Unsupported mirror format {data.get('format')!r} at {url}")
+        return data
+
+    def versions_from_hashes(self, hashes: list[str]) -> dict[str, dict]:
+        index = self.index()
+        found = {sha1: index.versions[index.hashes[sha1]] for sha1 in hashes if sha1 in index.hashes}
+        tracing.count("mirror_hits", len(found))
+        return found
+
+    def latest_versions_from_hashes(self, hashes: list[str], game_version: str, loader: str) -> dict[str, dict]:
+        index = self.index()
+        found = {}
+        for sha1 in hashes:
+            version_id = index.hashes.get(sha1)
+            if version_id is None:
+                continue
+            candidates = index.matching(index.versions[version_id]["project_id"], loader, game_version)
+            if candidates:
+                found[sha1] = candidates[0]
+        tracing.count("mirror_hits", len(found))
+        return found
+
+    def project_versions(self, project_id: str, loader: Optional[str] = None,
+                         game_version: Optional[str] = None) -> list[dict]:
+        return self.index().matching(project_id, loader, game_version)
+
+    def versions_by_ids(self, version_ids: list[str]) -> list[dict]:
+        index = self.index()
+        return [index.versions[version_id] for version_id in version_ids if version_id in index.versions]
+
+    def projects(self, ids_or_slugs: list[str]) -> list[dict]:
+        index = self.index()
+        project_ids = dict.fromkeys(index.slugs.get(key, key) for key in ids_or_slugs)
+        return [index.projects[project_id] for project_id in project_ids if project_id in index.projects]
+
+    def local_file(self, sha1: str) -> Optional[Path]:
+        if self.remote or sha1 not in self.index().files:
+            return None
+        path = Path(self.location) / file_path(sha1)
+        return path if path.is_file() else None
+
+
+def _fetch_chunks(func: Callable[..., Any], keys: list[str], *args: Any, max_retries: Optional[int] = None) -> list[Any]:
+    # 按批量接口的上限分批请求，返回各批的结果
+    run = scheduler.get_scheduler().run_with_retries
+    return [run(func, chunk, *args, max_retries=max_retries) for chunk in get_mod_info.chunked(keys)]
+
+
+def export_mirror(folder: str, hashes: Iterable[str], game_versions: list[str], loader: str = "fabric",
+                  store: Optional[JarStore] = None, max_downloads: int = downloader.DEFAULT_MAX_DOWNLOADS,
+                  max_retries: int = 3, dependency_workers: int = dependencies.DEFAULT_DEPENDENCY_WORKERS,
+                  on_tick: Optional[Callable[[list[downloader.DownloadTask]], None]] = None) -> dict[str, Any]:
+    # 从当前配置的更新来源导出：本地jar对应的版本、各目标游戏版本下的最新版本及其必需前置
+    # 已有的镜像会被合并更新；只下载镜像中还没有的jar，本地jar仓库中已有的直接复制
+    Path(folder).mkdir(parents=True, exist_ok=True)
+    source = get_source()
+    data = read_index(folder)
+    hashes = list(dict.fromkeys(hashes))
+    wanted: dict[str, dict] = {}  # 需要镜像jar的版本
+    unresolved: list[dict] = []
+    with tracing.span("mirror_export", tracing.API, hashes=len(hashes)):
+        current = {sha1: version for res in _fetch_chunks(source.versions_from_hashes, hashes, max_retries=max_retries)
+                   for sha1, version in res.items()}
+        installed = {version["project_id"] for version in current.values()}
+        for version in current.values():
+            add_version(data, version)
+        for game_version in game_versions:
+            latest = {sha1: version for res in _fetch_chunks(
+                source.latest_versions_from_hashes, list(current), game_version, loader, max_retries=max_retries)
+                for sha1, version in res.items()}
+            wanted.update((version["id"], version) for version in latest.values())
+            plan = dependencies.resolve_closure(
+                [(version["project_id"], get_mod_info.to_version(version)) for version in latest.values()],
+                installed, game_version, loader, dependency_workers)
+            for res in _fetch_chunks(source.versions_by_ids, [version.id for version in plan.versions.values()],
+                                     max_retries=max_retries):
+                wanted.update((version["id"], version) for version in res)
+            unresolved += [{"game_version": game_version, **dep._asdict()} for dep in plan.missing]
+        for version in wanted.values():
+            add_version(data, version)
+        project_ids = sorted({version["project_id"] for version in data["versions"].values()} - set(data["projects"]))
+        for res in _fetch_chunks(source.projects, project_ids, max_retries=max_retries):
+            data["projects"].update((project["id"], {"id": project["id"], "slug": project.get("slug")})
+                                    for project in res)
+
+    files = set(data["files"])
+    tasks: list[downloader.DownloadTask] = []
+    copied = 0
+    for version in wanted.values():
+        if not version.get("files"):
+            continue
+        version_file = get_mod_info.to_version(version).files[0]
+        sha1 = version_file.hashes.sha1
+        dest = Path(folder) / file_path(sha1)
+        if dest.is_file():
+            files.add(sha1)
+        elif store is not None and store.has(sha1):
+            # 仓库中的文件写入前已校验过
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            link_or_copy(store.path_for(sha1), dest)
+            files.add(sha1)
+            copied += 1
+        else:
+            tasks.append(downloader.DownloadTask(
+                version_file.url, version_file.filename, dest, sha1, version_file.hashes.sha512,
+                version_file.size, version_file.filename))
+    failed: list[str] = []
+    if tasks:
+        engine = downloader.DownloadEngine(max_downloads, max_retries)
+        try:
+            engine.download_all(tasks, on_tick=on_tick)
+        finally:
+            engine.close()
+        for task in tasks:
+            if task.status == downloader.DONE:
+                files.add(task.sha1)
+            else:
+                logging.error(f"Failed to mirror {task.filename}: {task.error}")
+                failed.append(task.filename)
+    data["files"] = sorted(files)
+    write_index(folder, data)
+    logging.info(f"Exported mirror to {folder}: {len(wanted)} versions, {len(tasks) - len(failed)} downloaded, "
+                 f"{copied} copied from store, {len(failed)} failed")
+    return {
+        "mirror": folder,
+        "game_versions": game_versions,
+        "versions": len(data["versions"]),
+        "files": len(files),
+        "downloaded": len(tasks) - len(failed),
+        "copied": copied,
+        "failed": failed,
+        "unresolved": unresolved,
+    }
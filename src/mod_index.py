@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+from . import hashing, read_mod, tracing
+
+INDEX_FILE_NAME = "mod_index.sqlite3"
+# 只保存后续流程会用到的 fabric.mod.json 字段
+MOD_CONFIG_FIELDS = ("id", "name", "version", "depends", "provides", "contact")
+# 保存的字段变化时递增，旧版本的索引会被清空重建
+INDEX_VERSION = 2
+
+
+class IndexEntry(NamedTuple):
+    path: str
+    size: int
+    mtime_ns: int
+    inode: int
+    sha1: str
+    sha512: str
+    mod_config: Optional[dict]
+
+
+def _stat_key(st: os.stat_result) -> tuple[int, int, int]:
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+def read_jar(path: str) -> tuple[str, str, Optional[dict]]:
+    # 只读一次文件，同时计算hash并解析fabric.mod.json
+    with open(path, 'rb') as f:
+        data = f.read()
+    sha1, sha512, _ = hashing.hash_bytes(data)
+    try:
+        mod_config = read_mod.read_mod_config_bytes(data)
+    except KeyError:
+        mod_config = None
+    if mod_config is not None:
+        nested = read_mod.read_nested_mod_ids(data, mod_config)
+        mod_config = {k: mod_config[k]
+                      for k in MOD_CONFIG_FIELDS if k in mod_config}
+        if nested:
+            # 内嵌jar的mod id，检查依赖时视为已提供
+            mod_config["nested"] = nested
+    return sha1, sha512, mod_config
+
+
+class ModIndex:
+    def __init__(self, cache_folder: str):
+        Path(cache_folder).mkdir(parents=True, exist_ok=True)
+        self.db_path = os.path.join(cache_folder, INDEX_FILE_NAME)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jars ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "inode INTEGER NOT NULL, sha1 TEXT NOT NULL, sha512 TEXT NOT NULL, mod_config TEXT)")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < INDEX_VERSION:
+            self._conn.execute("DELETE FROM jars")
+            self._conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def lookup(self, path: str, st: Optional[os.stat_result] = None) -> IndexEntry | None:
+        # 只有路径、大小、修改时间、inode全部一致才算命中
+        path = os.path.abspath(path)
+        if st is None:
+            st = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path, size, mtime_ns, inode, sha1, sha512, mod_config FROM jars WHERE path = ?",
+                (path,)).fetchone()
+        if row is None or tuple(row[1:4]) != _stat_key(st):
+            return None
+        return IndexEntry(*row[:6], json.loads(row[6]) if row[6] else None)
+
+    def entry(self, path: str, st: Optional[os.stat_result] = None) -> IndexEntry:
+        path = os.path.abspath(path)
+        if st is None:
+            st = os.stat(path)
+        cached = self.lookup(path, st)
+        if cached is not None:
+            tracing.count("index_hit")
+            return cached
+        tracing.count("index_miss")
+        with tracing.span("hash", tracing.DISK, file=os.path.basename(path), bytes=st.st_size):
+            sha1, sha512, mod_config = read_jar(path)
+        tracing.count("bytes_hashed", st.st_size)
+        entry = IndexEntry(path, *_stat_key(st), sha1, sha512, mod_config)
+        self.put(entry)
+        logging.info(f"Indexed {path} ({sha1})")
+        return entry
+
+    def put(self, entry: IndexEntry) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jars VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*entry[:6], json.dumps(entry.mod_config, ensure_ascii=False) if entry.mod_config is not None else None))
+            self._conn.commit()
+
+    def invalidate(self, path: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM jars WHERE path = ?",
+                               (os.path.abspath(path),))
+            self._conn.commit()
+
+    def prune(self, folder: str, keep: Iterable[str]) -> int:
+        # 删除某个目录下本次扫描未出现的记录
+        folder = os.path.join(os.path.abspath(folder), '')
+        keep_set = {os.path.abspath(p) for p in keep}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path FROM jars WHERE substr(path, 1, ?) = ?", (len(folder), folder)).fetchall()
+            stale = [(row[0],) for row in rows if row[0] not in keep_set]
+            self._conn.executemany("DELETE FROM jars WHERE path = ?", stale)
+            self._conn.commit()
+        return len(stale)
+
+    def compact(self) -> int:
+        # 清除文件已不存在或已被修改的记录，并回收数据库空间
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size, mtime_ns, inode FROM jars").fetchall()
+        stale = []
+        for path, *key in rows:
+            try:
+                if _stat_key(os.stat(path)) != tuple(key):
+                    stale.append((path,))
+            except OSError:
+                stale.append((path,))
+        if stale:
+            with self._lock:
+                self._conn.executemany(
+                    "DELETE FROM jars WHERE path = ?", stale)
+                self._conn.commit()
+                self._conn.execute("VACUUM")
+            logging.info(f"Compacted mod index, removed {len(stale)} entries")
+        return len(stale)
+
+
+_indexes: dict[str, ModIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_mod_index(cache_folder: str) -> ModIndex:
+    # 每个缓存目录一个实例，首次打开时顺带压缩一次
+    key = os.path.abspath(cache_folder)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = ModIndex(cache_folder)
+            try:
+                index.compact()
+            except sqlite3.Error:
+                logging.error("Failed to compact mod index", exc_info=True)
+            _indexes[key] = index
+    return index
@@ -0,0 +1,80 @@
+import enum
+from typing import NamedTuple, Optional
+
+from .version_record import VersionRecord
+
+
+class ModStatus(enum.Enum):
+    # 值与无界面模式输出的status一致
+    PENDING = "pending"  # 尚未解析或解析失败
+    UP_TO_DATE = "up_to_date"
+    UPDATE_AVAILABLE = "update_available"
+    NOT_FOUND = "not_found"  # Modrinth上没有这个文件
+    NO_COMPATIBLE_VERSION = "no_compatible_version"  # 目标游戏版本下没有可用版本
+
+
+class Resolution(NamedTuple):
+    # 解析服务对一个SHA1的结果，与目标游戏版本有关，多个同hash的mod共享
+    status: ModStatus
+    current_version_number: Optional[str] = None
+    latest_version: Optional[VersionRecord] = None
+
+
+class ModRecord:
+    # 目录中一个jar的状态；key在同一目录内唯一(优先mod id，其次SHA1、文件名)
+    __slots__ = ("key", "name", "filename", "local_version", "sha1", "sha512",
+                 "status", "current_version_number", "latest_version")
+
+    def __init__(self, key: str, name: str, filename: str, local_version: Optional[str], sha1: str, sha512: str):
+        self.key = key
+        self.name = name
+        self.filename = filename
+        self.local_version = local_version
+        self.sha1 = sha1
+        self.sha512 = sha512
+        self.status = ModStatus.PENDING
+        self.current_version_number: Optional[str] = None
+        self.latest_version: Optional[VersionRecord] = None
+
+    @property
+    def resolved(self) -> bool:
+        return self.status is not ModStatus.PENDING
+
+    @property
+    def has_update(self) -> bool:
+        return self.status is ModStatus.UPDATE_AVAILABLE
+
+    @property
+    def latest_version_number(self) -> Optional[str]:
+        return self.latest_version.version_number if self.latest_version is not None else None
+
+    def apply(self, resolution: Resolution) -> None:
+        self.status = resolution.status
+        self.current_version_number = resolution.current_version_number
+        self.latest_version = resolution.latest_version
+
+    def resolution(self) -> Optional[Resolution]:
+        if not self.resolved:
+            return None
+        return Resolution(self.status, self.current_version_number, self.latest_version)
+
+    def __repr__(self) -> str:
+        return f"ModRecord({self.key!r}, {self.filename!r}, {self.status.value})"
+
+
+def resolve_status(current_version: Optional[VersionRecord], latest_version: Optional[VersionRecord]) -> Resolution:
+    if current_version is None:
+        return Resolution(ModStatus.NOT_FOUND)
+    if latest_version is None or not latest_version.version_number:
+        return Resolution(ModStatus.NO_COMPATIBLE_VERSION, current_version.version_number)
+    status = (ModStatus.UP_TO_DATE if latest_version.version_number == current_version.version_number
+              else ModStatus.UPDATE_AVAILABLE)
+    return Resolution(status, current_version.version_number, latest_version)
+
+
+def record_key(records: dict, mod_id: Optional[str], sha1: str, filename: str) -> str:
+    # 同一mod的多个jar或相同内容的文件不会互相覆盖
+    for key in (mod_id, sha1, filename):
+        if key and key not in records:
+            return key
+    return filename
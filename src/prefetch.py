@@ -0,0 +1,111 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Optional
+
+from . import downloader, tracing, update_source
+from .jar_store import JarStore
+from .version_record import VersionRecord
+
+DEFAULT_PREFETCH_DOWNLOADS = 2
+DEFAULT_PREFETCH_BANDWIDTH_KB = 2048
+
+
+class PrefetchJob:
+    __slots__ = ("task", "cancel", "future")
+
+    def __init__(self, task: downloader.DownloadTask):
+        self.task = task
+        self.cancel = threading.Event()
+        self.future: Optional[Future] = None
+
+
+class Prefetcher:
+    # 用户还在选择时，把已解析出的更新在后台下载到jar仓库，并发数和总带宽都有上限
+    # 下载完成即已校验SHA1/SHA512，确认更新后可直接从仓库放入目标目录
+    def __init__(self, store: JarStore, max_downloads: int = DEFAULT_PREFETCH_DOWNLOADS,
+                 bandwidth: float = DEFAULT_PREFETCH_BANDWIDTH_KB * 1024, max_retries: int = 2):
+        import httpx
+        self.store = store
+        self.max_retries = max(1, max_retries)
+        self.limiter = downloader.BandwidthLimiter(bandwidth)
+        self.client = httpx.Client()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_downloads), thread_name_prefix="prefetch")
+        self._jobs: dict[str, PrefetchJob] = {}
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped
+
+    def submit(self, version: Optional[VersionRecord]) -> None:
+        # 可在解析线程中调用；已在仓库中或已提交的文件不会重复下载
+        if version is None or not version.files:
+            return
+        mod_file = version.files[0]
+        sha1 = mod_file.hashes.sha1
+        if self.store.has(sha1) or update_source.get_source().local_file(sha1) is not None:
+            # 本地镜像中的文件在确认更新时直接导入，无需预下载
+            return
+        with self._lock:
+            if self._stopped or sha1 in self._jobs:
+                return
+            job = PrefetchJob(downloader.DownloadTask(
+                mod_file.url, mod_file.filename, self.store.path_for(sha1), sha1,
+                mod_file.hashes.sha512, mod_file.size, mod_file.filename))
+            self._jobs[sha1] = job
+            job.future = self._pool.submit(self._run, job)
+
+    def _run(self, job: PrefetchJob) -> None:
+        task = job.task
+        for attempt in range(1, self.max_retries + 1):
+            if job.cancel.is_set():
+                break
+            try:
+                task.dest.parent.mkdir(parents=True, exist_ok=True)
+                downloader.download_file(self.client, task, self.limiter, job.cancel)
+                self.store.add(task.sha1)
+                task.status = downloader.DONE
+                tracing.count("prefetched")
+                logging.info(f"Prefetched {task.filename}")
+                return
+            except downloader.DownloadCancelled as e:
+                task.error = e
+                break
+            except Exception as e:
+                task.error = e
+                logging.warning(f"Prefetch of {task.filename} failed (attempt {attempt}): {e}")
+        task.status = downloader.FAILED
+
+    def progress(self) -> tuple[int, int]:
+        # (已完成, 已提交)
+        with self._lock:
+            tasks = [job.task for job in self._jobs.values()]
+        return sum(1 for task in tasks if task.status == downloader.DONE), len(tasks)
+
+    def cancel(self) -> None:
+        # 停止接收新任务，进行中的下载在下一个分块处中止
+        with self._lock:
+            self._stopped = True
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel.set()
+        logging.info("Prefetch cancelled")
+
+    def settle(self, keep: set[str]) -> None:
+        # 确认更新后调用：不再限速，取消不需要的和尚未开始的任务，等待进行中的下载完成
+        # 返回后仓库中的文件可直接使用，其余由正式下载补齐，不会与预下载写同一个文件
+        self.limiter.set_rate(0)
+        with self._lock:
+            self._stopped = True
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            if job.task.sha1 not in keep or job.task.status == downloader.PENDING:
+                job.cancel.set()
+        wait([job.future for job in jobs if job.future is not None])
+
+    def close(self) -> None:
+        self.cancel()
+        self._pool.shutdown(wait=True)
+        self.client.close()
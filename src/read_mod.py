@@ -1,3 +1,4 @@
+import io
 import json
 import os
 import pathlib
@@ -14,6 +15,34 @@ def read_mod_config(mod_folder: str, mod_file_name: str) -> dict:
     return mod_config
 
 
+def read_mod_config_bytes(data: bytes) -> dict:
+    with zipfile.ZipFile(io.BytesIO(data), 'r') as jar:
+        with jar.open("fabric.mod.json") as f:
+            mod_config = json.load(f)
+    return mod_config
+
+
+def read_nested_mod_ids(data: bytes, mod_config: dict, depth: int = 3) -> list[str]:
+    # jar-in-jar 打包的mod也算已提供，递归读取 jars 字段列出的内嵌jar
+    ids: list[str] = []
+    with zipfile.ZipFile(io.BytesIO(data), 'r') as jar:
+        for item in mod_config.get("jars") or []:
+            path = item.get("file") if isinstance(item, dict) else None
+            if not path:
+                continue
+            try:
+                nested = jar.read(path)
+                nested_config = read_mod_config_bytes(nested)
+            except (KeyError, zipfile.BadZipFile, ValueError):
+                continue
+            if "id" in nested_config:
+                ids.append(nested_config["id"])
+            ids.extend(nested_config.get("provides") or [])
+            if depth > 1:
+                ids.extend(read_nested_mod_ids(nested, nested_config, depth - 1))
+    return ids
+
+
 def extract_mod_source_url(sourceURL_from: list[str], mod_config: dict) -> str | None:
     contact = mod_config.get("contact", {})
     for source in sourceURL_from:
@@ -0,0 +1,171 @@
+import logging
+import threading
+from typing import Any, Callable, Iterable, Optional
+
+from . import get_mod_info, scheduler
+from .mod_record import ModRecord, Resolution, resolve_status
+
+# 回调参数为 (sha1, 解析结果)，由订阅方写入对应的ModRecord
+Subscriber = Callable[[str, Resolution], None]
+
+
+class ResolutionService:
+    # 由TUI持有的常驻解析服务，结果在整个会话内保留，切换菜单不会重新请求
+    def __init__(self, current_cache: Optional[dict[str, Any]] = None):
+        self.game_version: Optional[str] = None
+        # sha1 -> 当前版本(未找到为None)，与目标游戏版本无关，可在多个服务之间共享
+        self.current_cache: dict[str, Any] = current_cache if current_cache is not None else {}
+        self.max_retries = 3
+        self.results: dict[str, Resolution] = {}
+        self.done = threading.Event()
+        self.done.set()
+        self._queue: list[str] = []
+        self._queued: set[str] = set()
+        # 重试后仍解析失败的hash，不写入results，下次resolve时会重新排队
+        self._failed: set[str] = set()
+        self._subscribers: list[Subscriber] = []
+        # 每次取消都会递增代数，旧线程发现代数变化后立即退出且不再发布结果
+        self._generation = 0
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._cancel.is_set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._queued)
+
+    def failed(self) -> int:
+        with self._lock:
+            return len(self._failed)
+
+    def resolve(self, hashes: Iterable[str], game_version: str, max_retries: int = 3) -> None:
+        # 只解析尚未得到结果且不在队列中的hash；目标版本变化时丢弃旧结果
+        if game_version != self.game_version:
+            self.reset()
+            self.game_version = game_version
+        self.max_retries = max_retries
+        with self._lock:
+            for sha1 in hashes:
+                if sha1 in self.results or sha1 in self._queued:
+                    continue
+                self._queue.append(sha1)
+                self._queued.add(sha1)
+                self._failed.discard(sha1)
+            if not self._queue or self.running:
+                return
+            self._cancel = threading.Event()
+            self.done.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(self._generation, self._cancel), daemon=True)
+            self._thread.start()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._cancel.set()
+            self._queue.clear()
+            self._queued.clear()
+            self.done.set()
+
+    def reset(self) -> None:
+        self.cancel()
+        with self._lock:
+            self.results = {}
+            self._failed.clear()
+
+    def subscribe(self, callback: Subscriber) -> Callable[[], None]:
+        # 订阅时先回放已有结果，之后每解析完一个mod回调一次
+        with self._lock:
+            self._subscribers.append(callback)
+            existing = list(self.results.items())
+        for sha1, result in existing:
+            callback(sha1, result)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def apply(self, records: Iterable[ModRecord]) -> None:
+        with self._lock:
+            results = dict(self.results)
+        for record in records:
+            result = results.get(record.sha1)
+            if result is not None:
+                record.apply(result)
+
+    def _publish(self, generation: int, sha1: str, result: Resolution) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.results[sha1] = result
+            self._queued.discard(sha1)
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(sha1, result)
+            except Exception:
+                logging.error("Resolution subscriber failed", exc_info=True)
+
+    def _with_retries(self, cancel: threading.Event, func: Callable, *args) -> dict:
+        # 重试、退避与错误分类统一由请求调度器处理，取消时立即结束等待
+        return scheduler.get_scheduler().run_with_retries(
+            func, *args, cancel=cancel, max_retries=self.max_retries)
+
+    def _take_chunk(self, generation: int) -> list[str]:
+        with self._lock:
+            if generation != self._generation:
+                # 已取消的旧线程不能取走新一轮排队的hash
+                return []
+            chunk = self._queue[:get_mod_info.BULK_CHUNK_SIZE]
+            del self._queue[:len(chunk)]
+            if not chunk:
+                # 在锁内结束线程，保证之后的 resolve 会启动新线程
+                self._thread = None
+                self.done.set()
+            return chunk
+
+    def _run(self, generation: int, cancel: threading.Event) -> None:
+        game_version = self.game_version
+        while not cancel.is_set():
+            chunk = self._take_chunk(generation)
+            if not chunk:
+                return
+            try:
+                missing = [sha1 for sha1 in chunk if sha1 not in self.current_cache]
+                if missing:
+                    fetched = self._with_retries(
+                        cancel, get_mod_info.get_versions_from_hashes, missing)
+                    for sha1 in missing:
+                        self.current_cache[sha1] = fetched.get(sha1)
+                current_versions = {sha1: self.current_cache[sha1]
+                                    for sha1 in chunk if self.current_cache.get(sha1) is not None}
+                latest_versions = self._with_retries(
+                    cancel, get_mod_info.get_latest_versions_from_hashes, list(current_versions), game_version)
+            except Exception:
+                if cancel.is_set():
+                    # 主动取消时调度器会抛出异常，不算解析失败
+                    return
+                logging.error(
+                    f"Failed to resolve {len(chunk)} mods, giving up.")
+                with self._lock:
+                    # 取消后旧线程不能改动新一轮排队的hash
+                    if generation == self._generation:
+                        self._queued.difference_update(chunk)
+                        self._failed.update(chunk)
+                continue
+            for sha1 in chunk:
+                current_version = current_versions.get(sha1)
+                latest_version = latest_versions.get(sha1)
+                if current_version is None:
+                    logging.error(f"Mod {sha1} not found on Modrinth.")
+                else:
+                    logging.info(
+                        f"Fetched update for {sha1}: {current_version.version_number} → {get_mod_info.get_mod_version_number(latest_version)}")
+                self._publish(generation, sha1, resolve_status(current_version, latest_version))
+        logging.info("Resolution cancelled")
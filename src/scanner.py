@@ -0,0 +1,118 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, NamedTuple, Optional
+
+from . import tracing
+from .mod_index import IndexEntry, ModIndex
+
+DEFAULT_SCAN_WORKERS = 8
+
+
+class ScanResult(NamedTuple):
+    filename: str
+    entry: Optional[IndexEntry]
+    error: Optional[Exception]
+
+
+def list_jar_entries(mod_folder: str) -> list[os.DirEntry]:
+    with os.scandir(mod_folder) as it:
+        return [e for e in it if e.name.endswith(".jar") and e.is_file()]
+
+
+def _scan_one(index: ModIndex, dir_entry: os.DirEntry) -> ScanResult:
+    try:
+        with tracing.span("scan", tracing.DISK, file=dir_entry.name):
+            entry = index.entry(dir_entry.path, dir_entry.stat())
+        if entry.mod_config is None:
+            raise KeyError("fabric.mod.json not found")
+        return ScanResult(dir_entry.name, entry, None)
+    except Exception as e:
+        logging.error(f"Error reading {dir_entry.name}: {e}", exc_info=True)
+        return ScanResult(dir_entry.name, None, e)
+
+
+def iter_scan(mod_folder: str, index: ModIndex, workers: int = DEFAULT_SCAN_WORKERS,
+              dir_entries: Optional[list[os.DirEntry]] = None) -> Iterator[ScanResult]:
+    # 多线程打开jar、解析fabric.mod.json并计算hash，每完成一个就返回一个结果
+    if dir_entries is None:
+        dir_entries = list_jar_entries(mod_folder)
+    if not dir_entries:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(_scan_one, index, e) for e in dir_entries]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def scan_mod_folder(mod_folder: str, index: ModIndex, workers: int = DEFAULT_SCAN_WORKERS) -> tuple[list[ScanResult], dict[str, Exception]]:
+    results: list[ScanResult] = []
+    errors: dict[str, Exception] = {}
+    for result in iter_scan(mod_folder, index, workers):
+        if result.error is not None:
+            errors[result.filename] = result.error
+        else:
+            results.append(result)
+    results.sort(key=lambda r: r.filename)
+    return results, errors
+
+
+class SnapshotDiff(NamedTuple):
+    added: list[str]
+    changed: list[str]
+    removed: list[str]
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+class FolderSnapshot:
+    # 会话内常驻内存的目录快照，刷新时只重新解析新增或变化的jar
+    def __init__(self, mod_folder: str, index: ModIndex, workers: int = DEFAULT_SCAN_WORKERS):
+        self.mod_folder = mod_folder
+        self.index = index
+        self.workers = workers
+        self.entries: dict[str, IndexEntry] = {}
+        self.errors: dict[str, Exception] = {}
+        self.last_diff = SnapshotDiff([], [], [])
+        self._stats: dict[str, tuple[int, int, int]] = {}
+        self._scanned = False
+
+    def refresh(self) -> SnapshotDiff:
+        dir_entries = list_jar_entries(self.mod_folder)
+        current: dict[str, tuple[int, int, int]] = {}
+        dirty: list[os.DirEntry] = []
+        added: list[str] = []
+        changed: list[str] = []
+        for e in dir_entries:
+            st = e.stat()
+            key = (st.st_size, st.st_mtime_ns, st.st_ino)
+            current[e.name] = key
+            old_key = self._stats.get(e.name)
+            if old_key == key:
+                continue
+            (added if old_key is None else changed).append(e.name)
+            dirty.append(e)
+        removed = [name for name in self._stats if name not in current]
+        for name in removed:
+            self.entries.pop(name, None)
+            self.errors.pop(name, None)
+            self.index.invalidate(os.path.join(self.mod_folder, name))
+        for result in iter_scan(self.mod_folder, self.index, self.workers, dir_entries=dirty):
+            if result.error is not None:
+                self.entries.pop(result.filename, None)
+                self.errors[result.filename] = result.error
+            else:
+                self.errors.pop(result.filename, None)
+                self.entries[result.filename] = result.entry
+        self._stats = current
+        if not self._scanned:
+            # 首次完整扫描时清理索引中该目录下已不存在的记录
+            self.index.prune(self.mod_folder, [e.path for e in dir_entries])
+            self._scanned = True
+        self.last_diff = SnapshotDiff(
+            sorted(added), sorted(changed), sorted(removed))
+        return self.last_diff
+
+    def sorted_entries(self) -> list[tuple[str, IndexEntry]]:
+        return sorted(self.entries.items())
@@ -0,0 +1,138 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Mapping, Optional
+
+from . import tracing
+
+DEFAULT_MAX_CONCURRENCY = 8
+# Modrinth 默认限制为每分钟300次请求
+DEFAULT_REQUESTS_PER_MINUTE = 300
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+
+
+def is_retryable(error: BaseException) -> bool:
+    # 429、408和5xx以及网络层错误可以重试，其余(400/404、解析错误、离线缓存未命中等)直接失败
+    import httpx
+    from modrinth_api_wrapper.expections import ResponseCodeException
+    if isinstance(error, ResponseCodeException):
+        return error.status_code in (408, 429) or error.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class RequestScheduler:
+    # 全局请求调度：并发上限 + 令牌桶限速，并根据服务端的限速响应头动态调整
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE, max_retries: int = 3,
+                 base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY):
+        self.max_retries = max(1, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._semaphore = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._lock = threading.Lock()
+        self._capacity = float(max(1, requests_per_minute))
+        self._rate = self._capacity / 60
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self.stats = {"requests": 0, "throttled": 0, "retries": 0}
+
+    def _take_token(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                else:
+                    self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        self.stats["requests"] += 1
+                        return
+                    wait = (1 - self._tokens) / self._rate
+                self.stats["throttled"] += 1
+            tracing.count("throttled")
+            time.sleep(wait)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        with self._semaphore:
+            self._take_token()
+            yield
+
+    def observe(self, headers: Mapping[str, str], status_code: int) -> None:
+        # X-Ratelimit-Limit: 每分钟上限；Remaining: 剩余次数；Reset: 距离重置的秒数
+        limit = _header_number(headers, "X-Ratelimit-Limit")
+        remaining = _header_number(headers, "X-Ratelimit-Remaining")
+        reset = _header_number(headers, "X-Ratelimit-Reset")
+        with self._lock:
+            if limit:
+                self._capacity = limit
+                self._rate = limit / 60
+            if remaining is not None:
+                self._tokens = min(self._tokens, remaining)
+            if status_code == 429:
+                tracing.count("rate_limited")
+            if (status_code == 429 or remaining == 0) and reset is not None:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + reset)
+                logging.warning(f"Rate limited, pausing requests for {reset:.0f}s")
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        # 指数退避加随机抖动；服务端给出等待时间时以其为准
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after:
+            return retry_after + random.uniform(0, self.base_delay)
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def run_with_retries(self, func: Callable, *args, cancel: Optional[threading.Event] = None,
+                         max_retries: Optional[int] = None, **kwargs) -> Any:
+        max_retries = max_retries or self.max_retries
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                attempt += 1
+                retryable = is_retryable(e)
+                logging.error(
+                    f"Error calling {func.__name__} (attempt {attempt}, {'retryable' if retryable else 'not retryable'}): {e}")
+                if not retryable or attempt >= max_retries or (cancel is not None and cancel.is_set()):
+                    raise  # 不可重试或达到最大重试次数
+                delay = self.backoff(attempt, e)
+                with self._lock:
+                    self.stats["retries"] += 1
+                tracing.count("retries")
+                if cancel is not None:
+                    if cancel.wait(delay):
+                        raise  # 等待期间被取消
+                else:
+                    time.sleep(delay)
+
+
+_scheduler = RequestScheduler()
+
+
+def configure(max_concurrency: int = DEFAULT_MAX_CONCURRENCY, requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+              max_retries: int = 3, base_delay: float = DEFAULT_BASE_DELAY) -> RequestScheduler:
+    global _scheduler
+    _scheduler = RequestScheduler(max_concurrency, requests_per_minute, max_retries, base_delay)
+    return _scheduler
+
+
+def get_scheduler() -> RequestScheduler:
+    return _scheduler
@@ -1,563 +1,433 @@
-import threading
-import time
 import logging
 import os
 from pathlib import Path
 import shutil
-import tomlkit
-import urllib.request
-import urllib
-import curses
 import unicodedata
-import asyncio
-from typing import Dict, Any, Callable
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Any, Callable
 
-from . import get_mod_info, read_mod
+from . import dependencies, downloader, folder_sync, get_mod_info, hashing, http_cache, jar_store, read_mod, scanner, scheduler, tracing, update_source, version_index
+from .jar_store import JarStore, get_jar_store as _get_jar_store
+from .mod_index import ModIndex, get_mod_index as _get_mod_index
+from .mod_record import ModRecord, record_key
 
+if TYPE_CHECKING:
+    # 界面相关的模块只在tui中导入，无界面模式不需要curses
+    import curses
 
-logging.basicConfig(
-    filename='modupdater.log',
-    filemode='w',  # 每次运行时覆盖日志文件
-    level=logging.INFO,
-    format='%(asctime)s %(levelname)s %(message)s',
-    encoding='utf-8'
-)
+    from .prefetch import Prefetcher
 
-with open("config.toml", "rb") as f:
-    config: dict = tomlkit.load(f)
+CONFIG_PATH = "config.toml"
+LOG_PATH = "modupdater.log"
+# 与 generate_config 生成的默认配置一致
+DEFAULT_CACHE_FOLDER = "./.cache"
+
+
+def setup_logging(path: str = LOG_PATH) -> None:
+    # 由入口调用，导入本模块不会改动日志文件
+    logging.basicConfig(
+        filename=path,
+        filemode='w',  # 每次运行时覆盖日志文件
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)s %(message)s',
+        encoding='utf-8'
+    )
+
+
+def load_config(path: str = CONFIG_PATH) -> dict:
+    # 配置文件不存在时返回空配置，由调用方补全或通过命令行覆盖
+    import tomlkit
+    if not os.path.isfile(path):
+        return tomlkit.document()
+    with open(path, "rb") as f:
+        return tomlkit.load(f)
+
+
+def save_config(path: str | None = None) -> None:
+    import tomlkit
+    with open(path or config_path, "w", encoding="utf-8") as f:
+        tomlkit.dump(config, f)
+
+
+# 入口读取一次配置后通过 set_config 传入，导入本模块时不读取任何文件
+config: dict = {}
+config_path: str = CONFIG_PATH
 # update_game_version_from = config["updateGameVersionFrom"]
 # update_game_version_to = config["updateGameVersionTo"]
 
 
-def exit_gui() -> None:
-    raise SystemExit
+def setup_http_cache() -> None:
+    http_cache.configure(
+        config.get("cacheFolder", DEFAULT_CACHE_FOLDER),
+        max_size_mb=config.get("httpCacheMaxSize", http_cache.DEFAULT_MAX_SIZE_MB),
+        offline=config.get("offlineMode", False),
+        ttls=config.get("httpCacheTTL"))
 
 
-def reload_config() -> None:
-    global config
-    with open("config.toml", "rb") as f:
-        config = tomlkit.load(f)
-def reload_config_gui(stdscr: curses.window) -> None:
-    reload_config()
-    stdscr.clear()
-    stdscr.addstr(0, 0, "配置文件已重新加载。按任意键返回...")
-    stdscr.refresh()
-    stdscr.getch()
+def setup_scheduler() -> None:
+    scheduler.configure(
+        max_concurrency=config.get("maxConcurrentRequests", scheduler.DEFAULT_MAX_CONCURRENCY),
+        requests_per_minute=config.get("requestsPerMinute", scheduler.DEFAULT_REQUESTS_PER_MINUTE),
+        max_retries=config.get("maxRetries", 3),
+        base_delay=config.get("retryBaseDelay", scheduler.DEFAULT_BASE_DELAY))
+
+
+def setup_update_source() -> None:
+    # updateSource 可以是单个来源，也可以是按顺序串联的列表，如 ["Mirror", "Modrinth"]
+    update_source.configure(config.get("updateSource", update_source.MODRINTH), config.get("mirrorLocation", ""))
+    # 已建立的版本索引来自之前的来源，切换来源后重新获取
+    version_index.clear_version_indexes()
+
+
+def setup_tracing() -> None:
+    tracing.get_tracer().enabled = config.get("traceEnabled", True)
+
+
+def set_config(new_config: dict, path: str = CONFIG_PATH) -> None:
+    global config, config_path
+    config = new_config
+    config_path = path
+    apply_config()
 
-def get_mod_dict(mod_folder: str) -> dict[str, dict]:
-    mod_dict: Dict[str, dict] = {}
+
+def reload_config(path: str | None = None) -> None:
+    set_config(load_config(path or config_path), path or config_path)
+
+
+def apply_config() -> None:
+    # 修改config后调用，按新配置重建响应缓存、请求调度器和目录快照
+    _snapshots.clear()
+    setup_http_cache()
+    setup_scheduler()
+    setup_update_source()
+    setup_tracing()
+
+
+def trace_folder() -> str:
+    return config.get("traceFolder") or os.path.join(config.get("cacheFolder", DEFAULT_CACHE_FOLDER), "trace")
+
+
+def get_mod_index() -> ModIndex:
+    return _get_mod_index(config.get("cacheFolder", DEFAULT_CACHE_FOLDER))
+
+
+_snapshots: dict[str, scanner.FolderSnapshot] = {}
+
+
+def get_folder_snapshot(mod_folder: str) -> scanner.FolderSnapshot:
+    # 同一目录在本次会话中只完整扫描一次，之后按stat增量刷新
+    key = os.path.abspath(mod_folder)
+    snapshot = _snapshots.get(key)
+    if snapshot is None:
+        snapshot = scanner.FolderSnapshot(
+            mod_folder, get_mod_index(), config.get("scanWorkers", scanner.DEFAULT_SCAN_WORKERS))
+        _snapshots[key] = snapshot
+    diff = snapshot.refresh()
+    if diff:
+        logging.info(
+            f"Rescanned {mod_folder}: {len(diff.added)} added, {len(diff.changed)} changed, {len(diff.removed)} removed")
+    return snapshot
+
+
+def get_mod_records(mod_folder: str, errors: dict[str, Exception] | None = None) -> dict[str, ModRecord]:
+    # 返回 {key: ModRecord}，key见 mod_record.record_key
+    records: Dict[str, ModRecord] = {}
     if not os.path.isdir(mod_folder):
         logging.error(f"Mod folder '{mod_folder}' does not exist or is not a directory.")
         raise NotADirectoryError(f"Mod folder '{mod_folder}' does not exist or is not a directory.")
-    for mod_file in os.listdir(mod_folder):
-        if mod_file.endswith(".jar"):
-            try:
-                mod_config = read_mod.read_mod_config(mod_folder, mod_file)
-                mod_name = read_mod.extract_mod_name(mod_config)
-                mod_version = read_mod.extract_mod_version(mod_config)
-                if mod_name:
-                    mod_dict[mod_name] = {
-                        "local_version_number": mod_version,
-                        "local_filename": mod_file
-                    }
-            except Exception as e:
-                print(f"Error reading {mod_file}: {e}")
-                logging.error(f"Error reading {mod_file}: {e}", exc_info=True)
-    return mod_dict
-
-
+    snapshot = get_folder_snapshot(mod_folder)
+    if errors is not None:
+        errors.update(snapshot.errors)
+    for filename, entry in snapshot.sorted_entries():
+        mod_config = entry.mod_config or {}
+        mod_name = read_mod.extract_mod_name(mod_config)
+        if mod_name:
+            key = record_key(records, mod_config.get("id"), entry.sha1, filename)
+            records[key] = ModRecord(key, mod_name, filename, read_mod.extract_mod_version(mod_config),
+                                     entry.sha1, entry.sha512)
+    return records
+
+
+def sha1_to_keys(records: dict[str, ModRecord]) -> dict[str, list[str]]:
+    # 同一文件可能以不同文件名出现多次，解析结果要写入所有对应的记录
+    owners: dict[str, list[str]] = {}
+    for key, record in records.items():
+        owners.setdefault(record.sha1, []).append(key)
+    return owners
+
+
+@lru_cache(maxsize=65536)
 def get_display_length(s: str) -> int:
     return sum(2 if unicodedata.east_asian_width(c) in ('F', 'W') else 1 for c in s)
 
 
-def display_mod_list(stdscr: curses.window) -> None:
-    mod_dict = get_mod_dict(config["modFolderFrom"])
-    mod_list = list(mod_dict.items())
-    pos = 0
+def apply_updates(selected_mods: list[ModRecord], stdscr: "curses.window | None" = None,
+                  on_tick: Callable[[list], None] | None = None,
+                  prefetcher: "Prefetcher | None" = None) -> tuple[set[str], list[str]]:
+    # 不依赖界面的更新流程，返回 (已更新的mod的key, 下载失败的mod及依赖)
+    for record in selected_mods:
+        logging.info(
+            f"Updating mod {record.name} ({record.filename}) to version {record.latest_version_number}")
+    mod_folder_to = config["modFolderTo"]
+    game_version = config.get("updateGameVersionTo")
+    cross_version = config.get("updateGameVersionFrom") != game_version
+    # 1. 先并行下载所有需要更新的mod及其缺少的依赖
+    dependency_plan = dependencies.DependencyPlan()
+    if config.get("resolveDependencies", True):
+        dependency_plan = plan_dependencies(
+            selected_mods, config["modFolderFrom"], mod_folder_to, game_version, cross_version)
+    items = [(record.key, record.latest_version, mod_folder_to) for record in selected_mods]
+    items += [(label, version, mod_folder_to) for label, version in dependency_plan.items()]
+    if prefetcher is not None:
+        # 预下载已完成的文件直接从仓库放入，进行中的需要的文件等待完成，其余取消
+        with tracing.span("prefetch_wait", tracing.NETWORK):
+            prefetcher.settle({version.files[0].hashes.sha1 for _, version, _ in items if version.files})
+    results = download_to_folders(items, stdscr=stdscr, on_tick=on_tick)
+    return complete_update(selected_mods, results, dependency_plan, config["modFolderFrom"], mod_folder_to,
+                           config["backupFolder"], game_version, cross_version, stdscr=stdscr, on_tick=on_tick)
+
+
+def complete_update(selected_mods: list[ModRecord], results: dict[str, bool], dependency_plan: dependencies.DependencyPlan,
+                    mod_folder_from: str, mod_folder_to: str, backup_folder: str, game_version: str,
+                    cross_version: bool, stdscr: "curses.window | None" = None,
+                    on_tick: Callable[[list], None] | None = None) -> tuple[set[str], list[str]]:
+    # 下载完成后的收尾：备份和迁移，统计下载失败的依赖，再按jar中的声明补齐依赖
+    # results 按记录的key和依赖计划中的名称给出，返回 (已更新的mod的key, 下载失败的mod及依赖)
+    downloaded_mods, failed_mods = finish_update(selected_mods, results, mod_folder_from, mod_folder_to,
+                                                 backup_folder, cross_version)
+    failed_mods += [label for label, _ in dependency_plan.items() if not results.get(label)]
+    missing = list(dependency_plan.missing)
+    if config.get("resolveDependencies", True):
+        _, unresolved = complete_dependencies(mod_folder_to, game_version, stdscr=stdscr, on_tick=on_tick)
+        missing += unresolved
+    failed_mods += [dep.target for dep in missing]
+    return downloaded_mods, failed_mods
+
+
+def installed_project_ids(mod_folder: str) -> set[str]:
+    # 目录中各jar对应的Modrinth project，按hash批量查询
+    if not os.path.isdir(mod_folder):
+        return set()
+    hashes = [entry.sha1 for _, entry in get_folder_snapshot(mod_folder).sorted_entries()]
+    project_ids: set[str] = set()
+    for chunk in get_mod_info.chunked(hashes):
+        versions = scheduler.get_scheduler().run_with_retries(
+            get_mod_info.get_versions_from_hashes, chunk, max_retries=config.get("maxRetries", 3))
+        project_ids.update(version.project_id for version in versions.values())
+    return project_ids
+
+
+def plan_dependencies(selected_mods: list[ModRecord], mod_folder_from: str, mod_folder_to: str, game_version: str,
+                      cross_version: bool) -> dependencies.DependencyPlan:
+    # 更新后版本的必需依赖中，目标目录(同版本时还包括会迁移过去的原目录)没有的加入下载计划
+    try:
+        installed = installed_project_ids(mod_folder_to)
+        if not cross_version:
+            installed |= installed_project_ids(mod_folder_from)
+    except Exception:
+        # 不知道已安装哪些mod时无法判断缺少的依赖，跳过以免重复下载
+        logging.error("Failed to look up installed mods, skipping dependency resolution", exc_info=True)
+        return dependencies.DependencyPlan()
+    return dependencies.resolve_closure(
+        [(record.name, record.latest_version) for record in selected_mods], installed, game_version,
+        workers=config.get("dependencyWorkers", dependencies.DEFAULT_DEPENDENCY_WORKERS))
+
+
+def complete_dependencies(mod_folder: str, game_version: str, stdscr: "curses.window | None" = None,
+                          on_tick: Callable[[list], None] | None = None) -> tuple[list[str], list[dependencies.MissingDependency]]:
+    # 下载完成后按各jar的fabric.mod.json再检查一遍，补齐API依赖信息中没有声明的依赖
+    downloaded: list[str] = []
+    missing: list[dependencies.MissingDependency] = []
+    attempted: set[str] = set()
     while True:
-        stdscr.clear()
-        h, w = stdscr.getmaxyx()
-        if not mod_dict:
-            stdscr.addstr(0, 0, "没有找到任何mod。")
-            stdscr.addstr(1, 0, "按q返回主菜单...")
-        else:
-            stdscr.addstr(0, 0, "Mod列表(上下键翻页，q返回):")
-            max_lines = h - 2
-            visible_mods = mod_list[pos:pos+max_lines]
-            for idx, mod in enumerate(visible_mods):
-                display_str = f"{pos + idx + 1}. {mod[0]} ({mod[1]['local_version_number']})"
-                cut_str = ''
-                width = 0
-                for c in display_str:
-                    w_c = get_display_length(c)
-                    if width + w_c > w-1:
-                        break
-                    cut_str += c
-                    width += w_c
-                stdscr.addstr(idx + 1, 0, cut_str)
-            stdscr.addstr(
-                h-1, 0, f"共 {len(mod_list)} 个mod，当前{pos+1}-{pos+len(visible_mods)}，上下键翻页，q返回")
-        stdscr.refresh()
-        key = stdscr.getch()
-        if key in (ord('q'), ord('Q')):
+        snapshot = get_folder_snapshot(mod_folder)
+        mod_ids = {mod_id: by for mod_id, by in dependencies.missing_mod_ids(
+            entry.mod_config for _, entry in snapshot.sorted_entries()).items() if mod_id not in attempted}
+        if not mod_ids:
             break
-        elif key == curses.KEY_UP:
-            if pos > 0:
-                pos -= 1
-        elif key == curses.KEY_DOWN:
-            if pos + max_lines < len(mod_list):
-                pos += 1
-
-
-def set_update_source(platform: str, stdscr: curses.window) -> None:
-    config["update_from"] = platform
-    with open("config.toml", "wb") as f:
-        tomlkit.dump(config, f)
-    stdscr.addstr(0, 0, f"更新来源已设置为{platform}。按任意键返回...")
-    stdscr.refresh()
-    stdscr.getch()
-
-
-def check_update(stdscr: curses.window) -> None:
-    mod_dict = get_mod_dict(config.get("modFolderFrom"))
-    update_done = threading.Event()
-
-    def fetch_all_latest() -> None:
-        def get_mod_by_mod_file(mod_folder: str, mod_file: str) -> tuple[str, str]:
-            current_version = get_mod_info.get_mod_current_version(
-                mod_folder, mod_file)
-            project_id = get_mod_info.get_mod_project_id(current_version)
-            latest_version = get_mod_info.get_mod_latest_version(
-                project_id, config["updateGameVersionTo"])
-            return current_version, latest_version
-
-        async def fetch_and_update(mod: tuple[str, dict]) -> None:
-            max_retries = config.get("maxRetries", 3)  # 从配置中获取最大重试次数
-            retries = 0
-            while True:
-                try:
-                    current_version, latest_version = await asyncio.to_thread(get_mod_by_mod_file, mod_folder=config["modFolderFrom"], mod_file=mod[1]["local_filename"])
-                    mod_dict[mod[0]]["current_version"] = current_version
-                    mod_dict[mod[0]]["latest_version"] = latest_version
-                    mod_dict[mod[0]]["current_version_number"] = get_mod_info.get_mod_version_number(
-                        current_version)
-                    mod_dict[mod[0]]["latest_version_number"] = get_mod_info.get_mod_version_number(
-                        latest_version) or "No compatible version"
-                    logging.info(
-                        f"Fetched update for {mod[0]}: {current_version} → {latest_version}")
-                    break  # 成功则退出循环
-                except Exception as e:
-                    if e.status_code == 404:
-                        mod_dict[mod[0]]["latest_version_number"] = "Not Found"
-                        logging.error(f"Mod {mod[0]} not found on Modrinth.")
-                        break  # 直接跳过
-                    else:
-                        retries += 1
-                        logging.error(
-                            f"Error fetching update for {mod[0]} (retry {retries}): ", exc_info=True)
-                        if retries >= max_retries:
-                            break  # 达到最大重试次数才算失败
-                        await asyncio.sleep(1)  # 等待后重试
-
-        async def main_async() -> None:
-            tasks = [fetch_and_update(mod) for mod in mod_dict.items()]
-            await asyncio.gather(*tasks)
-            update_done.set()
-        asyncio.run(main_async())
-
-    threading.Thread(target=fetch_all_latest, daemon=True).start()
-    pos = 0
-    stdscr.nodelay(True)  # 设置非阻塞
-
-    def cut(s, width_ref, w):
-        out = ''
-        for c in s:
-            w_c = get_display_length(c)
-            if width_ref[0] + w_c > w-1:
-                break
-            out += c
-            width_ref[0] += w_c
-        return out
-    while True:
-        stdscr.clear()
-        h, w = stdscr.getmaxyx()
-        if not mod_dict:
-            stdscr.addstr(0, 0, "没有找到任何mod。")
-            stdscr.addstr(1, 0, "按q返回主菜单...")
-        else:
-            stdscr.addstr(0, 0, "Mod更新检查(上下键翻页，q返回):")
-            max_lines = h - 2
-            visible_mods = list(mod_dict.items())[pos:pos+max_lines]
-            for idx, mod in enumerate(visible_mods):
-                name = mod[0]
-                local_version_number = mod[1]["local_version_number"]
-                current_version_number = mod[1].get(
-                    "current_version_number", local_version_number)
-                latest_version_number = mod[1].get(
-                    "latest_version_number", None)
-                y = idx + 1
-                # 构造各部分字符串
-                prefix = f"{pos + idx + 1}. "
-                left_paren = "("
-                right_paren = ")"
-                old_ver = current_version_number
-                arrow = " → "
-                new_ver = f"{latest_version_number}" if latest_version_number is not None else ""
-                # 统一cut逻辑
-                width = [0]
-                cut_prefix = cut(prefix, width, w)
-                cut_name = cut(name, width, w)
-                cut_left = cut(left_paren, width, w)
-                cut_old = cut(old_ver, width, w)
-                cut_arrow = cut(arrow if latest_version_number and current_version_number !=
-                                latest_version_number else '', width, w)
-                cut_new = cut(new_ver if latest_version_number and current_version_number !=
-                              latest_version_number else '', width, w)
-                cut_right = cut(right_paren, width, w)
-                # 高亮和着色
-                x = 0
-                stdscr.addstr(y, x, cut_prefix)
-                x += get_display_length(cut_prefix)
-                stdscr.addstr(y, x, cut_name)
-                x += get_display_length(cut_name)
-                stdscr.addstr(y, x, cut_left, curses.color_pair(4))
-                x += get_display_length(cut_left)
-                # 旧版本号
-                if latest_version_number is None:
-                    stdscr.addstr(y, x, cut_old, curses.color_pair(4))
-                elif current_version_number == latest_version_number:
-                    stdscr.addstr(y, x, cut_old, curses.color_pair(2))
-                else:
-                    stdscr.addstr(y, x, cut_old, curses.color_pair(3))
-                x += get_display_length(cut_old)
-                # 箭头和新版本号
-                if cut_arrow:
-                    stdscr.addstr(y, x, cut_arrow)
-                    x += get_display_length(cut_arrow)
-                if cut_new:
-                    stdscr.addstr(y, x, cut_new, curses.color_pair(2 if latest_version_number !=
-                                  "Not Found" and latest_version_number != "No compatible version" else 5))
-                    x += get_display_length(cut_new)
-                stdscr.addstr(y, x, cut_right, curses.color_pair(4))
-            # 进度百分比
-            total = len(mod_dict)
-            finished = len([mod for mod in mod_dict.values()
-                           if mod.get("latest_version_number") is not None])
-            percent = int(finished / total * 100) if total else 100
-            stdscr.addstr(
-                h-1, 0, f"共 {total} 个mod，当前{pos+1}-{pos+len(visible_mods)}，上下键翻页，q返回   进度：{percent}%")
-        stdscr.refresh()
-        key = stdscr.getch()
-        if key != -1:
-            if key in (ord('q'), ord('Q')):
-                break
-            elif key == curses.KEY_UP:
-                if pos > 0:
-                    pos -= 1
-            elif key == curses.KEY_DOWN:
-                if pos + max_lines < len(mod_dict):
-                    pos += 1
-            elif key == ord('\n'):
-                stdscr.nodelay(False)  # 恢复阻塞模式
-                choose_update_mods(stdscr, mod_dict)
-                return  # 直接返回根菜单
-        time.sleep(0.01)  # 防止CPU占用过高
-    stdscr.nodelay(False)  # 恢复阻塞模式
-
-
-def choose_update_mods(stdscr: curses.window, mod_dict: dict) -> None:
-    # 只显示有可用更新的mod
-    update_mods = [
-        (name, mod_dict[name])
-        for name in mod_dict
-        if mod_dict[name].get("latest_version_number") and mod_dict[name].get("current_version_number") != mod_dict[name].get("latest_version_number") and mod_dict[name].get("latest_version_number") != "Not Found" and mod_dict[name].get("latest_version_number") != "No compatible version"
-    ]
-    if not update_mods:
-        stdscr.clear()
-        stdscr.addstr(0, 0, "没有可用更新的mod。按任意键返回...")
-        stdscr.refresh()
-        stdscr.getch()
-        return
-    pos = 0  # 当前页面起始下标
-    checked = set()  # 选中的mod下标
-    cursor = 0  # 当前页面内高亮光标位置
-    while True:
-        stdscr.clear()
-        h, w = stdscr.getmaxyx()
-        max_lines = h - 2
-        total = len(update_mods)
-        # 保证cursor在当前页
-        if cursor < 0:
-            cursor = 0
-        if cursor >= min(max_lines, total-pos):
-            cursor = min(max_lines-1, total-pos-1)
-        visible_mods = update_mods[pos:pos+max_lines]
-        stdscr.addstr(0, 0, "选择要更新的mod(空格选中/取消，回车开始更新，q返回):")
-        for idx, (name, mod) in enumerate(visible_mods):
-            checked_box = "[*]" if (pos + idx) in checked else "[ ]"
-            prefix = f"{pos + idx + 1}. "
-            left_paren = "("
-            right_paren = ")"
-            name_str = name
-            old_ver = mod['current_version_number'] or mod['version_number']
-            arrow = " → "
-            new_ver = f"{mod['latest_version_number']}" if mod['latest_version_number'] is not None else ""
-            box_str = checked_box
-            # 计算各部分宽度，防止超出
-            width = 0
-
-            def cut(s):
-                nonlocal width
-                out = ''
-                for c in s:
-                    w_c = get_display_length(c)
-                    if width + w_c > w-1:
-                        break
-                    out += c
-                    width += w_c
-                return out
-            cut_prefix = cut(prefix)
-            cut_name = cut(name_str)
-            cut_left = cut(left_paren)
-            cut_old = cut(old_ver)
-            cut_arrow = cut(arrow)
-            cut_new = cut(new_ver)
-            cut_right = cut(right_paren)
-            cut_box = cut(' ' + box_str)
-            y = idx + 1
-            x = 0
-            # 高亮行
-            if idx == cursor:
-                stdscr.addstr(y, x, cut_prefix + cut_name + cut_left + cut_old +
-                              cut_arrow + cut_new + cut_right + cut_box, curses.A_REVERSE)
-                continue
-            # 普通行
-            stdscr.addstr(y, x, cut_prefix)
-            x += get_display_length(cut_prefix)
-            # 选中mod名为黄色
-            if (pos + idx) in checked:
-                stdscr.addstr(y, x, cut_name, curses.color_pair(5))
-            else:
-                stdscr.addstr(y, x, cut_name)
-            x += get_display_length(cut_name)
-            # 左括号白色
-            stdscr.addstr(y, x, cut_left, curses.color_pair(4))
-            x += get_display_length(cut_left)
-            # 旧版本红色
-            stdscr.addstr(y, x, cut_old, curses.color_pair(3))
-            x += get_display_length(cut_old)
-            # 箭头
-            stdscr.addstr(y, x, cut_arrow)
-            x += get_display_length(cut_arrow)
-            # 新版本绿色
-            stdscr.addstr(y, x, cut_new, curses.color_pair(2))
-            x += get_display_length(cut_new)
-            # 右括号白色
-            stdscr.addstr(y, x, cut_right, curses.color_pair(4))
-            x += get_display_length(cut_right)
-            # 复选框
-            stdscr.addstr(y, x, cut_box)
-        stdscr.addstr(
-            h-1, 0, f"共 {len(update_mods)} 个可更新mod，当前{pos+1}-{pos+len(visible_mods)}，上下键移动，空格选中，回车更新，q返回")
-        stdscr.refresh()
-        key = stdscr.getch()
-        if key in (ord('q'), ord('Q')):
+        attempted.update(mod_ids)
+        logging.info(f"Missing dependencies in {mod_folder}: {', '.join(mod_ids)}")
+        projects, unresolved = dependencies.resolve_mod_ids(mod_ids)
+        missing += unresolved
+        try:
+            installed = installed_project_ids(mod_folder)
+        except Exception:
+            logging.error("Failed to look up installed mods, skipping dependency check", exc_info=True)
+            break
+        plan = dependencies.resolve_closure(
+            [], installed, game_version,
+            workers=config.get("dependencyWorkers", dependencies.DEFAULT_DEPENDENCY_WORKERS), extra_projects=projects)
+        missing += plan.missing
+        if not plan.versions:
             break
-        elif key == curses.KEY_UP:
-            if cursor > 0:
-                cursor -= 1
-            elif pos > 0:
-                pos -= 1
-        elif key == curses.KEY_DOWN:
-            if cursor < len(visible_mods) - 1:
-                cursor += 1
-            elif pos + max_lines < total:
-                pos += 1
-        elif key == ord(' '):
-            highlight_idx = pos + cursor
-            if highlight_idx < total:
-                if highlight_idx in checked:
-                    checked.remove(highlight_idx)
-                else:
-                    checked.add(highlight_idx)
-        elif key == ord('a') or key == ord('A'):
-            # 全选或取消全选
-            if len(checked) < total:
-                checked = set(range(total))
+        results = download_to_folders(
+            [(label, version, mod_folder) for label, version in plan.items()], stdscr=stdscr, on_tick=on_tick)
+        for label, version in plan.items():
+            if results.get(label):
+                downloaded.append(label)
             else:
-                checked.clear()
-        elif key == ord('\n'):
-            selected_mods = [update_mods[i]
-                             for i in checked if i < len(update_mods)]
-            if not selected_mods:
-                continue
-            pos2 = 0
-            while True:
-                stdscr.clear()
-                h, w = stdscr.getmaxyx()
-                stdscr.addstr(0, 0, "即将更新下列mod：")
-                max_lines = h - 2
-                visible_mods = selected_mods[pos2:pos2+max_lines]
-                for idx, (mod_name, _) in enumerate(visible_mods):
-                    display_str = f"{pos2 + idx + 1}. {mod_name}"
-                    cut_str = ''
-                    width = 0
-                    for c in display_str:
-                        w_c = get_display_length(c)
-                        if width + w_c > w-1:
-                            break
-                        cut_str += c
-                        width += w_c
-                    stdscr.addstr(idx + 1, 0, cut_str)
-                stdscr.addstr(
-                    h-1, 0, f"共 {len(selected_mods)} 个mod，当前{pos2+1}-{pos2+len(visible_mods)}，上下键翻页，回车继续，q返回")
-                stdscr.refresh()
-                key2 = stdscr.getch()
-                if key2 in (ord('q'), ord('Q')):
-                    break  # 返回到选择界面
-                elif key2 == curses.KEY_UP:
-                    if pos2 > 0:
-                        pos2 -= 1
-                elif key2 == curses.KEY_DOWN:
-                    if pos2 + max_lines < len(selected_mods):
-                        pos2 += 1
-                elif key2 == ord('\n'):
-                    start_update_mods(stdscr, selected_mods)
-                    return  # 直接返回主菜单
-
-
-def start_update_mods(stdscr: curses.window, selected_mods: list) -> None:
-    import shutil
-    input_mod_folder = config["modFolderFrom"]
-    output_mod_folder = config["modFolderTo"]
-    update_from = config.get("updateGameVersionFrom")
-    update_to = config.get("updateGameVersionTo")
-
-    # 1. 先处理所有需要下载/更新的mod
-    downloaded_mods = set()
-    for mod_name, mod_info in selected_mods:
-        stdscr.clear()
-        mod_local_name = mod_info["local_filename"]
-        mod_latest_version = mod_info["latest_version"]
-        stdscr.addstr(
-            0, 0, f"正在更新mod {mod_name} ({mod_local_name}) 到版本 {mod_latest_version.version_number}...")
-        stdscr.refresh()
-        logging.info(
-            f"Updating mod {mod_name} ({mod_local_name}) to version {mod_latest_version.version_number}")
-        update_mod(mod_latest_version, mod_local_name, stdscr=stdscr)
-        downloaded_mods.add(mod_name)
+                missing.append(dependencies.MissingDependency(
+                    plan.required_by[version.project_id], label, "download failed"))
+    return downloaded, missing
 
-    # 2. 判断是否跨版本
-    cross_version = (update_from != update_to)
 
-    # 3. 处理newMods目录
-    mod_dict = get_mod_dict(input_mod_folder)
+def finish_update(selected_mods: list[ModRecord], results: dict[str, bool], input_mod_folder: str, output_mod_folder: str,
+                  backup_folder: str, cross_version: bool) -> tuple[set[str], list[str]]:
+    # 下载成功的mod备份旧文件，同版本时把其余mod迁移到目标目录；results 按记录的key给出
+    downloaded_mods = set()
+    replaced_files = set()
+    failed_mods = []
+    for record in selected_mods:
+        if not results.get(record.key):
+            failed_mods.append(record.name)
+            continue
+        backup_old_mod(mod_folder=input_mod_folder,
+                       backup_folder=backup_folder, mod_file=record.filename)
+        downloaded_mods.add(record.key)
+        replaced_files.add(record.filename)
+
+    # 处理newMods目录
     if cross_version:
         # 跨版本：只保留下载的mod
-        # 不做额外操作，update_mod已将下载的mod放入newMods
+        # 不做额外操作，下载的mod已放入newMods
         pass
     else:
         # 同版本：所有mod都转移到newMods，下载的mod只保留最高版本
-        # 复制所有mod到newMods
-        for mod_name, mod_info in mod_dict.items():
-            src_file = os.path.join(
-                input_mod_folder, mod_info["local_filename"])
-            dst_file = os.path.join(
-                output_mod_folder, mod_info["local_filename"])
-            # 如果该mod被下载更新过，优先保留newMods中下载的最高版本（即update_mod已放入）
-            if mod_name in downloaded_mods:
-                # 跳过，已由update_mod写入最高版本
-                continue
-            try:
-                shutil.copy2(src_file, dst_file)
-                logging.info(
-                    f"Copied {mod_info['local_filename']} to newMods.")
-            except Exception as e:
-                logging.error(f"Failed to copy {src_file} to {dst_file}: {e}")
-
-    # 下载全部完成后提示
-    stdscr.clear()
-    stdscr.addstr(0, 0, "已更新完毕，按任意键继续")
+        # 如果该mod被下载更新过，优先保留newMods中下载的最高版本（下载时已放入）
+        # 其余mod增量同步，目标目录中已一致的文件直接跳过
+        filenames = [record.filename for record in get_mod_records(input_mod_folder).values()
+                     if record.filename not in replaced_files]
+        report = folder_sync.sync_files(
+            input_mod_folder, output_mod_folder, filenames, get_mod_index(),
+            config.get("syncWorkers", folder_sync.DEFAULT_SYNC_WORKERS),
+            allow_hardlink=config.get("syncHardlink", True))
+        logging.info(
+            f"Synced {len(filenames)} mods to {output_mod_folder}, {report.count(folder_sync.SKIPPED)} unchanged, {report.count(folder_sync.FAILED)} failed.")
+    return downloaded_mods, failed_mods
+
+
+def get_jar_store() -> JarStore:
+    store_folder = config.get("storeFolder") or os.path.join(
+        config.get("cacheFolder", DEFAULT_CACHE_FOLDER), "store")
+    return _get_jar_store(store_folder, config.get("storeMaxSize", jar_store.DEFAULT_MAX_SIZE_MB))
+
+
+def show_download_progress(stdscr: "curses.window | None", tasks: list[downloader.DownloadTask]) -> None:
+    done = sum(1 for task in tasks if task.status == downloader.DONE)
+    failed = sum(1 for task in tasks if task.status == downloader.FAILED)
+    if not stdscr:
+        from sys import stdout
+        received = sum(task.downloaded for task in tasks)
+        stdout.write(
+            f'\r[下载进度] {done}/{len(tasks)} 完成，{failed} 失败，已接收 {received // 1024} KB')
+        stdout.flush()
+        if done + failed == len(tasks):
+            print()  # 换行
+        return
+    stdscr.erase()
+    h, w = stdscr.getmaxyx()
+    stdscr.addstr(0, 0, f"正在下载 {len(tasks)} 个mod，完成 {done}，失败 {failed}"[:w-1])
+    # 进行中的任务排在前面，保证正在传输的进度可见
+    order = {downloader.DOWNLOADING: 0, downloader.PENDING: 1,
+             downloader.FAILED: 2, downloader.DONE: 3}
+    visible = sorted(tasks, key=lambda task: order[task.status])[:max(0, h - 2)]
+    for idx, task in enumerate(visible):
+        percent = task.percent
+        bar_len = max(10, w - len(task.filename) - 20)
+        filled_len = int(bar_len * percent // 100)
+        bar = '█' * filled_len + '-' * (bar_len - filled_len)
+        status = "失败" if task.status == downloader.FAILED else f"{percent}%"
+        stdscr.addstr(idx + 1, 0, f"{task.filename}: |{bar}| {status}"[:w-1])
     stdscr.refresh()
-    stdscr.getch()
-    # 返回主菜单（直接 return 即可，主流程会回到主菜单）
-
 
-def update_mod(mod_version: Any, mod_local_name: str, stdscr: curses.window = None) -> None:
-    input_mod_folder = config["modFolderFrom"]
-    output_mod_folder = config["modFolderTo"]
-    backup_folder = config["backupFolder"]
-    cache_folder = config.get("cacheFolder", "./cache")
-    download_mod(output_mod_folder, cache_folder, mod_version, stdscr=stdscr)
-    backup_old_mod(mod_folder=input_mod_folder,
-                   backup_folder=backup_folder, mod_file=mod_local_name)
 
-
-def download_mod(mod_folder: str, cache_folder: str, mod_version: Any, stdscr: curses.window = None, progress_line: int = 1) -> None:
-    mod_folder: Path = Path(mod_folder)
-    cache_folder: Path = Path(cache_folder)
+def make_download_task(store: JarStore, label: str, mod_version: Any) -> downloader.DownloadTask:
+    # 下载目标直接是仓库中以SHA1命名的文件
     mod_file = mod_version.files[0]
-    file_sha1 = mod_file.hashes.sha1
-    file_url = mod_file.url
-    file_name = mod_file.filename
-    mod_folder.mkdir(parents=True, exist_ok=True)
-    cache_folder.mkdir(parents=True,exist_ok=True)
-    cache_file_path = cache_folder / file_name
-
-    def verify_hash(file_path):
-        file_hash = get_mod_info.get_file_sha1(file_path)
-        if file_hash != file_sha1:
-            logging.error(
-                f"Hash mismatch for {file_name}: {file_hash} != {file_sha1}")
-            return False
-        else:
-            return True
-
-    def show_progress(block_num, block_size, total_size):
-        if total_size <= 0:
-            percent = 0
-        else:
-            percent = min(100, block_num * block_size * 100 // total_size)
-        if stdscr:
-            h, w = stdscr.getmaxyx()
-            bar_len = max(10, w - len(file_name) - 20)
-            filled_len = int(bar_len * percent // 100)
-            bar = '█' * filled_len + '-' * (bar_len - filled_len)
-            progress_str = f"[下载进度] {file_name}: |{bar}| {percent}%"
-            stdscr.addstr(progress_line, 0, progress_str[:w-1])
-            stdscr.clrtoeol()
-            stdscr.refresh()
-        else:
-            from sys import stdout
-            bar_len = 40
-            filled_len = int(bar_len * percent // 100)
-            bar = '█' * filled_len + '-' * (bar_len - filled_len)
-            stdout.write(f'\r[下载进度] {file_name}: |{bar}| {percent}%')
-            stdout.flush()
-            if percent == 100:
-                print()  # 换行
-    mod_file_path = mod_folder / file_name
-    if mod_file_path.exists():
-        if verify_hash(mod_file_path):
-            logging.info(
-                f"File {file_name} already exists in {mod_folder}, skipping download.")
-            return
-        else:
-            logging.info(f"Redownloading {file_name} due to hash mismatch.")
-    if cache_file_path.exists():
-        if verify_hash(cache_file_path):
+    return downloader.DownloadTask(
+        mod_file.url, mod_file.filename, store.path_for(mod_file.hashes.sha1), mod_file.hashes.sha1,
+        getattr(mod_file.hashes, "sha512", None), getattr(mod_file, "size", 0) or 0, label)
+
+
+def import_local_file(store: JarStore, task: downloader.DownloadTask) -> bool:
+    # 本地目录镜像中的文件校验后导入仓库，不经过网络；校验失败时照常下载
+    path = update_source.get_source().local_file(task.sha1)
+    if path is None:
+        return False
+    try:
+        with tracing.span("mirror_copy", tracing.DISK, file=task.filename):
+            hashing.check_digests(task.filename, hashing.hash_file(path), task.sha1, task.sha512)
+            store.import_file(path, task.sha1)
+    except (OSError, hashing.HashMismatchError) as e:
+        logging.error(f"Mirror copy of {task.filename} is unusable: {e}")
+        return False
+    tracing.count("mirror_files")
+    return True
+
+
+def download_to_folders(items: list[tuple[str, Any, str]], stdscr: "curses.window | None" = None,
+                        on_tick: Callable[[list], None] | None = None) -> dict[str, bool]:
+    # items 为 (名称, 版本, 目标目录)，相同SHA1的文件只下载一次，再放入各自的目录
+    store = get_jar_store()
+    results: dict[str, bool] = {}
+    tasks: dict[str, downloader.DownloadTask] = {}
+    waiting: dict[str, list[tuple[str, Path]]] = {}
+
+    planned = []
+    for label, mod_version, mod_folder in items:
+        mod_folder = Path(mod_folder)
+        mod_folder.mkdir(parents=True, exist_ok=True)
+        planned.append((label, make_download_task(store, label, mod_version), mod_folder))
+    # 目标目录中已存在的文件在线程池中并行校验，SHA1和SHA512一次读取同时算出
+    with tracing.span("verify", tracing.DISK, files=len(planned)):
+        existing = hashing.hash_files(
+            dict.fromkeys(mod_folder / task.filename for _, task, mod_folder in planned
+                          if (mod_folder / task.filename).exists()),
+            config.get("hashWorkers", hashing.DEFAULT_HASH_WORKERS))
+
+    for label, task, mod_folder in planned:
+        file_name = task.filename
+        mod_file_path = mod_folder / file_name
+        digests = existing.get(str(mod_file_path))
+        if isinstance(digests, hashing.FileDigests):
+            try:
+                hashing.check_digests(file_name, digests, task.sha1, task.sha512)
+                logging.info(
+                    f"File {file_name} already exists in {mod_folder}, skipping download.")
+                results[label] = True
+                continue
+            except hashing.HashMismatchError as e:
+                logging.error(str(e))
+                logging.info(f"Redownloading {file_name} due to hash mismatch.")
+        if store.has(task.sha1) or import_local_file(store, task):
+            # 仓库中的文件写入前已校验过，直接链接到目标目录
             logging.info(
-                f"File {file_name} already exists in cache, moving to {mod_folder}.")
-            shutil.move(cache_file_path, mod_file_path)
-            return
-        else:
-            logging.info(f"Redownloading {file_name} due to hash mismatch.")
-    logging.info(f"Downloading {file_name} from {file_url} to {cache_folder}")
-    urllib.request.urlretrieve(
-        file_url, cache_file_path, reporthook=show_progress)
-    logging.info(f"Downloaded {file_name} to {cache_folder}")
-    shutil.move(cache_file_path, mod_file_path)
-    logging.info(f"Moved {file_name} to {mod_folder}")
+                f"File {file_name} already exists in store, placing into {mod_folder}.")
+            store.place(task.sha1, mod_file_path)
+            results[label] = True
+            continue
+        tasks.setdefault(task.sha1, task)
+        waiting.setdefault(task.sha1, []).append((label, mod_file_path))
+
+    engine = downloader.DownloadEngine(
+        config.get("maxDownloads", downloader.DEFAULT_MAX_DOWNLOADS), config.get("maxRetries", 3))
+    try:
+        engine.download_all(
+            list(tasks.values()), on_tick=on_tick or (lambda tasks: show_download_progress(stdscr, tasks)))
+    finally:
+        engine.close()
+    for sha1, task in tasks.items():
+        if task.status != downloader.DONE:
+            logging.error(f"Failed to download {task.filename}: {task.error}")
+            for label, _ in waiting[sha1]:
+                results[label] = False
+            continue
+        store.add(sha1)
+        for label, mod_file_path in waiting[sha1]:
+            store.place(sha1, mod_file_path)
+            results[label] = True
+    store.gc()
+    return results
 
 
 def backup_old_mod(mod_folder: str, backup_folder: str, mod_file: str) -> None:
@@ -572,5 +442,6 @@ def backup_old_mod(mod_folder: str, backup_folder: str, mod_file: str) -> None:
         logging.warning(
             f"Backup file {backup_path} already exists, skipping backup.")
         return
-    shutil.copy2(mod_path, backup_path)
+    with tracing.span("backup", tracing.DISK, file=mod_file):
+        shutil.copy2(mod_path, backup_path)
     logging.info(f"Backed up {mod_file} to {backup_path}.")
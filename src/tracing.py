@@ -0,0 +1,149 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Iterator, NamedTuple
+
+DEFAULT_MAX_SPANS = 200000
+
+# 各阶段所属的类别，用于区分时间花在磁盘、API还是网络上
+DISK = "disk"
+API = "api"
+NETWORK = "network"
+UI = "ui"
+
+
+class Span(NamedTuple):
+    name: str
+    category: str
+    start: float  # 相对于Tracer创建时间的秒数
+    duration: float
+    thread_id: int
+    args: dict[str, Any]
+
+
+class Tracer:
+    # 记录每个阶段(以及每个mod)的耗时和计数器，可导出为JSON摘要或Chrome trace
+    def __init__(self, enabled: bool = True, max_spans: int = DEFAULT_MAX_SPANS):
+        self.enabled = enabled
+        self._epoch = time.perf_counter()
+        self._spans: deque[Span] = deque(maxlen=max_spans)
+        self._counters: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._epoch = time.perf_counter()
+            self._spans.clear()
+            self._counters.clear()
+
+    @contextmanager
+    def span(self, name: str, category: str, **args: Any) -> Iterator[dict[str, Any]]:
+        # 返回的dict可在span内补充参数，例如实际传输的字节数
+        if not self.enabled:
+            yield args
+            return
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            span = Span(name, category, start - self._epoch, end - start, threading.get_ident(), args)
+            with self._lock:
+                self._spans.append(span)
+
+    def count(self, name: str, value: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def spans(self) -> list[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def counters(self) -> dict[str, float]:
+        with self._lock:
+            return dict(self._counters)
+
+    def summary(self) -> dict[str, Any]:
+        # 按阶段汇总：次数、总耗时、最大耗时、p95；同时汇总各类别的总耗时
+        stages: dict[str, list[float]] = {}
+        categories: dict[str, float] = {}
+        for span in self.spans():
+            stages.setdefault(f"{span.category}/{span.name}", []).append(span.duration)
+            categories[span.category] = categories.get(span.category, 0) + span.duration
+        report = {}
+        for key, durations in sorted(stages.items()):
+            durations.sort()
+            report[key] = {
+                "count": len(durations),
+                "total_s": round(sum(durations), 6),
+                "max_s": round(durations[-1], 6),
+                "p95_s": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 6),
+            }
+        return {
+            "stages": report,
+            "categories": {k: round(v, 6) for k, v in sorted(categories.items())},
+            "counters": self.counters(),
+        }
+
+    def chrome_trace(self) -> dict[str, Any]:
+        # Chrome trace-event格式，可在 chrome://tracing 或 Perfetto 中打开
+        pid = os.getpid()
+        events = [{
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": round(span.start * 1e6, 3),
+            "dur": round(span.duration * 1e6, 3),
+            "pid": pid,
+            "tid": span.thread_id,
+            "args": {k: v if isinstance(v, (int, float, str, bool)) or v is None else str(v)
+                     for k, v in span.args.items()},
+        } for span in self.spans()]
+        end = max((span.start + span.duration for span in self.spans()), default=0)
+        events.extend({"name": name, "ph": "C", "ts": round(end * 1e6, 3), "pid": pid, "args": {name: value}}
+                      for name, value in self.counters().items())
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_summary(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+    def export_chrome_trace(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f, ensure_ascii=False)
+
+
+_tracer = Tracer()
+
+
+def configure(enabled: bool = True, max_spans: int = DEFAULT_MAX_SPANS) -> Tracer:
+    global _tracer
+    _tracer = Tracer(enabled, max_spans)
+    return _tracer
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def span(name: str, category: str, **args: Any):
+    return _tracer.span(name, category, **args)
+
+
+def count(name: str, value: float = 1) -> None:
+    _tracer.count(name, value)
+
+
+def export(folder: str, prefix: str = "modupdater") -> tuple[str, str]:
+    # 在folder中写入 <prefix>-summary.json 和 <prefix>-trace.json
+    os.makedirs(folder, exist_ok=True)
+    summary_path = os.path.join(folder, f"{prefix}-summary.json")
+    trace_path = os.path.join(folder, f"{prefix}-trace.json")
+    _tracer.export_summary(summary_path)
+    _tracer.export_chrome_trace(trace_path)
+    return summary_path, trace_path
@@ -1,19 +1,604 @@
 import curses
+import logging
+import queue
+from functools import lru_cache
 from typing import Any, Callable, List, Dict, Optional
 
-from .tools import check_update, display_mod_list, exit_gui, get_display_length, reload_config_gui, set_update_source,reload_config
+from . import prefetch, tools, tracing, update_source
+from .mod_record import ModRecord, ModStatus, Resolution
+from .resolver import ResolutionService
+from .tools import get_display_length
+
+# 一行由若干 (文本, 属性) 片段组成
+Segment = tuple[str, int]
+KEY_ESC = 27
+BACKSPACE_KEYS = (curses.KEY_BACKSPACE, 127, 8)
+
+
+@lru_cache(maxsize=65536)
+def truncate(s: str, max_width: int) -> str:
+    # 按显示宽度截断，结果按 (字符串, 宽度) 缓存，终端宽度不变时每个名称只计算一次
+    if get_display_length(s) <= max_width:
+        return s
+    width = 0
+    for i, c in enumerate(s):
+        width += get_display_length(c)
+        if width > max_width:
+            return s[:i]
+    return s
+
+
+def fit_segments(segments: tuple[Segment, ...], max_width: int) -> tuple[Segment, ...]:
+    out = []
+    for text, attr in segments:
+        if max_width <= 0:
+            break
+        text = truncate(text, max_width)
+        if text:
+            out.append((text, attr))
+            max_width -= get_display_length(text)
+    return tuple(out)
+
+
+class VirtualList:
+    # 虚拟列表：只绘制可见的行，且只重绘内容有变化的行；支持翻页、跳转和输入过滤
+    # render(下标, 条目) 返回该行的片段，search_key(条目) 返回用于过滤的文本
+    def __init__(self, stdscr: curses.window, items: list, render: Callable[[int, Any], tuple[Segment, ...]],
+                 search_key: Callable[[Any], str] = str, cursor: bool = False):
+        self.stdscr = stdscr
+        self.items = items
+        self.render = render
+        self.search_key = search_key
+        self.has_cursor = cursor
+        self.pos = 0  # 可见区域第一行在过滤结果中的位置
+        self.cursor = 0  # 光标在过滤结果中的位置
+        self.page_rows = 1
+        self.query = ''
+        self.filtering = False
+        self._keys: list[str] = []
+        # _matches[n] 为查询前n个字符的匹配结果，输入时在上一级结果中继续过滤，删除时直接回退
+        self._matches: list[list[int]] = [[]]
+        self._pending_bytes = b''
+        self._drawn: dict[int, tuple[Segment, ...]] = {}
+        self._size: Optional[tuple[int, int]] = None
+
+    @property
+    def visible(self) -> list[int]:
+        return self._matches[-1]
+
+    def _index_new_items(self) -> None:
+        # 列表只会在末尾追加，新条目逐级加入各前缀的匹配结果
+        for idx in range(len(self._keys), len(self.items)):
+            key = self.search_key(self.items[idx]).lower()
+            self._keys.append(key)
+            for level, matches in enumerate(self._matches):
+                if self.query[:level].lower() in key:
+                    matches.append(idx)
+
+    def set_query(self, query: str) -> None:
+        self._index_new_items()
+        common = 0
+        while common < min(len(query), len(self.query)) and query[common] == self.query[common]:
+            common += 1
+        del self._matches[common + 1:]
+        for level in range(common + 1, len(query) + 1):
+            needle = query[:level].lower()
+            self._matches.append([idx for idx in self._matches[-1] if needle in self._keys[idx]])
+        self.query = query
+        self.pos = 0
+        self.cursor = 0
+
+    def selected(self) -> Optional[int]:
+        # 光标所在条目在 items 中的下标
+        if 0 <= self.cursor < len(self.visible):
+            return self.visible[self.cursor]
+        return None
+
+    def _layout(self) -> int:
+        self._index_new_items()
+        h, w = self.stdscr.getmaxyx()
+        self.page_rows = max(1, h - 2)
+        self._clamp()
+        return w
+
+    def page_range(self) -> tuple[int, int]:
+        self._layout()
+        return self.pos + 1, min(self.pos + self.page_rows, len(self.visible))
+
+    def _clamp(self) -> None:
+        total = len(self.visible)
+        if self.has_cursor:
+            self.cursor = max(0, min(self.cursor, total - 1))
+            if self.cursor < self.pos:
+                self.pos = self.cursor
+            elif self.cursor >= self.pos + self.page_rows:
+                self.pos = self.cursor - self.page_rows + 1
+        self.pos = max(0, min(self.pos, total - self.page_rows))
+
+    def _move(self, delta: int) -> None:
+        if self.has_cursor:
+            self.cursor += delta
+        else:
+            self.pos += delta
+        self._clamp()
+
+    def _filter_key(self, key: int) -> bool:
+        if key == KEY_ESC:
+            self.filtering = False
+            self.set_query('')
+        elif key in (curses.KEY_ENTER, ord('\n')):
+            self.filtering = False
+        elif key in BACKSPACE_KEYS:
+            self.set_query(self.query[:-1])
+        elif 0x80 <= key <= 0xff:
+            # getch 按字节返回多字节字符，凑齐后再加入查询
+            self._pending_bytes += bytes([key])
+            try:
+                char = self._pending_bytes.decode('utf-8')
+            except UnicodeDecodeError:
+                if len(self._pending_bytes) >= 4:
+                    self._pending_bytes = b''
+                return True
+            self._pending_bytes = b''
+            self.set_query(self.query + char)
+        elif 32 <= key < 127:
+            self.set_query(self.query + chr(key))
+        else:
+            return False
+        return True
+
+    def handle_key(self, key: int) -> bool:
+        # 处理翻页、跳转和过滤相关的按键，返回False表示按键留给调用方处理
+        if key == -1:
+            return False
+        if self.filtering and self._filter_key(key):
+            return True
+        if key == curses.KEY_UP:
+            self._move(-1)
+        elif key == curses.KEY_DOWN:
+            self._move(1)
+        elif key == curses.KEY_PPAGE:
+            self._move(-self.page_rows)
+        elif key == curses.KEY_NPAGE:
+            self._move(self.page_rows)
+        elif key == curses.KEY_HOME:
+            self._move(-len(self.visible))
+        elif key == curses.KEY_END:
+            self._move(len(self.visible))
+        elif key == ord('/'):
+            self.filtering = True
+        elif key == KEY_ESC and self.query:
+            self.set_query('')
+        else:
+            return False
+        return True
+
+    def invalidate(self) -> None:
+        # 屏幕被其他界面覆盖后调用，下次绘制时全部重绘
+        self._size = None
+
+    def _put(self, y: int, segments: tuple[Segment, ...], width: int) -> None:
+        segments = fit_segments(segments, width - 1)
+        if self._drawn.get(y) == segments:
+            return
+        self.stdscr.move(y, 0)
+        self.stdscr.clrtoeol()
+        x = 0
+        for text, attr in segments:
+            self.stdscr.addstr(y, x, text, attr)
+            x += get_display_length(text)
+        self._drawn[y] = segments
+
+    def draw(self, title: str, footer: str) -> None:
+        w = self._layout()
+        h = self.page_rows + 2
+        if (h, w) != self._size:
+            self.stdscr.clear()
+            self._drawn.clear()
+            self._size = (h, w)
+        self._put(0, ((title, 0),), w)
+        visible = self.visible
+        for row in range(self.page_rows):
+            i = self.pos + row
+            if i < len(visible):
+                idx = visible[i]
+                segments = self.render(idx, self.items[idx])
+                if self.has_cursor and i == self.cursor:
+                    segments = tuple((text, attr | curses.A_REVERSE) for text, attr in segments)
+            else:
+                segments = ()
+            self._put(row + 1, segments, w)
+        if self.filtering:
+            footer = f"过滤：{self.query}_ (共 {len(visible)} 项匹配，回车确认，Esc清除)"
+        elif self.query:
+            footer = f"[过滤：{self.query}] {footer}"
+        self._put(h - 1, ((footer, 0),), w)
+        self.stdscr.noutrefresh()
+        curses.doupdate()
+
+
+def exit_gui() -> None:
+    raise SystemExit
+
+
+def reload_config_gui(stdscr: curses.window) -> None:
+    tools.reload_config()
+    stdscr.clear()
+    stdscr.addstr(0, 0, "配置文件已重新加载。按任意键返回...")
+    stdscr.refresh()
+    stdscr.getch()
+
+
+def stats_lines() -> list[tuple[str, int]]:
+    # 统计面板的内容：各类别总耗时、各阶段耗时和计数器
+    summary = tracing.get_tracer().summary()
+    lines: list[tuple[str, int]] = [("按类别(磁盘/API/网络/界面)总耗时：", curses.A_BOLD)]
+    lines += [(f"  {category:<10} {total:>10.3f}s", 0) for category, total in summary["categories"].items()]
+    lines.append(("各阶段：次数 / 总耗时 / 最大 / p95", curses.A_BOLD))
+    lines += [(f"  {stage:<24} {s['count']:>7} {s['total_s']:>10.3f}s {s['max_s']:>8.3f}s {s['p95_s']:>8.3f}s", 0)
+              for stage, s in summary["stages"].items()]
+    lines.append(("计数器：", curses.A_BOLD))
+    lines += [(f"  {name:<24} {value:>12g}", 0) for name, value in sorted(summary["counters"].items())]
+    return lines
+
+
+def display_stats(stdscr: curses.window) -> None:
+    view = VirtualList(stdscr, stats_lines(), lambda idx, item: (item,), search_key=lambda item: item[0])
+    message = ""
+    stdscr.timeout(-1)
+    while True:
+        first, last = view.page_range()
+        view.draw("运行统计(r刷新，e导出，q返回):",
+                  message or f"共 {len(view.visible)} 行，当前{first}-{last}，上下键翻页，r刷新，e导出JSON与Chrome trace，q返回")
+        key = stdscr.getch()
+        if view.handle_key(key):
+            continue
+        if key in (ord('q'), ord('Q')):
+            break
+        elif key in (ord('r'), ord('R')):
+            view = VirtualList(stdscr, stats_lines(), lambda idx, item: (item,), search_key=lambda item: item[0])
+            message = ""
+        elif key in (ord('e'), ord('E')):
+            try:
+                summary_path, trace_path = tracing.export(tools.trace_folder())
+                message = f"已导出 {summary_path} 和 {trace_path}"
+            except OSError as e:
+                logging.error("Failed to export trace", exc_info=True)
+                message = f"导出失败：{e}"
+
+
+def display_mod_list(stdscr: curses.window) -> None:
+    errors: Dict[str, Exception] = {}
+    records = tools.get_mod_records(tools.config["modFolderFrom"], errors)
+    if not records:
+        stdscr.clear()
+        stdscr.addstr(0, 0, "没有找到任何mod。")
+        stdscr.addstr(1, 0, "按q返回主菜单...")
+        stdscr.refresh()
+        while stdscr.getch() not in (ord('q'), ord('Q')):
+            pass
+        return
+    view = VirtualList(
+        stdscr, list(records.values()),
+        lambda idx, record: ((f"{idx + 1}. {record.name} ({record.local_version})", 0),),
+        search_key=lambda record: record.name)
+    error_str = f"，{len(errors)} 个读取失败(详见日志)" if errors else ""
+    while True:
+        first, last = view.page_range()
+        view.draw("Mod列表(上下键翻页，/过滤，q返回):",
+                  f"共 {len(view.visible)} 个mod{error_str}，当前{first}-{last}，上下键/PgUp/PgDn翻页，Home/End跳转，q返回")
+        key = stdscr.getch()
+        if view.handle_key(key):
+            continue
+        if key in (ord('q'), ord('Q')):
+            break
+
+
+def set_update_source(sources: str | list[str], stdscr: curses.window) -> None:
+    names = update_source.source_names(sources)
+    if update_source.includes_mirror(names) and not tools.config.get("mirrorLocation"):
+        message = "请先在配置文件中设置镜像地址(mirrorLocation)。按任意键返回..."
+    else:
+        tools.config["updateSource"] = sources
+        tools.save_config()
+        tools.apply_config()
+        message = f"更新来源已设置为{' → '.join(names)}。按任意键返回..."
+    stdscr.clear()
+    stdscr.addstr(0, 0, message)
+    stdscr.refresh()
+    stdscr.getch()
+
+
+# 没有可用的新版本时代替新版本号显示的文字
+STATUS_TEXT = {
+    ModStatus.NOT_FOUND: "Not Found",
+    ModStatus.NO_COMPATIBLE_VERSION: "No compatible version",
+}
+
+
+def check_update(stdscr: curses.window, resolver: ResolutionService) -> None:
+    records = tools.get_mod_records(tools.config.get("modFolderFrom"))
+    owners = tools.sha1_to_keys(records)
+    # 解析线程只把结果放入队列，由界面线程统一写入记录并触发重绘
+    events: queue.SimpleQueue = queue.SimpleQueue()
+
+    # 已解析过的mod直接回放结果，只有新出现的jar才会发起请求
+    unsubscribe = resolver.subscribe(
+        lambda sha1, result: events.put((sha1, result)))
+    resolver.resolve(owners, tools.config["updateGameVersionTo"],
+                     tools.config.get("maxRetries", 3))  # 从配置中获取最大重试次数
+    prefetcher, stop_prefetch = start_prefetch(resolver)
+    try:
+        _check_update_loop(stdscr, records, owners, events, resolver, prefetcher)
+    finally:
+        unsubscribe()
+        stop_prefetch()
+        if prefetcher is not None:
+            # 已下载完成的文件留在仓库中，下次检查时直接使用
+            prefetcher.close()
+
+
+def start_prefetch(resolver: ResolutionService) -> tuple[prefetch.Prefetcher | None, Callable[[], None]]:
+    # 解析出可用更新后立即在后台下载到jar仓库，用户确认时大部分文件已在本地
+    if not tools.config.get("prefetchUpdates", True):
+        return None, lambda: None
+    prefetcher = prefetch.Prefetcher(
+        tools.get_jar_store(),
+        tools.config.get("prefetchDownloads", prefetch.DEFAULT_PREFETCH_DOWNLOADS),
+        tools.config.get("prefetchBandwidth", prefetch.DEFAULT_PREFETCH_BANDWIDTH_KB) * 1024,
+        tools.config.get("maxRetries", 3))
+
+    def on_result(sha1: str, result: Resolution) -> None:
+        if result.status is ModStatus.UPDATE_AVAILABLE:
+            prefetcher.submit(result.latest_version)
+    return prefetcher, resolver.subscribe(on_result)
+
+
+def prefetch_status(prefetcher: prefetch.Prefetcher | None) -> str:
+    if prefetcher is None:
+        return ""
+    done, total = prefetcher.progress()
+    if prefetcher.stopped:
+        return f"，预下载已停止({done}/{total})"
+    return f"，已预下载 {done}/{total}，p停止" if total else ""
+
+
+def check_update_line(index: int, record: ModRecord) -> tuple[tuple[str, int], ...]:
+    # 返回一行的 (文本, 属性) 片段，由列表控件负责截断和比较是否需要重绘
+    status = record.status
+    current_version_number = record.current_version_number or record.local_version
+    # 旧版本号颜色：未解析白色，已是最新绿色，其余红色
+    if status is ModStatus.PENDING:
+        old_attr = curses.color_pair(4)
+    elif status is ModStatus.UP_TO_DATE:
+        old_attr = curses.color_pair(2)
+    else:
+        old_attr = curses.color_pair(3)
+    segments = (
+        (f"{index + 1}. ", 0),
+        (record.name, 0),
+        ("(", curses.color_pair(4)),
+        (str(current_version_number), old_attr),
+    )
+    if status is ModStatus.UPDATE_AVAILABLE:
+        segments += ((" → ", 0), (str(record.latest_version_number), curses.color_pair(2)))
+    elif status in STATUS_TEXT:
+        segments += ((" → ", 0), (STATUS_TEXT[status], curses.color_pair(5)))
+    return segments + ((")", curses.color_pair(4)),)
+
+
+def _check_update_loop(stdscr: curses.window, records: dict[str, ModRecord], owners: dict[str, list[str]],
+                       events: queue.SimpleQueue, resolver: ResolutionService,
+                       prefetcher: prefetch.Prefetcher | None = None) -> None:
+    finished = sum(1 for record in records.values() if record.resolved)
+    total = len(records)
+    view = VirtualList(stdscr, list(records.values()), check_update_line,
+                       search_key=lambda record: record.name)
+    running = None
+    prefetch_str = None
+    dirty = True
+    stdscr.timeout(100)  # 等待按键最多100ms，期间无事件则不重绘
+    try:
+        while True:
+            while True:
+                try:
+                    sha1, result = events.get_nowait()
+                except queue.Empty:
+                    break
+                for key in owners.get(sha1, []):
+                    record = records[key]
+                    if not record.resolved and result.status is not ModStatus.PENDING:
+                        finished += 1
+                    record.apply(result)
+                    dirty = True
+            if resolver.running != running:
+                running = resolver.running
+                dirty = True
+            if prefetch_status(prefetcher) != prefetch_str:
+                prefetch_str = prefetch_status(prefetcher)
+                dirty = True
+            if dirty:
+                if not total:
+                    stdscr.clear()
+                    stdscr.addstr(0, 0, "没有找到任何mod。")
+                    stdscr.addstr(1, 0, "按q返回主菜单...")
+                    stdscr.refresh()
+                else:
+                    # 进度百分比
+                    percent = int(finished / total * 100)
+                    status = f"进度：{percent}%"
+                    if finished < total and not running:
+                        # 重试后仍失败的与用户取消的分开显示
+                        failed = resolver.failed()
+                        status = f"{failed} 个mod检查失败(详见日志)" if failed else "已取消"
+                    first, last = view.page_range()
+                    view.draw("Mod更新检查(上下键翻页，/过滤，q返回):",
+                              f"共 {total} 个mod，当前{first}-{last}，上下键翻页，c取消，q返回   {status}{prefetch_str}")
+                dirty = False
+            key = stdscr.getch()
+            if key == -1:
+                continue
+            dirty = True
+            if view.handle_key(key):
+                continue
+            if key in (ord('q'), ord('Q')):
+                break
+            elif key in (ord('c'), ord('C')):
+                resolver.cancel()
+            elif key in (ord('p'), ord('P')) and prefetcher is not None:
+                prefetcher.cancel()
+            elif key == ord('\n'):
+                stdscr.timeout(-1)  # 恢复阻塞模式
+                choose_update_mods(stdscr, records, resolver, prefetcher)
+                return  # 直接返回根菜单
+    finally:
+        stdscr.timeout(-1)  # 恢复阻塞模式
+
+
+def choose_update_mods(stdscr: curses.window, records: dict[str, ModRecord], resolver: ResolutionService | None = None,
+                       prefetcher: prefetch.Prefetcher | None = None) -> None:
+    # 只显示有可用更新的mod
+    update_mods = [record for record in records.values() if record.has_update]
+    listed = {record.key for record in update_mods}
+    owners = tools.sha1_to_keys(records)
+
+    def on_result(sha1: str, result: Resolution) -> None:
+        # 解析仍在后台进行时，新发现的可更新mod追加到列表末尾，不影响已选中的下标
+        for key in owners.get(sha1, []):
+            if key in listed:
+                continue
+            record = records[key]
+            record.apply(result)
+            if record.has_update:
+                listed.add(key)
+                update_mods.append(record)
+    unsubscribe = resolver.subscribe(on_result) if resolver else lambda: None
+    try:
+        with tracing.span("selection", tracing.UI):
+            selected_mods = _choose_update_mods_loop(stdscr, update_mods, resolver, prefetcher)
+    finally:
+        unsubscribe()
+        stdscr.timeout(-1)
+    if selected_mods:
+        start_update_mods(stdscr, selected_mods, prefetcher)
+
+
+def choose_update_line(checked: set[int]) -> Callable[[int, ModRecord], tuple[tuple[str, int], ...]]:
+    def render(index: int, record: ModRecord) -> tuple[tuple[str, int], ...]:
+        old_ver = str(record.current_version_number or record.local_version)
+        new_ver = str(record.latest_version_number or "")
+        selected = index in checked
+        return (
+            (f"{index + 1}. ", 0),
+            (record.name, curses.color_pair(5) if selected else 0),  # 选中mod名为黄色
+            ("(", curses.color_pair(4)),
+            (old_ver, curses.color_pair(3)),  # 旧版本红色
+            (" → ", 0),
+            (new_ver, curses.color_pair(2)),  # 新版本绿色
+            (")", curses.color_pair(4)),
+            (" [*]" if selected else " [ ]", 0),
+        )
+    return render
+
+
+def _choose_update_mods_loop(stdscr: curses.window, update_mods: list, resolver: ResolutionService | None,
+                             prefetcher: prefetch.Prefetcher | None = None) -> list | None:
+    # 返回确认要更新的mod，按q返回时为None
+    if not update_mods and (resolver is None or not resolver.running):
+        stdscr.clear()
+        stdscr.addstr(0, 0, "没有可用更新的mod。按任意键返回...")
+        stdscr.refresh()
+        stdscr.getch()
+        return None
+    checked: set[int] = set()  # 选中的mod下标
+    view = VirtualList(stdscr, update_mods, choose_update_line(checked),
+                       search_key=lambda record: record.name, cursor=True)
+    while True:
+        # 后台仍在解析或预下载时定时刷新，以便显示新加入的mod和预下载进度
+        prefetching = prefetcher is not None and not prefetcher.stopped
+        stdscr.timeout(200 if (resolver is not None and resolver.running) or prefetching else -1)
+        total = len(update_mods)
+        pending_str = f"，仍有 {resolver.pending()} 个mod在检查中" if resolver is not None and resolver.running else ""
+        first, last = view.page_range()
+        view.draw("选择要更新的mod(空格选中/取消，a全选，/过滤，回车开始更新，q返回):",
+                  f"共 {total} 个可更新mod{pending_str}，当前{first}-{last}，上下键移动，空格选中，回车更新，q返回{prefetch_status(prefetcher)}")
+        key = stdscr.getch()
+        if view.handle_key(key):
+            continue
+        if key in (ord('q'), ord('Q')):
+            return None
+        elif key in (ord('p'), ord('P')) and prefetcher is not None:
+            prefetcher.cancel()
+        elif key == ord(' '):
+            highlight_idx = view.selected()
+            if highlight_idx is not None:
+                if highlight_idx in checked:
+                    checked.remove(highlight_idx)
+                else:
+                    checked.add(highlight_idx)
+        elif key == ord('a') or key == ord('A'):
+            # 全选或取消全选，过滤时只作用于匹配的mod
+            visible = set(view.visible)
+            if visible - checked:
+                checked.update(visible)
+            else:
+                checked.difference_update(visible)
+        elif key == ord('\n'):
+            selected_mods = [update_mods[i]
+                             for i in sorted(checked) if i < len(update_mods)]
+            if not selected_mods:
+                continue
+            if confirm_update_mods(stdscr, selected_mods):
+                stdscr.timeout(-1)
+                return selected_mods  # 更新完成后直接返回主菜单
+            view.invalidate()
+
+
+def confirm_update_mods(stdscr: curses.window, selected_mods: list) -> bool:
+    stdscr.timeout(-1)
+    view = VirtualList(stdscr, selected_mods, lambda idx, record: ((f"{idx + 1}. {record.name}", 0),),
+                       search_key=lambda record: record.name)
+    while True:
+        first, last = view.page_range()
+        view.draw("即将更新下列mod：",
+                  f"共 {len(selected_mods)} 个mod，当前{first}-{last}，上下键翻页，回车继续，q返回")
+        key = stdscr.getch()
+        if view.handle_key(key):
+            continue
+        if key in (ord('q'), ord('Q')):
+            return False  # 返回到选择界面
+        elif key == ord('\n'):
+            return True
+
+
+def start_update_mods(stdscr: curses.window, selected_mods: list[ModRecord],
+                      prefetcher: prefetch.Prefetcher | None = None) -> None:
+    downloaded_mods, failed_mods = tools.apply_updates(selected_mods, stdscr=stdscr, prefetcher=prefetcher)
+
+    # 下载全部完成后提示
+    stdscr.clear()
+    if failed_mods:
+        stdscr.addstr(0, 0, f"已更新完毕，{len(failed_mods)} 个mod下载失败(详见日志)，按任意键继续")
+    else:
+        stdscr.addstr(0, 0, "已更新完毕，按任意键继续")
+    stdscr.refresh()
+    stdscr.getch()
+
+
 MENU_ITEMS: list[dict[str, Any]] = [
     {"name": "检查更新", "action": "check_update"},
     {"name": "查看mod列表", "action": "display_mod_list"},
+    {"name": "运行统计", "action": "display_stats"},
     {
         "name": "设置",
         "submenu": [
             # {"name": "mod目录", "action": "set_mod_directory"},
-            # {"name": "更新来源", "submenu": [
-            #     {"name": "Modrinth", "action": "set_update_source_modrinth"},
-            #     {"name": "CurseForge", "action": "set_update_source_curseforge"},
-            #     {"name": "返回", "action": "back"}
-            # ]},
+            {"name": "更新来源", "submenu": [
+                {"name": "Modrinth", "action": "set_update_source_modrinth"},
+                {"name": "镜像优先，缺少时使用Modrinth", "action": "set_update_source_mirror_first"},
+                {"name": "仅使用镜像", "action": "set_update_source_mirror"},
+                {"name": "返回", "action": "back"}
+            ]},
             {"name":"重新载入配置文件", "action": "reload_config"},
             {"name": "返回", "action": "back"}
         ]
@@ -23,10 +608,12 @@ MENU_ITEMS: list[dict[str, Any]] = [
 
 ACTIONS: dict[str, Callable[..., Any]] = {
     "start_update": lambda: print("开始更新..."),
-    "check_update": lambda: check_update(tui_modules.stdscr),
+    "check_update": lambda: check_update(tui_modules.stdscr, tui_modules.resolver),
     "display_mod_list": lambda: display_mod_list(tui_modules.stdscr),
-    "set_update_source_modrinth": lambda: (set_update_source("Modrinth", tui_modules.stdscr), tui_modules.navigate_menu(MENU_ITEMS[2]["submenu"][1]["submenu"])),
-    "set_update_source_github": lambda: (set_update_source("Github", tui_modules.stdscr), tui_modules.navigate_menu(MENU_ITEMS[2]["submenu"][1]["submenu"])),
+    "display_stats": lambda: display_stats(tui_modules.stdscr),
+    "set_update_source_modrinth": lambda: (set_update_source("Modrinth", tui_modules.stdscr), tui_modules.navigate_menu(MENU_ITEMS[3]["submenu"][0]["submenu"])),
+    "set_update_source_mirror_first": lambda: (set_update_source(["Mirror", "Modrinth"], tui_modules.stdscr), tui_modules.navigate_menu(MENU_ITEMS[3]["submenu"][0]["submenu"])),
+    "set_update_source_mirror": lambda: (set_update_source("Mirror", tui_modules.stdscr), tui_modules.navigate_menu(MENU_ITEMS[3]["submenu"][0]["submenu"])),
     "reload_config": lambda: reload_config_gui(tui_modules.stdscr),
     "exit_gui": lambda: exit_gui(),
     "back": lambda: None
@@ -34,6 +621,8 @@ ACTIONS: dict[str, Callable[..., Any]] = {
 class TUI:
     def __init__(self,stdscr:curses.window):
         self.stdscr: curses.window = stdscr
+        # 解析服务随TUI存活，检查结果在各菜单之间共享
+        self.resolver: ResolutionService = ResolutionService()
     def print_menu(self, selected_row_idx: int, menu: list[dict[str, Any]], offset: int = 0) -> None:
         self.stdscr.clear()
         h, w = self.stdscr.getmaxyx()
@@ -98,6 +687,7 @@ class TUI:
             return current
 def main_loop(stdscr: curses.window) -> None:
     curses.curs_set(0)
+    curses.set_escdelay(25)  # Esc用于清除过滤，缩短默认1秒的等待
     curses.start_color()
     if curses.has_colors():
         curses.init_pair(1, curses.COLOR_BLACK, curses.COLOR_WHITE)
@@ -120,23 +710,61 @@ PROMPT_DICT:dict[str,str]={
     "backupFolder": "备份文件夹路径",
     "cacheFolder": "缓存文件夹路径",
     "updateSource": "更新源",
-    "maxRetries": "最大重试次数"
+    "mirrorLocation": "镜像目录或HTTP地址",
+    "storeFolder": "jar仓库目录",
+    "storeMaxSize": "jar仓库容量上限(MB)",
+    "maxRetries": "最大重试次数",
+    "maxConcurrentRequests": "API最大并发请求数",
+    "requestsPerMinute": "API每分钟请求上限",
+    "retryBaseDelay": "重试退避基础时间(秒)",
+    "scanWorkers": "扫描线程数",
+    "hashWorkers": "hash校验线程数",
+    "maxDownloads": "同时下载数",
+    "prefetchUpdates": "后台预下载更新",
+    "prefetchDownloads": "预下载同时下载数",
+    "prefetchBandwidth": "预下载带宽上限(KB/s)",
+    "syncWorkers": "同版本迁移复制线程数",
+    "syncHardlink": "同版本迁移使用硬链接",
+    "resolveDependencies": "自动补齐前置mod",
+    "dependencyWorkers": "前置mod查询线程数",
+    "daemonListen": "常驻模式状态接口地址",
+    "daemonRefreshInterval": "常驻模式重新检查间隔(秒)",
+    "traceEnabled": "记录各阶段耗时",
+    "traceFolder": "耗时报告导出目录",
+    "httpCacheMaxSize": "API响应缓存上限(MB)",
+    "offlineMode": "离线模式"
 }
+# 可以留空的配置项 -> 是否需要补全
+OPTIONAL_KEYS: dict[str, Callable[[dict], bool]] = {
+    "mirrorLocation": lambda config: update_source.includes_mirror(config.get("updateSource", update_source.MODRINTH)),
+}
+
+
+def is_required(config: dict, key: str) -> bool:
+    return OPTIONAL_KEYS.get(key, lambda config: True)(config)
+
+
 def fill_missing_config_loop(stdscr: curses.window) -> None:
+    # 直接补全已载入的配置，不再重新读取配置文件
+    config = tools.config
+    missing = [k for k, v in config.items() if isinstance(v, str) and not v and is_required(config, k)]
+    if not missing:
+        return
     tui_modules=TUI(stdscr)
     stdscr.clear()
-    import tomlkit
-    with open("config.toml", "rb") as f:
-        config = tomlkit.load(f)
-    for k,v in config.items():
-        if not v:
-            config[k] = tui_modules.input_module(f"请输入{v.trivia.comment.lstrip("# ").rstrip()}", v.value)
-    with open("config.toml", "w") as fo:
-        tomlkit.dump(config, fo)
-    reload_config()
-def start_menu() -> None:
-    curses.wrapper(main_loop)
-def start_fill_missing_config() -> None:
-    curses.wrapper(fill_missing_config_loop)
+    for k in missing:
+        # 只补全空字符串，布尔值和数字的默认值保持不变
+        v = config[k]
+        config[k] = tui_modules.input_module(f"请输入{v.trivia.comment.lstrip("# ").rstrip()}", v.value)
+    tools.save_config()
+    tools.apply_config()
+def tui_session(stdscr: curses.window) -> None:
+    fill_missing_config_loop(stdscr)
+    main_loop(stdscr)
+def start_tui(config: dict, config_path: str = tools.CONFIG_PATH) -> None:
+    # 补全配置和主菜单共用同一个curses会话
+    tools.set_config(config, config_path)
+    curses.wrapper(tui_session)
 if __name__ == "__main__":
-    start_menu()
+    tools.setup_logging()
+    start_tui(tools.load_config())
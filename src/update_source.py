@@ -0,0 +1,195 @@
+import abc
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+# 可在配置 updateSource 中使用的来源名称(不区分大小写)，多个来源按顺序串联
+MODRINTH = "Modrinth"
+MIRROR = "Mirror"
+SOURCE_NAMES = (MODRINTH, MIRROR)
+BULK_TIMEOUT = 30
+
+
+class UpdateSource(abc.ABC):
+    # 更新来源接口，返回值均为Modrinth API格式的原始JSON，由get_mod_info统一解码
+    # 查不到的hash、版本或project直接省略，不抛出异常
+    name = "base"
+
+    @abc.abstractmethod
+    def versions_from_hashes(self, hashes: list[str]) -> dict[str, dict]:
+        # {sha1: 该文件所属的版本}
+        ...
+
+    @abc.abstractmethod
+    def latest_versions_from_hashes(self, hashes: list[str], game_version: str, loader: str) -> dict[str, dict]:
+        # {sha1: 同一project在目标游戏版本和加载器下的最新版本}
+        ...
+
+    @abc.abstractmethod
+    def project_versions(self, project_id: str, loader: Optional[str] = None,
+                         game_version: Optional[str] = None) -> list[dict]:
+        # 按发布时间从新到旧排列
+        ...
+
+    @abc.abstractmethod
+    def versions_by_ids(self, version_ids: list[str]) -> list[dict]:
+        ...
+
+    @abc.abstractmethod
+    def projects(self, ids_or_slugs: list[str]) -> list[dict]:
+        # 每项至少包含id和slug
+        ...
+
+    def local_file(self, sha1: str) -> Optional[Path]:
+        # 可直接从本地读取的文件，没有时返回None，由下载器按版本中的url下载
+        return None
+
+
+class ModrinthSource(UpdateSource):
+    name = MODRINTH
+
+    @staticmethod
+    def _request(endpoint: str, path: str, **kwargs: Any) -> Any:
+        # 经由get_mod_info的响应缓存和请求调度器；get_mod_info导入了本模块，这里在调用时再导入
+        from .get_mod_info import request_json
+        return request_json(endpoint, path, **kwargs)
+
+    def versions_from_hashes(self, hashes: list[str]) -> dict[str, dict]:
+        # POST /v2/version_files，一次请求查询多个文件对应的版本
+        return self._request("version_files", "/v2/version_files", method="POST",
+                             json_body={"hashes": hashes, "algorithm": "sha1"}, timeout=BULK_TIMEOUT)
+
+    def latest_versions_from_hashes(self, hashes: list[str], game_version: str, loader: str) -> dict[str, dict]:
+        # POST /v2/version_files/update，由服务端按加载器和游戏版本筛选最新版本
+        # 包装库的 get_latest_versions_from_hashes 请求地址有误，这里直接调用
+        return self._request("version_files_update", "/v2/version_files/update", method="POST",
+                             json_body={"hashes": hashes, "algorithm": "sha1", "loaders": [loader],
+                                        "game_versions": [game_version]},
+                             timeout=BULK_TIMEOUT)
+
+    def project_versions(self, project_id: str, loader: Optional[str] = None,
+                         game_version: Optional[str] = None) -> list[dict]:
+        params = {}
+        if loader:
+            params["loaders"] = json.dumps([loader])
+        if game_version:
+            params["game_versions"] = json.dumps([game_version])
+        return self._request("project_versions", f"/v2/project/{project_id}/version", params=params or None)
+
+    def versions_by_ids(self, version_ids: list[str]) -> list[dict]:
+        return self._request("versions", "/v2/versions", params={"ids": json.dumps(version_ids)}, timeout=BULK_TIMEOUT)
+
+    def projects(self, ids_or_slugs: list[str]) -> list[dict]:
+        return self._request("projects", "/v2/projects", params={"ids": json.dumps(ids_or_slugs)}, timeout=BULK_TIMEOUT)
+
+
+class ChainedSource(UpdateSource):
+    # 按顺序查询，前面的来源(如局域网镜像)没有的内容再交给后面的来源
+    # 每个hash以最先给出结果的来源为准：镜像中有目标游戏版本下的版本时不会再向后面的来源查询更新，
+    # 镜像过期时需重新执行 export-mirror 才能看到之后新发布的版本
+    # 前面的来源出错时记录日志并跳过，最后一个来源的错误照常抛出以便重试
+    def __init__(self, sources: list[UpdateSource]):
+        self.sources = sources
+        self.name = "+".join(source.name for source in sources)
+
+    def _query(self, source_index: int, func: Callable[[UpdateSource], Any]) -> Any:
+        source = self.sources[source_index]
+        try:
+            return func(source)
+        except Exception as e:
+            if source_index == len(self.sources) - 1:
+                raise
+            logging.warning(f"Update source {source.name} failed, falling back: {e}")
+            return None
+
+    def _merge(self, keys: list[str], fetch: Callable[[UpdateSource, list[str]], dict[str, Any]]) -> dict[str, Any]:
+        found: dict[str, Any] = {}
+        remaining = list(keys)
+        for i in range(len(self.sources)):
+            if not remaining:
+                break
+            found.update(self._query(i, lambda source: fetch(source, remaining)) or {})
+            remaining = [key for key in remaining if key not in found]
+        return found
+
+    def versions_from_hashes(self, hashes: list[str]) -> dict[str, dict]:
+        return self._merge(hashes, lambda source, keys: source.versions_from_hashes(keys))
+
+    def latest_versions_from_hashes(self, hashes: list[str], game_version: str, loader: str) -> dict[str, dict]:
+        return self._merge(hashes, lambda source, keys: source.latest_versions_from_hashes(keys, game_version, loader))
+
+    def project_versions(self, project_id: str, loader: Optional[str] = None,
+                         game_version: Optional[str] = None) -> list[dict]:
+        for i in range(len(self.sources)):
+            versions = self._query(i, lambda source: source.project_versions(project_id, loader, game_version))
+            if versions:
+                return versions
+        return []
+
+    def versions_by_ids(self, version_ids: list[str]) -> list[dict]:
+        return list(self._merge(version_ids, lambda source, keys: {
+            version["id"]: version for version in source.versions_by_ids(keys)}).values())
+
+    def projects(self, ids_or_slugs: list[str]) -> list[dict]:
+        def fetch(source: UpdateSource, keys: list[str]) -> dict[str, dict]:
+            # 传入的可能是id也可能是slug，两者都算作已找到
+            found = {}
+            for project in source.projects(keys):
+                for key in (project["id"], project.get("slug")):
+                    if key in keys:
+                        found[key] = project
+            return found
+        return list({project["id"]: project for project in self._merge(ids_or_slugs, fetch).values()}.values())
+
+    def local_file(self, sha1: str) -> Optional[Path]:
+        for source in self.sources:
+            path = source.local_file(sha1)
+            if path is not None:
+                return path
+        return None
+
+
+def source_names(names: str | Iterable[str]) -> list[str]:
+    return [str(names)] if isinstance(names, str) else [str(name) for name in names]
+
+
+def includes_mirror(names: str | Iterable[str]) -> bool:
+    return any(name.lower() == MIRROR.lower() for name in source_names(names))
+
+
+def build_source(name: str, mirror_location: str = "") -> Optional[UpdateSource]:
+    # 无法使用的来源返回None并记录日志，由调用方跳过，配置有误时程序仍能启动并补全配置
+    if name.lower() == MODRINTH.lower():
+        return ModrinthSource()
+    if name.lower() == MIRROR.lower():
+        if not mirror_location:
+            logging.warning("updateSource includes Mirror but mirrorLocation is not set, skipping the mirror")
+            return None
+        from .mirror import MirrorSource
+        return MirrorSource(mirror_location)
+    logging.warning(f"Unknown update source {name!r}, expected one of {', '.join(SOURCE_NAMES)}")
+    return None
+
+
+_source: UpdateSource = ModrinthSource()
+_source_lock = threading.Lock()
+
+
+def configure(names: str | Iterable[str] = MODRINTH, mirror_location: str = "") -> UpdateSource:
+    # names 为单个来源或按优先顺序排列的多个来源，例如 ["Mirror", "Modrinth"]
+    # 全部来源都不可用时退回Modrinth
+    global _source
+    sources = [source for source in (build_source(name, mirror_location) for name in source_names(names))
+               if source is not None] or [ModrinthSource()]
+    source = sources[0] if len(sources) == 1 else ChainedSource(sources)
+    with _source_lock:
+        _source = source
+    logging.info(f"Update source: {source.name}")
+    return source
+
+
+def get_source() -> UpdateSource:
+    with _source_lock:
+        return _source
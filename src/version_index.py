@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, Optional
+
+from . import get_mod_info, http_cache, scheduler
+
+DEFAULT_MATRIX_WORKERS = 8
+RELEASE = "release"
+
+
+class ProjectVersionIndex:
+    # 一个project的全部版本按 (加载器, 游戏版本) 建立索引，每个组合只保留最新的版本
+    def __init__(self, project_id: str, versions: Iterable[Any]):
+        self.project_id = project_id
+        self.built_at = time.monotonic()
+        self._latest: dict[tuple[str, str], Any] = {}
+        self._latest_release: dict[tuple[str, str], Any] = {}
+        for version in sorted(versions, key=lambda v: v.date_published, reverse=True):
+            for loader in version.loaders or []:
+                for game_version in version.game_versions or []:
+                    key = (loader, game_version)
+                    self._latest.setdefault(key, version)
+                    if version.version_type == RELEASE:
+                        self._latest_release.setdefault(key, version)
+
+    def latest(self, game_version: str, loader: str = "fabric", release_only: bool = False) -> Optional[Any]:
+        table = self._latest_release if release_only else self._latest
+        return table.get((loader, game_version))
+
+    def game_versions(self, loader: str = "fabric") -> set[str]:
+        return {game_version for key_loader, game_version in self._latest if key_loader == loader}
+
+
+_indexes: dict[str, ProjectVersionIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _max_age() -> Optional[float]:
+    # 与响应缓存中版本列表的有效期一致，离线模式下缓存不会过期，索引也不必重建
+    cache = http_cache.get_cache()
+    if cache is None:
+        return http_cache.DEFAULT_TTLS["project_versions"]
+    if cache.offline:
+        return None
+    return cache.ttls.get("project_versions", 0)
+
+
+def _is_fresh(index: ProjectVersionIndex) -> bool:
+    max_age = _max_age()
+    return max_age is None or time.monotonic() - index.built_at < max_age
+
+
+def get_version_index(project_id: str) -> ProjectVersionIndex:
+    # 超过版本列表的缓存有效期后重新获取并构建，常驻模式下也能看到新发布的版本
+    with _indexes_lock:
+        index = _indexes.get(project_id)
+    if index is None or not _is_fresh(index):
+        index = ProjectVersionIndex(project_id, get_mod_info.get_project_versions(project_id))
+        with _indexes_lock:
+            current = _indexes.get(project_id)
+            if current is None or current.built_at < index.built_at:
+                _indexes[project_id] = index
+            else:
+                index = current
+    return index
+
+
+def clear_version_indexes() -> None:
+    with _indexes_lock:
+        _indexes.clear()
+
+
+def load_version_indexes(project_ids: Iterable[str], workers: int = DEFAULT_MATRIX_WORKERS,
+                         max_retries: Optional[int] = None) -> dict[str, Optional[ProjectVersionIndex]]:
+    # 并发获取多个project的索引，失败的为None
+    def load(project_id: str) -> Optional[ProjectVersionIndex]:
+        try:
+            return scheduler.get_scheduler().run_with_retries(
+                get_version_index, project_id, max_retries=max_retries)
+        except Exception as e:
+            logging.error(f"Failed to load versions of {project_id}: {e}")
+            return None
+    project_ids = list(dict.fromkeys(project_ids))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return dict(zip(project_ids, pool.map(load, project_ids)))
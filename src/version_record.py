@@ -0,0 +1,86 @@
+from typing import Optional
+
+
+class FileHashes:
+    __slots__ = ("sha1", "sha512")
+
+    def __init__(self, sha1: str, sha512: Optional[str] = None):
+        self.sha1 = sha1
+        self.sha512 = sha512
+
+
+class VersionFile:
+    __slots__ = ("url", "filename", "hashes", "size")
+
+    def __init__(self, url: str, filename: str, hashes: FileHashes, size: int = 0):
+        self.url = url
+        self.filename = filename
+        self.hashes = hashes
+        self.size = size
+
+    @classmethod
+    def from_json(cls, data: dict) -> "VersionFile":
+        hashes = data.get("hashes") or {}
+        return cls(data["url"], data["filename"], FileHashes(hashes.get("sha1", ""), hashes.get("sha512")),
+                   data.get("size") or 0)
+
+
+class VersionDependency:
+    __slots__ = ("project_id", "version_id", "file_name", "dependency_type")
+
+    def __init__(self, project_id: Optional[str], version_id: Optional[str], file_name: Optional[str],
+                 dependency_type: Optional[str]):
+        self.project_id = project_id
+        self.version_id = version_id
+        self.file_name = file_name
+        self.dependency_type = dependency_type
+
+    @classmethod
+    def from_json(cls, data: dict) -> "VersionDependency":
+        return cls(data.get("project_id"), data.get("version_id"), data.get("file_name"), data.get("dependency_type"))
+
+
+class VersionRecord:
+    # Modrinth版本的精简记录，只保留更新流程用到的字段，属性名与包装库的Version一致
+    # files只保留第一个文件(即会被下载的文件)，changelog等其余字段直接丢弃
+    __slots__ = ("id", "project_id", "version_number", "version_type", "date_published",
+                 "loaders", "game_versions", "files", "dependencies")
+
+    def __init__(self, id: str, project_id: str, version_number: Optional[str], version_type: Optional[str],
+                 date_published: str, loaders: list[str], game_versions: list[str],
+                 files: tuple[VersionFile, ...], dependencies: tuple[VersionDependency, ...]):
+        self.id = id
+        self.project_id = project_id
+        self.version_number = version_number
+        self.version_type = version_type
+        # ISO 8601字符串，同一格式下按字符串比较即按时间先后
+        self.date_published = date_published
+        self.loaders = loaders
+        self.game_versions = game_versions
+        self.files = files
+        self.dependencies = dependencies
+
+    @classmethod
+    def from_json(cls, data: dict) -> "VersionRecord":
+        files = data.get("files")
+        return cls(
+            data["id"],
+            data["project_id"],
+            data.get("version_number"),
+            data.get("version_type"),
+            data.get("date_published") or "",
+            data.get("loaders") or [],
+            data.get("game_versions") or [],
+            (VersionFile.from_json(files[0]),) if files else (),
+            tuple(VersionDependency.from_json(dep) for dep in data.get("dependencies") or ()),
+        )
+
+    def __repr__(self) -> str:
+        return f"VersionRecord({self.project_id}/{self.id} {self.version_number!r})"
+
+
+def decode_versions(items: list[dict], loader: Optional[str] = None) -> list[VersionRecord]:
+    # 指定loader时先在原始JSON上筛选，不匹配的版本不会构造记录
+    if loader is None:
+        return [VersionRecord.from_json(item) for item in items]
+    return [VersionRecord.from_json(item) for item in items if loader in (item.get("loaders") or ())]
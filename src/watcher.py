@@ -0,0 +1,117 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import time
+from typing import Optional
+
+# inotify 事件类型，见 <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+DEFAULT_POLL_INTERVAL = 5.0
+
+
+def is_jar_name(name: str) -> bool:
+    return name.endswith(".jar")
+
+
+class InotifyWatcher:
+    # 通过libc的inotify监听目录，只关心jar文件的增删改
+    def __init__(self, folder: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.folder = folder
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {folder}")
+
+    def _read_events(self) -> bool:
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+                offset += length
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF) or is_jar_name(name):
+                    changed = True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        # 等待直到有jar变化或超时，返回是否有变化
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self.fd], [], [], remaining)
+            if not readable:
+                return False
+            if self._read_events():
+                return True
+
+    def drain(self) -> None:
+        self._read_events()
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    # 不支持inotify的平台上定时比较目录中jar的大小和修改时间
+    def __init__(self, folder: str, interval: float = DEFAULT_POLL_INTERVAL):
+        self.folder = folder
+        self.interval = interval
+        self._signature = self._scan()
+
+    def _scan(self) -> frozenset:
+        try:
+            with os.scandir(self.folder) as it:
+                return frozenset((e.name, e.stat().st_size, e.stat().st_mtime_ns)
+                                 for e in it if e.is_file() and is_jar_name(e.name))
+        except FileNotFoundError:
+            return frozenset()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+            if remaining <= 0:
+                return False
+            time.sleep(remaining)
+            signature = self._scan()
+            if signature != self._signature:
+                self._signature = signature
+                return True
+
+    def drain(self) -> None:
+        self._signature = self._scan()
+
+    def close(self) -> None:
+        pass
+
+
+def create_watcher(folder: str, poll_interval: float = DEFAULT_POLL_INTERVAL) -> InotifyWatcher | PollingWatcher:
+    try:
+        return InotifyWatcher(folder)
+    except (OSError, AttributeError) as e:
+        logging.warning(f"inotify unavailable ({e}), polling {folder} every {poll_interval}s")
+        return PollingWatcher(folder, poll_interval)